@@ -6,8 +6,11 @@ ICONS_DIR = ASSETS_DIR / "icons"
 DATA_DIR = PROJECT_ROOT / "data"
 LOGS_DIR = PROJECT_ROOT / "logs"
 MODELS_DIR = PROJECT_ROOT / "models"
+BARS_DIR = DATA_DIR / "bars"
+TRADES_DB = DATA_DIR / "trades.sqlite"
+DECISIONS_JOURNAL = DATA_DIR / "decisions.djnl"
 APP_CONFIG_PATH = DATA_DIR / "app_config.json"
 LOG_FILE_PATH = LOGS_DIR / "app.log"
 def ensure_runtime_dirs():
-    for p in (DATA_DIR, LOGS_DIR, MODELS_DIR, DATA_DIR / "sentiment"):
+    for p in (DATA_DIR, LOGS_DIR, MODELS_DIR, DATA_DIR / "sentiment", BARS_DIR):
         p.mkdir(parents=True, exist_ok=True)
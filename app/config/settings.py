@@ -70,9 +70,6 @@ BLEND_W_SENT = 0.30
 
 
 # ---- Decision Engine knobs (sane, conservative defaults) ----
-=======
-# ---- Decision Engine knobs (conservative defaults) ----
-main
 GATE_BUFFER_NEAR_COINFLIP = 0.03
 SPREAD_WIDE_BPS_HINT = 50
 GATE_ADJ_SPREAD_WIDE = 0.02
@@ -81,6 +78,52 @@ VWAP_DISAGREE_BPS = 40
 CONVICTION_DW_VWAP = 0.85
 CONVICTION_DW_WIDE_SPREAD = 0.90
 FLIP_COOLDOWN_SEC = 60
+FLIP_DEADLINE_SEC = 30.0  # a flip's unfinished legs are cancelled after this long
+DECISION_INPUT_DEADLINE_SEC = 1.5  # model/VWAP inputs slower than this are treated as stale
+DECISION_HOLD_ON_STALE_MODEL = True  # a stale model input forces HOLD instead of trading on sentiment alone
+DECISION_TICK_SEC = 1.0  # one shared decision per tick for the dashboard, trader and alerts
+DECISION_JOURNAL_ENABLED = True  # record every decision and its inputs to data/decisions.djnl for replay
+DECISION_JOURNAL_ROTATE_BYTES = 64 * 1024 * 1024  # roll decisions.djnl to decisions.djnl.1 past this size (~5 days)
+DECISION_JOURNAL_KEEP = 8  # rolled decision journals kept; the oldest is deleted on the next roll
+
+# ---- Market data ----
+BAR_CACHE_GRACE_SEC = 2.0  # keep serving the cached frame this long past a bar close
+QUOTE_FEED = "iex"  # Alpaca data feed: "iex" or "sip"
+QUOTE_STREAM_SYMBOLS = (TSLA_SYMBOL, TSLL_SYMBOL, TSDD_SYMBOL)
+QUOTE_MAX_AGE_SEC = 5.0  # quotes older than this are treated as missing
+
+# ---- Alpaca HTTP ----
+ALPACA_RATE_LIMIT_PER_MIN = 190  # token bucket shared by every caller of one API key (Alpaca allows 200/min)
+ALPACA_RATE_BURST = 20  # requests allowed back to back before the bucket starts spacing them
+ALPACA_HTTP_POOL_SIZE = 10  # keep-alive connections per host
+ALPACA_HTTP_MAX_RETRIES = 4  # on 429/5xx/connection errors, with jittered exponential backoff
+ALPACA_HTTP_BACKOFF_BASE_SEC = 0.25
+ALPACA_HTTP_BACKOFF_MAX_SEC = 8.0
+ALPACA_HTTP_TIMEOUT_SEC = 10.0
+
+# ---- Trader loop ----
+TRADER_HEARTBEAT_SEC = 15.0  # run a pass at least this often even if nothing happened
+TRADER_MIN_PASS_GAP_SEC = 0.25  # wake-ups closer together than this are merged into one pass
+TRADER_QUOTE_WAKE_BPS = 5.0  # a quote wakes the trader once its mid moves this far since the last wake
+TRADER_FILE_POLL_SEC = 2.0  # how often the sentiment directory is checked for new scores
+BROKER_STATE_TTL_SEC = 5.0  # cached account/positions/orders; order and fill events invalidate sooner
+STOP_CANCEL_TIMEOUT_SEC = 2.0  # an exit queued behind the protective stop's cancel is dropped if it isn't confirmed by then
+
+# ---- Backtest ----
+BACKTEST_HALF_SPREAD_BPS = 5.0  # synthetic quotes sit this far either side of the replayed bar price
+SWEEP_MAX_WORKERS = None  # None = one process per CPU
+SWEEP_CHUNK_SIZE = 8  # combinations per task sent to a sweep worker
+
+# ---- Journal (trade store write-ahead log) ----
+JOURNAL_QUEUE_MAX = 100_000  # records waiting for the flusher; appends beyond this are dropped and counted
+JOURNAL_FSYNC_SEC = 0.25  # group fsync cadence (0 = fsync every group); flush() always fsyncs
+JOURNAL_ROTATE_BYTES = 8 * 1024 * 1024  # start a new journal generation once this much is applied
+
+# ---- Training / validation ----
+CV_FOLDS = 5
+CV_PURGE_BARS = 1  # labels look one bar ahead
+CV_EMBARGO_BARS = 12  # rows skipped after a purged k-fold test block
+CV_MAX_WORKERS = None  # None = one process per fold, capped at the CPU count
 
 # ---- Sentiment scheduling / retention ----
 SENTIMENT_AM_ET = "06:00"
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+"""
+Time sources for the execution code.
+
+Live, ``OrderManager`` and ``FlipExecutor`` read ``time.time`` and arm
+``call_later`` timers (daemon ``threading.Timer``s). A replay hands them a
+``SimClock`` instead: virtual time that only moves when the replay calls
+``advance``, which runs every timer and queued task that fell due on the way,
+in time order, on the caller's thread. The same policy code then runs
+deterministically at whatever speed the replay goes.
+"""
+
+import heapq
+import itertools
+import threading
+from typing import Any, Callable, List, Tuple
+
+CallLater = Callable[..., None]  # (delay_sec, fn, *args)
+
+
+def call_later(delay: float, fn: Callable[..., Any], *args: Any) -> None:
+    timer = threading.Timer(delay, fn, args=args)
+    timer.daemon = True
+    timer.start()
+
+
+class SimClock:
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+        self._queue: List[Tuple[float, int, Callable[..., Any], tuple]] = []
+        self._seq = itertools.count()
+
+    def __call__(self) -> float:
+        return self.now
+
+    def call_later(self, delay: float, fn: Callable[..., Any], *args: Any) -> None:
+        heapq.heappush(self._queue, (self.now + max(0.0, delay), next(self._seq), fn, args))
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        """Executor stand-in: the task runs on the next ``advance``, as if a worker picked it up."""
+        self.call_later(0.0, fn, *args)
+
+    def advance(self, to: float) -> None:
+        """Run everything due up to ``to`` (including what those callbacks schedule), then stop at ``to``."""
+        while self._queue and self._queue[0][0] <= to:
+            due, _, fn, args = heapq.heappop(self._queue)
+            self.now = max(self.now, due)
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"[SimClock] task error: {e}")
+        self.now = max(self.now, to)
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+"""
+Asynchronous, crash-safe write-ahead journal.
+
+Producers call ``append(record)``. It is a ``deque.append`` plus an event
+check, so it never takes a lock, never blocks and does no I/O. One flusher
+thread drains everything that has queued up and encodes the records as JSON
+off the producer's thread. It writes them as a single group of frames and
+fsyncs the file at most every ``fsync_sec``. Only records that are durable are
+handed to ``apply``, together with the journal position they end at.
+
+The sink (``apply``) stores that position with the records in the same
+transaction, and ``checkpoint()`` reads it back. A group the sink fails to
+commit stays queued and is retried together with the next one; ``flush()``
+waits for it, and neither the checkpoint nor a rotation ever skips past it.
+On startup the flusher scans the frames after the checkpoint and re-applies
+the ones the sink never committed. It cuts the file at the first torn or corrupt frame, which
+a crash mid-write leaves behind. Once everything is applied and the file
+has grown past ``rotate_bytes``, it is replaced by an empty file of the
+next generation.
+
+If writing or fsyncing the file fails, the flusher cuts the file back to the
+checkpoint and puts the uncommitted records back at the head of the queue.
+Pending ``flush()`` calls return False, and the flusher exits. The next
+``start()`` recovers and writes those records again.
+
+Frame layout: ``<u32 length><u32 crc32>`` followed by the UTF-8 JSON payload.
+The file starts with a 12-byte header: ``JRNL`` and the ``<u64`` generation.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+from app.config import settings as cfg
+
+MAGIC = b"JRNL"
+_HEADER = struct.Struct("<4sQ")
+_FRAME = struct.Struct("<II")
+HEADER_SIZE = _HEADER.size
+RETRY_SEC = 0.5  # back-off between attempts to apply a group the sink refused
+
+Position = Tuple[int, int]  # (generation, byte offset just past the last applied frame)
+ApplyFn = Callable[[List[Any], Position], None]
+
+
+class _Barrier:
+    __slots__ = ("event", "ok")
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.ok = True  # False: released because the flusher failed, not because the records are durable
+
+
+_STOP = object()
+
+
+def scan(path: Path, start: int) -> Tuple[List[Tuple[Any, int]], int]:
+    """Decode intact frames from ``start``: ``([(record, end_offset), ...], valid_end)``."""
+    out: List[Tuple[Any, int]] = []
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read()
+    pos = 0
+    while pos + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, pos)
+        body = data[pos + _FRAME.size:pos + _FRAME.size + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            break
+        try:
+            record = json.loads(body)
+        except ValueError:
+            break
+        pos += _FRAME.size + length
+        out.append((record, start + pos))
+    return out, start + pos
+
+
+class Journal:
+    def __init__(
+        self,
+        path: Path,
+        apply: ApplyFn,
+        checkpoint: Callable[[], Position],
+        queue_max: int = cfg.JOURNAL_QUEUE_MAX,
+        fsync_sec: float = cfg.JOURNAL_FSYNC_SEC,
+        rotate_bytes: int = cfg.JOURNAL_ROTATE_BYTES,
+        name: str = "Journal",
+    ) -> None:
+        self.path = Path(path)
+        self.apply = apply
+        self.checkpoint = checkpoint
+        self.queue_max = queue_max
+        self.fsync_sec = fsync_sec
+        self.rotate_bytes = rotate_bytes
+        self.name = name
+        self.dropped = 0  # records refused because the queue was full
+        self.recovered = 0  # records re-applied by the last startup scan
+        self._pending: Deque[Any] = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._ready = threading.Event()
+
+    # --------------- Producer side ---------------
+    def append(self, record: Any) -> bool:
+        """Queue ``record`` (JSON-serialisable) for the flusher; False (and counted) if the queue is full."""
+        if len(self._pending) >= self.queue_max:
+            self.dropped += 1
+            return False
+        self._pending.append(record)
+        if not self._wake.is_set():
+            self._wake.set()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Barrier: wait until everything appended before this call is fsynced and applied.
+
+        False on timeout, or if the flusher failed or isn't running while records are still queued.
+        """
+        barrier = _Barrier()
+        with self._start_lock:  # a flusher that fails detaches under this lock, so it can't miss the barrier
+            if self._thread is None:
+                return not any(not isinstance(item, _Barrier) for item in self._pending)
+            self._pending.append(barrier)
+        self._wake.set()
+        return barrier.event.wait(timeout) and barrier.ok
+
+    # --------------- Lifecycle ---------------
+    def start(self) -> None:
+        """Start the flusher; its first job is the recovery scan. Idempotent."""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._ready.clear()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """True once the recovery scan has finished."""
+        return self._ready.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush, fsync and stop the flusher (a later ``start`` recovers and resumes)."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._pending.append(_STOP)
+        if thread is not None:
+            self._wake.set()
+            thread.join(timeout)
+
+    # --------------- Flusher thread ---------------
+    def _run(self) -> None:
+        try:
+            f, generation = self._recover()
+        except Exception as e:
+            print(f"[{self.name}] recovery failed, journal disabled until the next start: {e}")
+            self._ready.set()
+            self._detach()
+            return
+        self._ready.set()
+        applied_end = f.tell()  # the sink's checkpoint: the file is cut back to it if a write fails
+        unapplied: List[Any] = []  # durable but not yet committed by the sink, oldest first
+        waiting: List[_Barrier] = []  # barriers that resolve once ``unapplied`` is committed
+        last_sync = time.monotonic()
+        retry_at = 0.0  # after a failed apply, hold the next attempt off until then
+        try:
+            while True:
+                if unapplied:
+                    due = max(last_sync + self.fsync_sec, retry_at)
+                    self._wake.wait(max(0.0, due - time.monotonic()))
+                else:
+                    self._wake.wait()
+                self._wake.clear()
+
+                records: List[Any] = []
+                barriers: List[_Barrier] = []
+                stop = False
+                while self._pending:
+                    item = self._pending.popleft()
+                    if isinstance(item, _Barrier):
+                        barriers.append(item)
+                    elif item is _STOP:
+                        stop = True
+                    else:
+                        records.append(item)
+                waiting.extend(barriers)
+                now = time.monotonic()
+                try:
+                    if records:
+                        f.write(b"".join(_encode(r) for r in records))
+                        f.flush()
+                        unapplied.extend(records)
+                        records = []
+                    if unapplied and (stop or now >= retry_at and (waiting or now - last_sync >= self.fsync_sec)):
+                        os.fsync(f.fileno())
+                        last_sync = now
+                        # A failed group stays queued and is retried ahead of newer records, so the
+                        # checkpoint only ever lands past frames the sink has actually committed.
+                        if self._apply(unapplied, (generation, f.tell())):
+                            unapplied = []
+                            applied_end = f.tell()
+                            if applied_end >= self.rotate_bytes:
+                                f, generation = self._rotate(f, generation)
+                                applied_end = HEADER_SIZE
+                        else:
+                            retry_at = now + RETRY_SEC
+                except OSError as e:
+                    requeue = unapplied + records
+                    print(f"[{self.name}] write failed, {len(requeue)} records stay queued for the next start: {e}")
+                    self._abandon(f, applied_end, requeue, waiting)
+                    return
+                if not unapplied or stop:
+                    for barrier in waiting:
+                        barrier.event.set()
+                    waiting = []
+                if stop:
+                    return
+        finally:
+            f.close()
+
+    def _apply(self, records: List[Any], position: Position) -> bool:
+        try:
+            self.apply(records, position)
+            return True
+        except Exception as e:
+            # the records stay in the journal file and in memory; the checkpoint did not move
+            print(f"[{self.name}] apply failed for {len(records)} records, will retry: {e}")
+            return False
+
+    def _abandon(self, f: Any, applied_end: int, records: List[Any], waiting: List[_Barrier]) -> None:
+        """After an I/O error: cut the file back to the checkpoint, requeue ``records`` first and detach."""
+        try:
+            f.close()
+        except OSError:
+            pass  # the buffered frames may or may not have reached the file; the truncate settles it
+        try:
+            # Whatever got past the checkpoint is requeued below, so a restart must not replay it too
+            os.truncate(self.path, applied_end)
+        except OSError as e:
+            print(f"[{self.name}] could not cut {self.path} back to {applied_end}: {e}")
+        self._pending.extendleft(reversed(records))
+        for barrier in waiting:
+            barrier.ok = False
+            barrier.event.set()
+        self._detach()
+
+    def _detach(self) -> None:
+        """Forget this flusher so ``start()`` can recover, failing the barriers still queued for it."""
+        with self._start_lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+            for item in list(self._pending):
+                if isinstance(item, _Barrier):
+                    item.ok = False
+                    item.event.set()
+            while _STOP in self._pending:
+                self._pending.remove(_STOP)  # a close() that raced the failure; the next start shouldn't stop
+
+    def _recover(self) -> Tuple[Any, int]:
+        """Replay frames the sink hasn't committed, cut a torn tail, and open the file for append."""
+        applied_gen, applied_off = self.checkpoint()
+        if not self.path.exists() or self.path.stat().st_size < HEADER_SIZE:
+            # a fresh generation, so a stale checkpoint can never match the new file
+            f, generation = self._create(applied_gen + 1)
+            self.apply([], (generation, HEADER_SIZE))
+            return f, generation
+        with open(self.path, "rb") as f:
+            magic, generation = _HEADER.unpack(f.read(HEADER_SIZE))
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a journal file")
+        start = applied_off if applied_gen == generation and applied_off >= HEADER_SIZE else HEADER_SIZE
+        start = min(start, self.path.stat().st_size)
+        frames, valid_end = scan(self.path, start)
+        if frames:
+            self.apply([record for record, _ in frames], (generation, valid_end))
+            self.recovered = len(frames)
+        f = open(self.path, "r+b")
+        f.truncate(valid_end)  # drop a torn tail so new frames follow the last intact one
+        f.seek(valid_end)
+        os.fsync(f.fileno())
+        if valid_end >= self.rotate_bytes:
+            return self._rotate(f, generation)
+        return f, generation
+
+    def _create(self, generation: int) -> Tuple[Any, int]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        f = open(self.path, "r+b")
+        f.seek(HEADER_SIZE)
+        return f, generation
+
+    def _rotate(self, f: Any, generation: int) -> Tuple[Any, int]:
+        # Everything in the old file is applied: a crash after the replace and before the
+        # checkpoint below still recovers correctly (new generation, nothing after the header).
+        f.close()
+        f, generation = self._create(generation + 1)
+        self._apply([], (generation, HEADER_SIZE))
+        return f, generation
+
+
+def _encode(record: Any) -> bytes:
+    body = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8")
+    return _FRAME.pack(len(body), zlib.crc32(body)) + body
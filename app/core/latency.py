@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+"""
+Per-stage latency spans.
+
+``span("bar_fetch")`` times a block with ``perf_counter_ns`` and records it in two
+places: the process-wide ``recorder`` (a rolling window per stage, summarised as
+p50/p95/p99) and, when one is active, the current ``trace()`` so a single decision
+can report where its own time went. The active trace lives in a ContextVar, so
+spans run on pool threads submitted with ``contextvars.copy_context().run`` land
+in the caller's trace.
+"""
+
+import contextlib
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, List, Optional
+
+WINDOW = 2048  # samples kept per stage
+
+
+class Trace:
+    """Stage -> elapsed ms for one unit of work; repeated stages accumulate."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, ms: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def as_reasons(self) -> Dict[str, float]:
+        """Stages as ``lat_<stage>_ms`` entries, rounded for display/logging."""
+        with self._lock:
+            return {f"lat_{k}_ms": round(v, 3) for k, v in self.stages.items()}
+
+
+class LatencyHistogram:
+    def __init__(self, window: int = WINDOW) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.last_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self._samples.append(ms)
+        self.count += 1
+        self.last_ms = ms
+
+    def percentiles(self, qs=(50, 95, 99)) -> Dict[str, float]:
+        data: List[float] = sorted(self._samples)
+        if not data:
+            return {f"p{q}": float("nan") for q in qs}
+        # nearest-rank
+        return {f"p{q}": data[min(len(data) - 1, max(0, -(-q * len(data) // 100) - 1))] for q in qs}
+
+
+class LatencyRecorder:
+    def __init__(self, window: int = WINDOW) -> None:
+        self._window = window
+        self._lock = threading.Lock()
+        self._hists: Dict[str, LatencyHistogram] = {}
+
+    def record(self, stage: str, ms: float) -> None:
+        with self._lock:
+            hist = self._hists.get(stage)
+            if hist is None:
+                hist = self._hists[stage] = LatencyHistogram(self._window)
+            hist.add(ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """stage -> {p50, p95, p99, last, n} over the rolling window."""
+        with self._lock:
+            out = {}
+            for stage, hist in self._hists.items():
+                row = hist.percentiles()
+                row["last"] = hist.last_ms
+                row["n"] = float(hist.count)
+                out[stage] = row
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hists.clear()
+
+
+recorder = LatencyRecorder()
+_current: ContextVar[Optional[Trace]] = ContextVar("latency_trace", default=None)
+
+
+@contextlib.contextmanager
+def trace() -> Iterator[Trace]:
+    """Collect every span inside the block (including pool threads run in a copied context)."""
+    t = Trace()
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+@contextlib.contextmanager
+def span(stage: str) -> Iterator[None]:
+    t0 = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter_ns() - t0) / 1e6
+        recorder.record(stage, ms)
+        active = _current.get()
+        if active is not None:
+            active.add(stage, ms)
+
+
+def format_summary(stages: Optional[List[str]] = None, limit: int = 3) -> str:
+    """'stage p50/p95/p99 ms' for the ``limit`` stages with the worst p95 (or the given ones)."""
+    snap = recorder.snapshot()
+    names = stages if stages is not None else sorted(snap, key=lambda k: snap[k]["p95"], reverse=True)[:limit]
+    parts = []
+    for name in names:
+        row = snap.get(name)
+        if row is None:
+            continue
+        parts.append(f"{name} {row['p50']:.1f}/{row['p95']:.1f}/{row['p99']:.1f}")
+    return " · ".join(parts)
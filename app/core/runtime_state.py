@@ -5,8 +5,6 @@ from dataclasses import dataclass
 
 from app.config import settings as cfg
 
-=======
-main
 
 @dataclass
 class RuntimeState:
@@ -3,9 +3,7 @@ from __future__ import annotations
 
 """Decision-focused dashboard with defensive background refreshers."""
 
-import csv
 import datetime as dt
-import json
 import math
 import os
 from dataclasses import dataclass
@@ -27,48 +25,18 @@ from PySide6.QtWidgets import (
 )
 
 from app.config import settings as cfg
-=======
-import datetime
-import glob
-import json
-import os
-from typing import List
-
-import pytz
-from dotenv import dotenv_values
-from PySide6.QtCore import QTimer
-from PySide6.QtWidgets import QFrame, QHBoxLayout, QLabel, QVBoxLayout, QWidget
-
-main
 from app.config.paths import DATA_DIR
+from app.core import latency
 from app.core.app_config import AppConfig
 from app.core.runtime_state import state
 from app.gui.sparkline import Sparkline
-from app.services.alpaca_client import AlpacaService
-from app.services.decision_engine import DecisionInputs, DecisionResult, decide
-=======
-from app.services.live_vwap import vwap_distance_bps
-from app.services.market_data import get_quote
-from app.services.model import predict_p_up_latest
-from app.services.pricing import spread_bps
-main
+from app.services.broker_state import shared_broker_state
+from app.services.decision_engine import DecisionResult
+from app.services.decision_service import DecisionTick, decision_service
+from app.services.trade_store import shared_trade_store
 
 NY = pytz.timezone(cfg.TZ)
 
-=======
-def _read_daily_sentiment_score() -> float | None:
-    sdir = DATA_DIR / "sentiment"
-    files = sorted(glob.glob(os.path.join(sdir, "*.json")))
-    if not files:
-        return None
-    latest = files[-1]
-    try:
-        with open(latest, "r", encoding="utf-8") as f:
-            doc = json.load(f)
-        return float(doc.get("daily_score"))
-    except Exception:
-        return None
-main
 
 @dataclass
 class DashboardMetrics:
@@ -86,97 +54,13 @@ class DashboardMetrics:
     error: Optional[str] = None
 
 
-class DecisionWorker(QObject):
-    """Worker that computes a :class:`DecisionResult` off the UI thread."""
+class DecisionBridge(QObject):
+    """Re-emits decisions published by the shared service as a Qt signal (queued onto the UI thread)."""
 
-    finished = Signal(DecisionResult)
-    failed = Signal(str)
+    published = Signal(object)
 
-    def __init__(self, interval: str, sentiment_dir: Path, session_flags: Tuple[bool, bool, bool]) -> None:
-        super().__init__()
-        self.interval = interval
-        self.sentiment_dir = sentiment_dir
-        self.session_flags = session_flags
-
-
-    @Slot()
-    def run(self) -> None:
-=======
-        v = QVBoxLayout(self)
-
-        # Trade Gate tile
-        self.gate_tile = QFrame()
-        self.gate_tile.setFrameShape(QFrame.Box)
-        self.gate_tile.setStyleSheet("background:#f7f7f7; padding:10px;")
-        g = QVBoxLayout(self.gate_tile)
-        self.lbl_gate = QLabel("Trade Gate: (no signal yet)")
-        g.addWidget(self.lbl_gate)
-        v.addWidget(self.gate_tile)
-        tiles = QHBoxLayout()
-        self.lbl_tsla_last = QLabel("TSLA last: (loading)")
-        self.lbl_vwap = QLabel("VWAP dist: (N/A)")
-        tiles.addWidget(self.lbl_tsla_last); tiles.addStretch(1); tiles.addWidget(self.lbl_vwap)
-        v.addLayout(tiles)
-
-        # Row: p_up sparkline + spread sparklines
-        row = QHBoxLayout()
-        col1 = QVBoxLayout()
-        col1.addWidget(QLabel("p_up (last 60)"))
-        self.sp_pup = Sparkline(); col1.addWidget(self.sp_pup)
-        row.addLayout(col1)
-
-        col2 = QVBoxLayout()
-        col2.addWidget(QLabel("TSLL spread (bps, last 60)"))
-        self.sp_tsll = Sparkline(); col2.addWidget(self.sp_tsll)
-        row.addLayout(col2)
-
-        col3 = QVBoxLayout()
-        col3.addWidget(QLabel("TSDD spread (bps, last 60)"))
-        self.sp_tsdd = Sparkline(); col3.addWidget(self.sp_tsdd)
-        row.addLayout(col3)
-
-        v.addLayout(row)
-
-        # Row: session banners + PDT/Cash info
-        info = QHBoxLayout()
-        self.lbl_session = QLabel("Sessions: Pre ON | RTH ON | After OFF")
-        self.lbl_ext = QLabel("Extended Hours OK")
-        self.lbl_ext.setStyleSheet("background:#e6ffed; border:1px solid #7fd18b; color:#05400A; padding:4px;")
-        self.lbl_pdt = QLabel("PDT/Cash: (fetching)")
-        info.addWidget(self.lbl_session); info.addStretch(1); info.addWidget(self.lbl_ext); info.addStretch(1); info.addWidget(self.lbl_pdt)
-        v.addLayout(info)
-
-        # Last sentiment run
-        self.lbl_sent = QLabel("Last sentiment run: (check Section 02 scheduler)")
-        v.addWidget(self.lbl_sent)
-
-        # Timer storage
-        self._pup_vals: List[float] = []
-        self._sp_tsll_vals: List[float] = []
-        self._sp_tsdd_vals: List[float] = []
-
-        # Timers
-        self.timer_fast = QTimer(self); self.timer_fast.timeout.connect(self._tick_fast); self.timer_fast.start(4000)
-        self.timer_slow = QTimer(self); self.timer_slow.timeout.connect(self._tick_slow); self.timer_slow.start(30000)
-        self._tick_fast(); self._tick_slow()
-
-    def _tick_fast(self):
-        # TSLA last
-        q_tsla = get_quote("TSLA")
-main
-        try:
-            sentiment = _read_latest_sentiment(self.sentiment_dir)
-            decision_inputs = DecisionInputs(
-                interval=self.interval,
-                last_sentiment_daily=sentiment,
-                session_pre=self.session_flags[0],
-                session_rth=self.session_flags[1],
-                session_after=self.session_flags[2],
-            )
-            result = decide(decision_inputs)
-            self.finished.emit(result)
-        except Exception as exc:  # pragma: no cover - defensive surface only
-            self.failed.emit(str(exc))
+    def __call__(self, tick: DecisionTick) -> None:
+        self.published.emit(tick.result)
 
 
 class MetricsWorker(QObject):
@@ -197,21 +81,17 @@ class MetricsWorker(QObject):
             kid = vals.get("ALPACA_API_KEY_ID")
             ksec = vals.get("ALPACA_API_SECRET_KEY")
             if kid and ksec:
-                alp = AlpacaService(kid, ksec)
-                acct = alp.get_account()
+                # Shared with the trader: reads hit the cache unless a fill/TTL forced a refresh
+                broker = shared_broker_state(kid, ksec)
+                acct = broker.account()
                 metrics.equity = _safe_float(getattr(acct, "equity", None))
                 metrics.settled_cash = _safe_float(
                     getattr(acct, "non_marginable_buying_power", getattr(acct, "cash", None))
                 )
                 metrics.pnl_today = _safe_float(getattr(acct, "today_profit_loss", None))
-                try:
-                    pos_tsll = alp.get_position(cfg.TSLL_SYMBOL)
-                except Exception:
-                    pos_tsll = None
-                try:
-                    pos_tsdd = alp.get_position(cfg.TSDD_SYMBOL)
-                except Exception:
-                    pos_tsdd = None
+                positions = broker.positions()
+                pos_tsll = positions.get(cfg.TSLL_SYMBOL)
+                pos_tsdd = positions.get(cfg.TSDD_SYMBOL)
                 if pos_tsll:
                     metrics.position_symbol = cfg.TSLL_SYMBOL
                     metrics.position_qty = _safe_float(getattr(pos_tsll, "qty", None))
@@ -408,7 +288,6 @@ class Dashboard(QWidget):
     def __init__(self, config: AppConfig) -> None:
         super().__init__()
         self._config = config
-        self._decision_thread: Optional[QThread] = None
         self._metrics_thread: Optional[QThread] = None
         self._decision_history: List[float] = []
         self._latest_metrics = DashboardMetrics()
@@ -416,6 +295,11 @@ class Dashboard(QWidget):
         self._build_ui()
         self._init_timers()
 
+        self._decision_bridge = DecisionBridge(self)
+        self._decision_bridge.published.connect(self._on_decision_result)
+        self._unsubscribe = decision_service.subscribe(self._decision_bridge)
+        self.destroyed.connect(lambda *_: self._unsubscribe())
+
     def _build_ui(self) -> None:
         layout = QVBoxLayout(self)
         layout.setContentsMargins(12, 12, 12, 12)
@@ -461,11 +345,6 @@ class Dashboard(QWidget):
         self.decision_card.dry_run_requested.connect(self.request_refresh)
 
     def _init_timers(self) -> None:
-        self.decision_timer = QTimer(self)
-        self.decision_timer.setInterval(2000)
-        self.decision_timer.timeout.connect(self.request_refresh)
-        self.decision_timer.start()
-
         self.metrics_timer = QTimer(self)
         self.metrics_timer.setInterval(5000)
         self.metrics_timer.timeout.connect(self._refresh_metrics)
@@ -473,26 +352,7 @@ class Dashboard(QWidget):
 
     @Slot()
     def request_refresh(self) -> None:
-        if self._decision_thread and self._decision_thread.isRunning():
-            return
-
-        thread = QThread(self)
-        worker = DecisionWorker(
-            interval=state.interval,
-            sentiment_dir=DATA_DIR / "sentiment",
-            session_flags=(state.session_pre, state.session_rth, state.session_after),
-        )
-        worker.moveToThread(thread)
-        thread.started.connect(worker.run)
-        worker.finished.connect(self._on_decision_result)
-        worker.failed.connect(self._on_decision_error)
-        worker.finished.connect(thread.quit)
-        worker.finished.connect(worker.deleteLater)
-        worker.failed.connect(thread.quit)
-        worker.failed.connect(worker.deleteLater)
-        thread.finished.connect(thread.deleteLater)
-        self._decision_thread = thread
-        thread.start()
+        decision_service.request_refresh()
 
     @Slot()
     def _refresh_metrics(self) -> None:
@@ -510,21 +370,22 @@ class Dashboard(QWidget):
         self._metrics_thread = thread
         thread.start()
 
-    @Slot(DecisionResult)
+    @Slot(object)
     def _on_decision_result(self, result: DecisionResult) -> None:
         self._decision_history.append(result.p_blend)
         self._decision_history = self._decision_history[-120:]
         self.decision_card.update_result(result, self._decision_history)
         self._update_session_badges()
-        self.status_label.setText(
-            f"Max spread TSLL/TSDD: {result.spread_bps_tsll:.1f} / {result.spread_bps_tsdd:.1f} bps"
-        )
+        status = f"Max spread TSLL/TSDD: {result.spread_bps_tsll:.1f} / {result.spread_bps_tsdd:.1f} bps"
+        decide_ms = result.reasons.get("lat_decide_ms")
+        if isinstance(decide_ms, float):
+            status += f"  |  decide {decide_ms:.1f} ms"
+        slowest = latency.format_summary()
+        if slowest:
+            status += f"  |  p50/p95/p99 ms: {slowest}"
+        self.status_label.setText(status)
         self.decision_updated.emit(result, self._latest_metrics)
 
-    @Slot(str)
-    def _on_decision_error(self, message: str) -> None:
-        self.status_label.setText(f"Decision error: {message}")
-
     @Slot(DashboardMetrics)
     def _on_metrics(self, metrics: DashboardMetrics) -> None:
         self._latest_metrics = metrics
@@ -566,45 +427,15 @@ class Dashboard(QWidget):
             self.show_logs_requested.emit(self._latest_metrics.last_trade_filter)
 
 
-def _read_latest_sentiment(sentiment_dir: Path) -> Optional[float]:
-    if not sentiment_dir.exists():
-        return None
-    try:
-        files = sorted(sentiment_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-    except Exception:
-        return None
-    if not files:
-        return None
-    latest = files[0]
-    try:
-        with latest.open("r", encoding="utf-8") as handle:
-            payload = json.load(handle)
-        score = float(payload.get("daily_score"))
-    except (OSError, ValueError, TypeError, json.JSONDecodeError):
-        return None
-    if math.isnan(score):
-        return None
-    return max(-1.0, min(1.0, score))
-
-
 def _read_last_trade() -> Tuple[Optional[str], Optional[str], Optional[str]]:
-    trades_path = DATA_DIR / "trades.csv"
-    if not trades_path.exists():
-        return None, None, None
-    try:
-        with trades_path.open("r", encoding="utf-8") as handle:
-            reader = csv.DictReader(handle)
-            rows = list(reader)
-    except (OSError, csv.Error):
-        return None, None, None
-    if not rows:
+    last = shared_trade_store().last_trade()
+    if last is None:
         return None, None, None
-    last = rows[-1]
-    ts = last.get("ts", "?")
-    action = last.get("action", "?")
-    symbol = last.get("symbol", "?")
+    ts = last.get("ts_iso") or "?"
+    action = last.get("action") or "?"
+    symbol = last.get("symbol") or "?"
     qty = last.get("qty", "?")
-    price = last.get("price", last.get("px", "?"))
+    price = last.get("px", "?")
     summary = f"{ts} — {action} {symbol} x{qty} @ {price}"
     filter_token = last.get("decision_components_json") or symbol
     return summary, filter_token, ts
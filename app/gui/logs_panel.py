@@ -1,14 +1,8 @@
 from __future__ import annotations
 
-=======
-
-"""
-logs_panel.py — Hotfix v1.4.5
-main
 
 """Structured log viewer with filters and decision-component highlighting."""
 
-import csv
 import datetime as dt
 import json
 from dataclasses import dataclass
@@ -23,27 +17,14 @@ from PySide6.QtWidgets import (
     QLineEdit,
     QPlainTextEdit,
     QPushButton,
-=======
-import os
-
-from PySide6.QtCore import QTimer
-from PySide6.QtGui import QTextCursor
-from PySide6.QtWidgets import (
-    QHBoxLayout,
-    QLabel,
-    QPlainTextEdit,
-    QPushButton,
-    QTableWidget,
-    QTableWidgetItem,
-main
     QVBoxLayout,
     QWidget,
 )
 
 from app.config.paths import DATA_DIR, LOGS_DIR
+from app.services.trade_store import shared_trade_store
 
 LOG_PATH = LOGS_DIR / "app.log"
-TRADES_CSV = DATA_DIR / "trades.csv"
 
 
 @dataclass
@@ -55,7 +36,7 @@ class LogsPayload:
 
 
 class LogsWorker(QObject):
-    """Reads log and trade files in the background."""
+    """Reads the log file and the trade store in the background."""
 
     finished = Signal(LogsPayload)
 
@@ -71,7 +52,7 @@ class LogsWorker(QObject):
 
 
 class LogsPanel(QWidget):
-    """Filterable view of logs/app.log and data/trades.csv."""
+    """Filterable view of logs/app.log and the trades in data/trades.sqlite."""
 
     def __init__(self) -> None:
         super().__init__()
@@ -219,26 +200,14 @@ def _read_log_lines(since: Optional[dt.datetime]) -> List[str]:
 
 
 def _read_trades(max_rows: int = 50) -> List[str]:
-    if not TRADES_CSV.exists():
-        return []
-    rows = []
-    try:
-        with TRADES_CSV.open("r", encoding="utf-8") as handle:
-            reader = csv.DictReader(handle)
-            for row in reader:
-                rows.append(row)
-    except (OSError, csv.Error):
-        return []
-    rows = rows[-max_rows:]
     formatted: List[str] = []
-    for row in rows:
-        ts = row.get("ts", "?")
-        action = row.get("action", "?")
-        symbol = row.get("symbol", "?")
+    for row in shared_trade_store().trades(limit=max_rows):
+        ts = row.get("ts_iso") or "?"
+        action = row.get("action") or "?"
+        symbol = row.get("symbol") or "?"
         qty = row.get("qty", "?")
-        price = row.get("price", row.get("px", "?"))
-        components_raw = row.get("decision_components_json")
-        decision_text = _format_decision_components(components_raw)
+        price = row.get("px", "?")
+        decision_text = _format_decision_components(row.get("decision_components_json"))
         formatted.append(f"{ts} | {action} {symbol} x{qty} @ {price}{decision_text}")
     return formatted
 
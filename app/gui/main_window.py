@@ -16,25 +16,17 @@ from PySide6.QtWidgets import (
     QVBoxLayout,
     QWidget,
 )
-=======
-from PySide6.QtCore import Qt, QTimer
-from PySide6.QtWidgets import QApplication, QLabel, QMainWindow, QTabWidget, QVBoxLayout, QWidget
-main
 
 from app.core.app_config import AppConfig
 from app.core.runtime_state import state
 from app.core.usb_guard import read_keys_env
 from app.gui.dashboard import Dashboard, DashboardMetrics
-=======
-from app.gui.dashboard import Dashboard
-main
 from app.gui.logs_panel import LogsPanel
 from app.gui.settings_panel import SettingsPanel
 from app.gui.trade_control import TradeControl
 from app.gui.train_panel import TrainPanel
 from app.gui.ui_state import UIState, load_ui_state
-=======
-main
+from app.services.market_data import start_stream_from_usb
 
 
 class MainWindow(QMainWindow):
@@ -180,6 +172,7 @@ class MainWindow(QMainWindow):
     def refresh_keys_banner(self) -> None:
         ok, masked = read_keys_env(self.config.usb_keys_path)
         if ok:
+            start_stream_from_usb(self.config.usb_keys_path)
             details = "  ".join(f"{k}:{v}" for k, v in masked.items() if v)
             self.banner_label.setText(f"Keys present at {self.config.usb_keys_path} — {details}")
             self.banner_label.setStyleSheet(
@@ -19,19 +19,11 @@ from PySide6.QtWidgets import (
 )
 
 from app.config import settings as cfg
-=======
-import os
-
-from dotenv import dotenv_values
-from PySide6.QtCore import QTimer
-from PySide6.QtWidgets import QHBoxLayout, QLabel, QPushButton, QVBoxLayout, QWidget
-
-main
 from app.core.app_config import AppConfig
 from app.core.runtime_state import state
 from app.gui.dashboard import DashboardMetrics
 from app.services.decision_engine import DecisionResult
-from app.services.market_data import get_quote
+from app.services.market_data import get_quotes
 from app.services.pricing import spread_bps
 
 
@@ -56,9 +48,11 @@ class QuoteWorker(QObject):
     @Slot()
     def run(self) -> None:
         payload: Dict[str, QuoteSnapshot] = {}
-        for symbol in (cfg.TSLL_SYMBOL, cfg.TSDD_SYMBOL):
+        symbols = (cfg.TSLL_SYMBOL, cfg.TSDD_SYMBOL)
+        snapshot = get_quotes(symbols)
+        for symbol in symbols:
             try:
-                quote = get_quote(symbol)
+                quote = snapshot.get(symbol)
                 payload[symbol] = QuoteSnapshot(
                     bid=float(quote.get("bid")) if quote.get("bid") is not None else None,
                     ask=float(quote.get("ask")) if quote.get("ask") is not None else None,
@@ -68,10 +62,6 @@ class QuoteWorker(QObject):
             except Exception:
                 payload[symbol] = QuoteSnapshot()
         self.finished.emit(payload)
-=======
-from app.services.model import predict_p_up_latest
-from app.services.pricing import compute_entry_limit
-main
 
 
 class TradeControl(QWidget):
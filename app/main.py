@@ -1,12 +1,21 @@
 from app.config.paths import ensure_runtime_dirs
 from app.core.logging_setup import setup_logging
 from app.gui.main_window import launch_gui
+from app.services.decision_service import decision_service
+from app.services.model import model_cache
+from app.services.telegram import DecisionAlerts, TelegramNotifier
 
 
 def main():
     ensure_runtime_dirs()
     logger = setup_logging()
     logger.info("Starting TSLA Two-Ticker Trader — Section 03")
+    model_cache.warm_in_background()
+    try:
+        decision_service.subscribe(DecisionAlerts(TelegramNotifier.from_usb()))
+    except Exception as e:
+        logger.warning(f"Telegram alerts disabled: {e}")
+    decision_service.start()
     launch_gui()
 if __name__ == "__main__":
     main()
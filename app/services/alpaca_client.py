@@ -1,7 +1,6 @@
 
 from typing import Any, List, Optional, Union, cast
 
-from alpaca.trading.client import TradingClient
 from alpaca.trading.enums import OrderSide, OrderStatus, TimeInForce
 from alpaca.trading.models import Order as AlpacaOrder
 from alpaca.trading.requests import (
@@ -11,6 +10,9 @@ from alpaca.trading.requests import (
     StopLimitOrderRequest,
 )
 
+from app.core.latency import span
+from app.services.alpaca_http import trading_client
+
 
 class AlpacaService:
     """
@@ -19,8 +21,10 @@ class AlpacaService:
     """
 
     def __init__(self, api_key: Optional[str] = None, api_secret: Optional[str] = None, *, raw_data: bool = False):
-        # paper=False enforces LIVE per spec
-        self.client = TradingClient(api_key, api_secret, paper=False, raw_data=raw_data)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        # paper=False enforces LIVE per spec; the HTTP session (pooling, rate limit, retries) is shared per key
+        self.client = trading_client(api_key, api_secret, raw_data=raw_data)
 
     # ---- Account & Positions ----
     def get_account(self) -> Any:
@@ -56,7 +60,8 @@ class AlpacaService:
             extended_hours=extended_hours,
             client_order_id=client_order_id,
         )
-        return self.client.submit_order(req)
+        with span("order_submit"):
+            return self.client.submit_order(req)
 
     def submit_stop_limit(
         self,
@@ -80,11 +85,14 @@ class AlpacaService:
             extended_hours=extended_hours,
             client_order_id=client_order_id,
         )
-        return self.client.submit_order(req)
+        with span("order_submit"):
+            return self.client.submit_order(req)
 
-    def replace_limit(self, order_id: str, *, new_limit_price: float) -> AlpacaOrder:
-        r = ReplaceOrderRequest(limit_price=new_limit_price)
-        return self.client.replace_order_by_id(order_id, r)
+    def replace_limit(self, order_id: str, *, new_limit_price: float, qty: Optional[float] = None) -> AlpacaOrder:
+        """Replace the limit; ``qty`` (whole shares) resizes the new order, e.g. to a partial fill's remainder."""
+        r = ReplaceOrderRequest(limit_price=new_limit_price, qty=int(qty) if qty is not None else None)
+        with span("order_replace"):
+            return self.client.replace_order_by_id(order_id, r)
 
     def cancel_order(self, order_id: str) -> None:
         self.client.cancel_order_by_id(order_id)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+"""
+Shared HTTP layer for Alpaca REST calls.
+
+Every ``TradingClient`` built through ``trading_client`` shares one
+``requests`` session per API key. That gives all callers in the process (the
+trader, the dashboard workers and the Telegram snapshot) the same three things:
+
+* keep-alive connection pooling, so each call reuses an open TLS connection;
+* a token bucket sized to Alpaca's per-account budget, which makes bursts at
+  the open queue briefly instead of drawing 429s;
+* jittered exponential backoff on 429 and 5xx, honouring ``Retry-After``
+  (order submits and replaces only retry a 429, which Alpaca never applied).
+
+``stats()`` returns request, retry and throttle counters per endpoint, with
+order ids folded into ``{id}`` so they aggregate.
+"""
+
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import settings as cfg
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# A 5xx or timeout on an order POST/PATCH may still have been applied; only a 429 is known to be rejected
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "DELETE"})
+_ID_SEGMENT = re.compile(r"/(?:[0-9a-fA-F-]{32,36}|\d+)(?=/|$)")
+
+
+class TokenBucket:
+    """Blocking token bucket: ``rate_per_sec`` sustained, up to ``burst`` at once."""
+
+    def __init__(
+        self,
+        rate_per_sec: float,
+        burst: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate_per_sec
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = burst
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                need = (1.0 - self._tokens) / self.rate
+            self._sleep(need)
+            waited += need
+
+
+class EndpointStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"requests": 0, "retries": 0, "throttled": 0, "errors": 0, "wait_sec": 0.0}
+        )
+
+    def add(self, endpoint: str, field: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counts[endpoint][field] += amount
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {k: dict(v) for k, v in self._counts.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+def endpoint_key(method: str, url: str) -> str:
+    """'GET /v2/orders/{id}' style key: path only, ids collapsed."""
+    path = requests.utils.urlparse(url).path
+    return f"{method.upper()} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+def backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than a numeric ``Retry-After``."""
+    cap = min(cfg.ALPACA_HTTP_BACKOFF_MAX_SEC, cfg.ALPACA_HTTP_BACKOFF_BASE_SEC * (2 ** attempt))
+    delay = random.uniform(0.0, cap)
+    try:
+        delay = max(delay, float(retry_after)) if retry_after else delay
+    except ValueError:
+        pass
+    return delay
+
+
+class PooledSession(requests.Session):
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        stats: EndpointStats,
+        pool_size: int = cfg.ALPACA_HTTP_POOL_SIZE,
+        max_retries: int = cfg.ALPACA_HTTP_MAX_RETRIES,
+        timeout_sec: float = cfg.ALPACA_HTTP_TIMEOUT_SEC,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.bucket = bucket
+        self.stats = stats
+        self.max_retries = max_retries
+        self.timeout_sec = timeout_sec
+        self._sleep = sleep
+
+    def request(self, method: str, url: str, *args: Any, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        kwargs.setdefault("timeout", self.timeout_sec)
+        key = endpoint_key(method, url)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            if waited:
+                self.stats.add(key, "wait_sec", waited)
+            self.stats.add(key, "requests")
+            try:
+                response = super().request(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.stats.add(key, "errors")
+                if attempt >= self.max_retries or not idempotent:
+                    raise
+                retry_after = None
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+                if response.status_code == 429:
+                    self.stats.add(key, "throttled")
+                else:
+                    self.stats.add(key, "errors")
+                if attempt >= self.max_retries or (response.status_code != 429 and not idempotent):
+                    return response  # the client turns it into its usual APIError
+                retry_after = response.headers.get("Retry-After")
+            self.stats.add(key, "retries")
+            self._sleep(backoff_delay(attempt, retry_after))
+            attempt += 1
+
+
+_sessions: Dict[Optional[str], PooledSession] = {}
+_sessions_lock = threading.Lock()
+_stats = EndpointStats()
+
+
+def shared_session(api_key: Optional[str]) -> PooledSession:
+    """One pooled, rate-limited session per API key (Alpaca's limits are per account)."""
+    with _sessions_lock:
+        session = _sessions.get(api_key)
+        if session is None:
+            rate = cfg.ALPACA_RATE_LIMIT_PER_MIN / 60.0
+            session = _sessions[api_key] = PooledSession(TokenBucket(rate, cfg.ALPACA_RATE_BURST), _stats)
+        return session
+
+
+def trading_client(api_key: Optional[str], api_secret: Optional[str], *, raw_data: bool = False) -> Any:
+    """Live ``TradingClient`` on the shared session for ``api_key`` (``None`` = keys from the environment)."""
+    from alpaca.trading.client import TradingClient
+
+    client = TradingClient(api_key, api_secret, paper=False, raw_data=raw_data)
+    client._session = shared_session(api_key)
+    client._retry = 0  # retries happen in the session, with backoff, instead of alpaca-py's fixed 3s sleeps
+    return client
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """endpoint -> {requests, retries, throttled, errors, wait_sec} since start (or ``reset_stats``)."""
+    return _stats.snapshot()
+
+
+def reset_stats() -> None:
+    _stats.reset()
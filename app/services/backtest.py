@@ -0,0 +1,439 @@
+from __future__ import annotations
+
+"""
+Event-driven backtester.
+
+Stored TSLA/TSLL/TSDD bars and the historical sentiment blobs are replayed
+through the live decision rules (``decide_batch``, which matches ``decide``
+row for row) and then through the live ``TraderEngine`` itself: each bar's
+decision is handed to ``process_once``, whose ``OrderManager`` and
+``FlipExecutor`` place orders on a ``MockBroker``. Conviction sizing, the
+spread guard, the one-position rule with flip cooldown, concurrent flips with a
+deadline, replace throttling, extended-hours FOK windows, the protective
+stop-limit and the P80 take-profit are therefore the production code, not a
+re-implementation. The engine runs on a ``SimClock``, so its timers fire in
+virtual time on this thread and a run is deterministic.
+
+Each bar is replayed as a deterministic quote path (open, low/high in the
+direction of the bar, close) with a synthetic half spread. That path fills
+the orders placed at the previous close, and the decision taken at this close
+is acted on before the next bar. Everything reads from plain numpy arrays
+(``BacktestData``), so a run is a single pass with no I/O, and the arrays can
+be shared across processes for parameter sweeps.
+"""
+
+import math
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from app.config import settings as cfg
+from app.config.paths import BARS_DIR, DATA_DIR
+from app.core.clock import SimClock
+from app.services.bar_cache import interval_seconds
+from app.services.bar_store import BarStore
+from app.services.broker_state import BrokerState
+from app.services.decision_engine import DecisionKnobs, DecisionResult, decide_batch
+from app.services.decision_service import DecisionTick
+from app.services.market_data import Quote, QuoteSnapshot
+from app.services.mock_broker import FillModel, MockBroker, MockOrder
+from app.services.trader import TraderEngine
+
+NY = pytz.timezone(cfg.TZ)
+OHLC = ("Open", "High", "Low", "Close")
+ARRAY_FIELDS = (
+    "ts", "tsll", "tsdd", "p_up", "sentiment", "vwap_bps", "session_pre", "session_rth", "session_after",
+)
+
+
+@dataclass
+class BacktestData:
+    """Aligned per-bar inputs. ``tsll``/``tsdd`` are (n, 4) OHLC; NaN marks a missing input."""
+
+    interval: str
+    ts: np.ndarray  # int64 UTC ns, bar start
+    tsll: np.ndarray
+    tsdd: np.ndarray
+    p_up: np.ndarray
+    sentiment: np.ndarray
+    vwap_bps: np.ndarray
+    session_pre: np.ndarray
+    session_rth: np.ndarray
+    session_after: np.ndarray
+    half_spread_bps: float = cfg.BACKTEST_HALF_SPREAD_BPS
+
+    def __len__(self) -> int:
+        return int(len(self.ts))
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in ARRAY_FIELDS}
+
+    @classmethod
+    def from_arrays(cls, interval: str, arrays: Dict[str, np.ndarray], half_spread_bps: float) -> "BacktestData":
+        return cls(interval=interval, half_spread_bps=half_spread_bps, **{k: arrays[k] for k in ARRAY_FIELDS})
+
+
+@dataclass
+class BacktestConfig:
+    knobs: Optional[DecisionKnobs] = None  # None: the current runtime state, like the live engine
+    risk: cfg.RiskSettings = field(default_factory=cfg.RiskSettings)
+    session: cfg.SessionToggles = field(default_factory=cfg.SessionToggles)
+    flip_cooldown_sec: float = cfg.FLIP_COOLDOWN_SEC
+    flip_deadline_sec: float = cfg.FLIP_DEADLINE_SEC
+    take_profit_keep: float = 0.8
+    starting_cash: float = 10_000.0
+    fill_model: FillModel = field(default_factory=FillModel)
+
+
+@dataclass
+class BacktestResult:
+    equity: pd.Series
+    trades: pd.DataFrame
+    decisions: pd.DataFrame
+    stats: Dict[str, float]
+
+
+# --------------- Loading ---------------
+def session_flags(index: pd.DatetimeIndex) -> tuple:
+    """(pre, rth, after) boolean arrays for NY-local bar start times."""
+    minutes = index.hour * 60 + index.minute
+    pre = (minutes >= 4 * 60) & (minutes < 9 * 60 + 30)
+    rth = (minutes >= 9 * 60 + 30) & (minutes < 16 * 60)
+    after = (minutes >= 16 * 60) & (minutes < 20 * 60)
+    return np.asarray(pre), np.asarray(rth), np.asarray(after)
+
+
+def bars_from_closes(
+    tsll_close: Any,
+    tsdd_close: Any,
+    p_up: Any,
+    start: str = "2025-09-22 10:00",
+    sentiment: Any = np.nan,
+    vwap_bps: Any = np.nan,
+    half_spread_bps: float = 2.0,
+) -> BacktestData:
+    """Synthetic 1m data from close series (tests, benchmarks): each bar opens at the previous close.
+
+    ``sentiment`` and ``vwap_bps`` take a scalar or one value per bar.
+    """
+    p_up = np.asarray(p_up, dtype=float)
+    n = len(p_up)
+    index = pd.date_range(start, periods=n, freq="1min", tz=NY)
+
+    def ohlc(close: Any) -> np.ndarray:
+        close = np.asarray(close, dtype=float)
+        prev = np.r_[close[0], close[:-1]]
+        return np.c_[prev, np.maximum(prev, close), np.minimum(prev, close), close]
+
+    pre, rth, after = session_flags(index)
+    return BacktestData(
+        interval="1m",
+        ts=index.tz_convert("UTC").asi8,
+        tsll=ohlc(tsll_close),
+        tsdd=ohlc(tsdd_close),
+        p_up=p_up,
+        sentiment=np.broadcast_to(np.asarray(sentiment, dtype=float), (n,)).copy(),
+        vwap_bps=np.broadcast_to(np.asarray(vwap_bps, dtype=float), (n,)).copy(),
+        session_pre=pre,
+        session_rth=rth,
+        session_after=after,
+        half_spread_bps=half_spread_bps,
+    )
+
+
+def sentiment_at(close_epoch: np.ndarray, history: List[tuple]) -> np.ndarray:
+    """Latest daily score published at or before each bar close (NaN before the first one)."""
+    if not history:
+        return np.full(len(close_epoch), np.nan)
+    at = np.array([h[0] for h in history], dtype=float)
+    score = np.array([h[1] for h in history], dtype=float)
+    idx = np.searchsorted(at, close_epoch, side="right") - 1
+    return np.where(idx >= 0, score[np.maximum(idx, 0)], np.nan)
+
+
+def load_data(
+    interval: str = "5m",
+    days: int = 60,
+    store: Optional[BarStore] = None,
+    sentiment_dir: Path = DATA_DIR / "sentiment",
+    model: Any = None,
+    half_spread_bps: float = cfg.BACKTEST_HALF_SPREAD_BPS,
+) -> BacktestData:
+    """Build aligned arrays from the bar store, the fused model and the sentiment history."""
+    from app.services import features
+    from app.services.history import with_session_columns
+    from app.services.model import predict_p_up_batch
+    from app.services.sentiment import load_daily_score_history
+
+    store = store or BarStore(BARS_DIR)
+    frames = {sym: store.read(sym, interval, days) for sym in (cfg.TSLA_SYMBOL, cfg.TSLL_SYMBOL, cfg.TSDD_SYMBOL)}
+    index = frames[cfg.TSLA_SYMBOL].index
+    for df in frames.values():
+        index = index.intersection(df.index)
+    if len(index) == 0:
+        raise ValueError(f"no overlapping {interval} bars for {cfg.TSLA_SYMBOL}/{cfg.TSLL_SYMBOL}/{cfg.TSDD_SYMBOL}")
+
+    tsla = features.add_all_features(with_session_columns(frames[cfg.TSLA_SYMBOL].loc[index]))
+    p_up = predict_p_up_batch(tsla[features.FEATURE_COLS].to_numpy(dtype=float), model)
+    vwap_bps = np.where(tsla["IsRTH"].to_numpy(dtype=bool), tsla["vwap_dist_rth"].to_numpy(dtype=float) * 10_000.0, np.nan)
+
+    ts = index.tz_convert("UTC").asi8.astype(np.int64)
+    close_epoch = ts / 1e9 + interval_seconds(interval)
+    pre, rth, after = session_flags(index)
+    return BacktestData(
+        interval=interval,
+        ts=ts,
+        tsll=frames[cfg.TSLL_SYMBOL].loc[index, list(OHLC)].to_numpy(dtype=float),
+        tsdd=frames[cfg.TSDD_SYMBOL].loc[index, list(OHLC)].to_numpy(dtype=float),
+        p_up=np.asarray(p_up, dtype=float),
+        sentiment=sentiment_at(close_epoch, load_daily_score_history(sentiment_dir)),
+        vwap_bps=vwap_bps,
+        session_pre=pre,
+        session_rth=rth,
+        session_after=after,
+        half_spread_bps=half_spread_bps,
+    )
+
+
+# --------------- Simulation ---------------
+class _Recorder:
+    """In-memory stand-in for the trade store; the trader's trade log feeds the per-bar actions."""
+
+    def __init__(self) -> None:
+        self.trades: List[Dict[str, Any]] = []
+
+    def log_trade(self, **row: Any) -> None:
+        self.trades.append(row)
+
+    def log_order(self, order: Any) -> None:
+        pass
+
+    def log_decision(self, tick: Any) -> None:
+        pass
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return True
+
+
+class _Replay:
+    """Decision source for the trader: the precomputed batch row of the bar being acted on."""
+
+    sentiment_dir = DATA_DIR / "sentiment"
+
+    def __init__(self, session: cfg.SessionToggles) -> None:
+        self.session = session
+        self.tick: Optional[DecisionTick] = None
+
+    def current(self) -> DecisionTick:
+        assert self.tick is not None
+        return self.tick
+
+
+class Backtester:
+    def __init__(self, data: BacktestData, config: Optional[BacktestConfig] = None) -> None:
+        self.data = data
+        self.config = config or BacktestConfig()
+        self.step = float(interval_seconds(data.interval))
+        self.clock = SimClock()
+        self.broker = MockBroker(
+            cash=self.config.starting_cash, fill_model=self.config.fill_model, clock=self.clock, sleep=lambda _s: None,
+        )
+        self._hs = data.half_spread_bps / 10_000.0
+        self._store = _Recorder()
+        self._decisions = _Replay(self.config.session)
+        # The live engine, on virtual time: its order manager, flip executor and policies run as-is
+        self.engine = TraderEngine(
+            self.broker,  # type: ignore[arg-type]
+            decisions=self._decisions,  # type: ignore[arg-type]
+            broker=BrokerState(self.broker, ttl_sec=0.0),  # type: ignore[arg-type]
+            store=self._store,
+            clock=self.clock,
+            quote=self._quote,
+        )
+        self.engine.risk = self.engine.orders.risk = self.config.risk
+        self.engine.flip_cooldown_sec = self.config.flip_cooldown_sec
+        self.engine.take_profit_keep = self.config.take_profit_keep
+        self.engine.flips.deadline_sec = self.config.flip_deadline_sec
+        self.broker.subscribe(self.engine.orders.on_trade_update)
+
+    # ---- Quotes ----
+    def _snapshot(self) -> QuoteSnapshot:
+        return QuoteSnapshot({s: {**q.as_dict(), "stale": False} for s, q in self.broker.quotes.items()}, self.clock.now)
+
+    def _quote(self, symbol: str) -> Dict[str, Any]:
+        return self._snapshot().get(symbol)
+
+    def _replay_bar(self, i: int, t0: float) -> None:
+        paths = []
+        for symbol, ohlc in ((cfg.TSLL_SYMBOL, self.data.tsll[i]), (cfg.TSDD_SYMBOL, self.data.tsdd[i])):
+            o, h, l, c = ohlc
+            paths.append((symbol, (o, l, h, c) if c >= o else (o, h, l, c)))
+        for k in range(4):
+            t = t0 + self.step * k / 3.0
+            self.clock.advance(t)  # order windows, flip deadlines and queued replaces due by now
+            for symbol, path in paths:
+                px = float(path[k])
+                if px > 0:
+                    q = Quote(symbol, px * (1.0 - self._hs), px * (1.0 + self._hs), px, None, t)
+                    self.broker.on_quote(q)
+                    self.engine.orders.on_quote(q)
+        self.clock.advance(t0 + self.step)
+
+    # ---- Run ----
+    def run(self, detail: bool = True) -> BacktestResult:
+        """Replay every bar. ``detail=False`` skips the trades/decisions frames (sweeps only need stats)."""
+        started = time.perf_counter()
+        d = self.data
+        n = len(d)
+        tsll_close, tsdd_close = d.tsll[:, 3], d.tsdd[:, 3]
+        spread = 2.0 * d.half_spread_bps  # bid/ask sit half a spread either side of the bar price
+        spreads = np.where(tsll_close > 0, spread, np.nan), np.where(tsdd_close > 0, spread, np.nan)
+        toggles = self.config.session
+        # Like decision_service.session_flags: each session's toggle AND-ed with the bar's clock time
+        sessions = (d.session_pre & toggles.pre, d.session_rth & toggles.rth, d.session_after & toggles.after)
+        batch = decide_batch(
+            d.p_up, d.sentiment, spreads[0], spreads[1], d.vwap_bps, *sessions, self.config.knobs,
+        )
+        labels = batch.side_labels()
+        actions = np.empty(n, dtype=object)
+        equity = np.empty(n)
+        ts_sec = d.ts / 1e9
+        index = pd.DatetimeIndex(pd.to_datetime(d.ts, utc=True)).tz_convert(NY)
+        days = index.normalize().asi8
+        self.clock.advance(float(ts_sec[0]) if n else 0.0)
+
+        for i in range(n):
+            if i and days[i] != days[i - 1]:
+                self.broker.expire_day_orders()  # DAY orders don't outlive their trading day
+            self._replay_bar(i, float(ts_sec[i]))
+            equity[i] = self.broker.cash + sum(
+                p.qty * (self.broker.quotes[s].bid or 0.0) for s, p in self.broker.positions.items()
+            )
+            self._decisions.tick = DecisionTick(
+                seq=i,
+                ts=self.clock.now,
+                result=DecisionResult(
+                    side=labels[i],
+                    conviction=float(batch.conviction[i]),
+                    gate=float(batch.gate[i]),
+                    p_up=float(d.p_up[i]),
+                    p_sent=float(d.sentiment[i]),
+                    p_blend=float(batch.p_blend[i]),
+                    spread_bps_tsll=float(spreads[0][i]),
+                    spread_bps_tsdd=float(spreads[1][i]),
+                    vwap_bps_tsla=float(d.vwap_bps[i]),
+                    reasons={},
+                ),
+                quotes=self._snapshot(),
+                session_pre=bool(sessions[0][i]),
+                session_rth=bool(sessions[1][i]),
+                session_after=bool(sessions[2][i]),
+            )
+            logged = len(self._store.trades)
+            self.engine.process_once()
+            self.clock.advance(self.clock.now)  # the replaces and resubmits it queued
+            actions[i] = "+".join(row["action"] for row in self._store.trades[logged:]) or "-"
+
+        wall = time.perf_counter() - started
+        equity_s = pd.Series(equity, index=index, name="equity")
+        stats = self._stats(equity_s, wall)
+        if not detail:
+            return BacktestResult(equity_s, pd.DataFrame(), pd.DataFrame(), stats)
+        return BacktestResult(equity_s, self._trades_frame(), self._decisions_frame(index, batch, spreads, actions), stats)
+
+    def _decisions_frame(self, index: pd.DatetimeIndex, batch: Any, spreads: tuple, actions: np.ndarray) -> pd.DataFrame:
+        d = self.data
+        p_up = np.where(np.isnan(d.p_up), 0.5, d.p_up)
+        p_sent = np.where(np.isnan(d.sentiment), 0.5, np.clip((d.sentiment + 1.0) / 2.0, 0.0, 1.0))
+        return pd.DataFrame(
+            {
+                "side": batch.side_labels(),
+                "conviction": batch.conviction,
+                "gate": batch.gate,
+                "p_up": p_up,
+                "p_sent": p_sent,
+                "p_blend": batch.p_blend,
+                "spread_bps_tsll": spreads[0],
+                "spread_bps_tsdd": spreads[1],
+                "vwap_bps_tsla": np.where(d.session_rth, d.vwap_bps, np.nan),
+                "spread_block": batch.spread_block,
+                "no_trade_buffer": batch.no_trade_buffer,
+                "session_pre": d.session_pre,
+                "session_rth": d.session_rth,
+                "session_after": d.session_after,
+                "action": actions,
+            },
+            index=index,
+        )
+
+    # ---- Orders ----
+    def _placed(self) -> List[MockOrder]:
+        """Every order the trader placed, in submission order (replacements are folded into their original)."""
+        replacements = {o.replaced_by for o in self.broker.orders.values() if o.replaced_by}
+        return [o for o in self.broker.orders.values() if o.id not in replacements]
+
+    def _chain_end(self, order: MockOrder) -> MockOrder:
+        while order.status == "replaced" and order.replaced_by:
+            order = self.broker.orders[order.replaced_by]
+        return order
+
+    def _filled(self, order: MockOrder) -> tuple:
+        """(qty, notional) across an order and its replacements."""
+        qty = notional = 0.0
+        while True:
+            qty += order.filled_qty
+            notional += order.filled_qty * (order.filled_avg_price or 0.0)
+            if order.status == "replaced" and order.replaced_by:
+                order = self.broker.orders[order.replaced_by]
+                continue
+            return qty, notional
+
+    def _trades_frame(self) -> pd.DataFrame:
+        rows = []
+        for order in self._placed():
+            qty, notional = self._filled(order)
+            rows.append({
+                "ts": pd.Timestamp(order.submitted_ts, unit="s", tz="UTC").tz_convert(NY),
+                "action": "STOP" if order.type == "stop_limit" else ("ENTRY" if order.side == "buy" else "EXIT"),
+                "symbol": order.symbol,
+                "side": order.side.upper(),
+                "qty": order.qty,
+                "limit_price": order.limit_price,
+                "filled_qty": qty,
+                "avg_price": notional / qty if qty else np.nan,
+                "status": self._chain_end(order).status,
+            })
+        return pd.DataFrame(
+            rows, columns=["ts", "action", "symbol", "side", "qty", "limit_price", "filled_qty", "avg_price", "status"]
+        )
+
+    def _stats(self, equity: pd.Series, wall: float) -> Dict[str, float]:
+        start = self.config.starting_cash
+        values = equity.to_numpy()
+        peak = np.maximum.accumulate(values) if len(values) else values
+        returns = np.diff(values) / values[:-1] if len(values) > 1 else np.array([])
+        days = max(1, equity.index.normalize().nunique()) if len(values) else 1
+        per_year = math.sqrt(252.0 * len(values) / days)
+        sd = float(returns.std()) if len(returns) else 0.0
+        simulated = len(values) * self.step
+        placed = self._placed()
+        return {
+            "bars": float(len(values)),
+            "final_equity": float(values[-1]) if len(values) else start,
+            "total_return": float(values[-1] / start - 1.0) if len(values) else 0.0,
+            "max_drawdown": float(((values - peak) / peak).min()) if len(values) else 0.0,
+            "sharpe": float(returns.mean() / sd * per_year) if sd > 0 else 0.0,
+            "orders": float(len(placed)),
+            "filled_orders": float(sum(1 for order in placed if self._filled(order)[0] > 0)),
+            "wall_sec": wall,
+            "speedup": simulated / wall if wall > 0 else float("inf"),
+        }
+
+
+def run_backtest(data: BacktestData, config: Optional[BacktestConfig] = None, detail: bool = True) -> BacktestResult:
+    return Backtester(data, config).run(detail)
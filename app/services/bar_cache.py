@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+"""
+In-process bar cache shared by the model, VWAP and GUI consumers.
+
+Entries are keyed by ``(symbol, interval, period)`` and stay valid until the
+next bar of that interval closes (plus a small grace for the provider to
+publish it). Concurrent misses on the same key are coalesced: the first caller
+runs the loader, everyone else waits on the same in-flight result.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config import settings as cfg
+
+CacheKey = Tuple[str, str, str]
+
+_INTERVAL_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "1h": 3600}
+
+
+def interval_seconds(interval: str) -> int:
+    try:
+        return _INTERVAL_SECONDS[interval]
+    except KeyError:
+        raise ValueError(f"unsupported interval: {interval}") from None
+
+
+def next_bar_close(now: float, interval: str) -> float:
+    """Epoch seconds of the first bar boundary strictly after ``now``."""
+    step = interval_seconds(interval)
+    return (int(now // step) + 1) * step
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+
+
+class BarCache:
+    """Thread-safe TTL cache with single-flight loading."""
+
+    def __init__(self, grace_sec: float = cfg.BAR_CACHE_GRACE_SEC, clock: Callable[[], float] = time.time) -> None:
+        self.grace_sec = grace_sec
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[CacheKey, _Entry] = {}
+        self._inflight: Dict[CacheKey, Future] = {}
+
+    def get(self, key: CacheKey, loader: Callable[[], Any]) -> Any:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires_at:
+                return entry.value
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[key] = fut
+        assert fut is not None
+        if not owner:
+            return fut.result()
+
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(exc)
+            raise
+        expires_at = next_bar_close(self._clock(), key[1]) + self.grace_sec
+        with self._lock:
+            self._entries[key] = _Entry(value=value, expires_at=expires_at)
+            self._inflight.pop(key, None)
+        fut.set_result(value)
+        return value
+
+    def invalidate(self, key: Optional[CacheKey] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+bar_cache = BarCache()
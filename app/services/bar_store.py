@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+"""
+On-disk bar store partitioned by symbol / interval / trading day.
+
+Layout: ``<root>/<SYMBOL>/<interval>/<YYYY-MM-DD>.npz`` with one array per
+column (``ts`` as int64 UTC nanoseconds plus OHLCV), so a day loads with a
+single ``np.load`` and no parsing. ``_meta.json`` next to the partitions
+records the widest lookback that has been fully downloaded.
+
+A partition that can't be decoded is renamed to ``<YYYY-MM-DD>.npz.bad`` and
+the coverage is reset, so the next top-up downloads the window again once.
+``prune`` drops the partitions, quarantined or not, that fall outside the
+retained days.
+"""
+
+import os
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from app.core.storage import read_json, write_json_atomic
+
+NY = pytz.timezone("America/New_York")
+COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+_META = "_meta.json"
+
+
+class BarStore:
+    """Columnar, day-partitioned OHLCV cache used behind the yfinance fetchers."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self._lock = threading.RLock()  # reentrant: a read inside write() may quarantine
+
+    # ---- Layout ----
+    def _dir(self, symbol: str, interval: str) -> Path:
+        return self.root / symbol.upper() / interval
+
+    def days(self, symbol: str, interval: str) -> List[str]:
+        d = self._dir(symbol, interval)
+        if not d.exists():
+            return []
+        return sorted(p.stem for p in d.glob("*.npz"))
+
+    # ---- Coverage metadata ----
+    def covered_days(self, symbol: str, interval: str) -> int:
+        meta = read_json(self._dir(symbol, interval) / _META, default={}) or {}
+        try:
+            return int(meta.get("covered_days", 0))
+        except (TypeError, ValueError):
+            return 0
+
+    def mark_covered(self, symbol: str, interval: str, days: int) -> None:
+        path = self._dir(symbol, interval) / _META
+        with self._lock:
+            meta = read_json(path, default={}) or {}
+            meta["covered_days"] = max(int(meta.get("covered_days", 0) or 0), int(days))
+            write_json_atomic(path, meta)
+
+    # ---- Reads ----
+    def _load_day(self, symbol: str, interval: str, day: str) -> Optional[dict]:
+        path = self._dir(symbol, interval) / f"{day}.npz"
+        try:
+            with np.load(path) as npz:
+                return {k: npz[k] for k in ("ts",) + COLUMNS}
+        except FileNotFoundError:
+            return None
+        except (EOFError, KeyError, ValueError, zipfile.BadZipFile) as e:
+            self._quarantine(symbol, interval, path, e)
+            return None
+        except OSError as e:  # not the file's fault (permissions, too many open files): leave it be
+            print(f"[BarStore] could not read {path}: {e}")
+            return None
+
+    def _quarantine(self, symbol: str, interval: str, path: Path, error: Exception) -> None:
+        bad = path.with_name(path.name + ".bad")
+        with self._lock:
+            try:
+                os.replace(path, bad)
+            except OSError as e:
+                print(f"[BarStore] corrupt partition {path} ({error}) could not be moved aside: {e}")
+                return
+            meta_path = self._dir(symbol, interval) / _META
+            meta = read_json(meta_path, default={}) or {}
+            meta["covered_days"] = 0  # the window has a hole now: download it again once
+            write_json_atomic(meta_path, meta)
+        print(f"[BarStore] corrupt partition {path} ({error}); moved to {bad.name}")
+
+    def last_timestamp(self, symbol: str, interval: str) -> Optional[pd.Timestamp]:
+        for day in reversed(self.days(symbol, interval)):
+            part = self._load_day(symbol, interval, day)
+            if part is not None and len(part["ts"]):
+                return pd.Timestamp(int(part["ts"][-1]), tz="UTC").tz_convert(NY)
+        return None
+
+    def read(self, symbol: str, interval: str, last_days: int) -> pd.DataFrame:
+        """Return the most recent ``last_days`` trading days as an OHLCV frame (NY index)."""
+        parts = []
+        days = self.days(symbol, interval)[-int(last_days):] if last_days > 0 else []
+        for day in days:
+            part = self._load_day(symbol, interval, day)
+            if part is not None and len(part["ts"]):
+                parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=list(COLUMNS))
+        cols = {c: np.concatenate([p[c] for p in parts]) for c in ("ts",) + COLUMNS}
+        index = pd.DatetimeIndex(pd.to_datetime(cols.pop("ts"), utc=True)).tz_convert(NY)
+        index.name = "Datetime"
+        return pd.DataFrame(cols, index=index)
+
+    # ---- Retention ----
+    def prune(self, symbol: str, interval: str, keep_days: int) -> int:
+        """Delete partitions (and quarantined ones) older than the newest ``keep_days`` trading days."""
+        days = self.days(symbol, interval)
+        if keep_days <= 0 or len(days) <= keep_days:
+            return 0
+        oldest = days[-keep_days]
+        removed = 0
+        with self._lock:
+            for path in self._dir(symbol, interval).glob("*.npz*"):
+                if path.name[:10] < oldest:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+        return removed
+
+    # ---- Writes ----
+    def write(self, symbol: str, interval: str, df: pd.DataFrame) -> int:
+        """Merge ``df`` (OHLCV, tz-aware index) into the store; newer rows win. Returns rows written."""
+        if df is None or df.empty:
+            return 0
+        df = df[~df.index.duplicated(keep="last")].sort_index()
+        ts_all = df.index.tz_convert("UTC").asi8
+        days = np.asarray([d.isoformat() for d in df.index.tz_convert(NY).date])
+        d = self._dir(symbol, interval)
+        d.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            for day in np.unique(days):
+                mask = days == day
+                new = {"ts": ts_all[mask]}
+                for c in COLUMNS:
+                    new[c] = df[c].to_numpy()[mask]
+                old = self._load_day(symbol, interval, str(day))
+                if old is not None and len(old["ts"]):
+                    keep = ~np.isin(old["ts"], new["ts"])
+                    merged = {k: np.concatenate([old[k][keep], new[k]]) for k in new}
+                    order = np.argsort(merged["ts"], kind="stable")
+                    new = {k: v[order] for k, v in merged.items()}
+                self._save_day(d / f"{day}.npz", new)
+        return int(len(ts_all))
+
+    @staticmethod
+    def _save_day(path: Path, arrays: dict) -> None:
+        fd, tmp = tempfile.mkstemp(prefix=path.stem, suffix=".npz", dir=str(path.parent))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, path)
+        finally:
+            try:
+                if os.path.exists(tmp): os.remove(tmp)
+            except Exception: pass
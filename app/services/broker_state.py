@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+"""
+Cached broker state: account, positions and open orders.
+
+Each of the three is fetched with one API call and served from memory for
+``ttl_sec``. Order and fill events (from the trade-update stream, or our own
+submits/cancels) invalidate the cache immediately, so readers see fresh state
+right after anything changes and at most one request per TTL otherwise.
+Concurrent misses are coalesced like ``BarCache``: one caller fetches, the rest
+wait for its result. A fetch that was already in flight when an invalidation
+arrived is returned to its waiters but not cached.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import settings as cfg
+from app.services.alpaca_client import AlpacaService
+
+ACCOUNT = "account"
+POSITIONS = "positions"
+ORDERS = "orders"
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+
+
+class BrokerState:
+    def __init__(
+        self,
+        alpaca: AlpacaService,
+        ttl_sec: float = cfg.BROKER_STATE_TTL_SEC,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.alpaca = alpaca
+        self.ttl_sec = ttl_sec
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._generation: Dict[str, int] = {ACCOUNT: 0, POSITIONS: 0, ORDERS: 0}
+        self.fetches: Dict[str, int] = {ACCOUNT: 0, POSITIONS: 0, ORDERS: 0}
+
+    # --------------- Reads ---------------
+    def account(self) -> Any:
+        return self._get(ACCOUNT, self.alpaca.get_account)
+
+    def positions(self) -> Dict[str, Any]:
+        """Open positions keyed by symbol."""
+        return self._get(POSITIONS, self._load_positions)
+
+    def position(self, symbol: str) -> Optional[Any]:
+        return self.positions().get(symbol)
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[Any]:
+        orders = self._get(ORDERS, self.alpaca.get_open_orders)
+        if symbol is None:
+            return list(orders)
+        return [o for o in orders if (getattr(o, "symbol", None) or getattr(o, "asset_symbol", None)) == symbol]
+
+    def _load_positions(self) -> Dict[str, Any]:
+        return {str(getattr(p, "symbol", "")): p for p in (self.alpaca.get_all_positions() or [])}
+
+    def _get(self, key: str, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._clock() < entry.expires_at:
+                return entry.value
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[key] = fut
+                self.fetches[key] += 1
+            generation = self._generation[key]
+        assert fut is not None
+        if not owner:
+            return fut.result()
+
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(exc)
+            raise
+        with self._lock:
+            if self._generation[key] == generation:
+                self._entries[key] = _Entry(value=value, expires_at=self._clock() + self.ttl_sec)
+            self._inflight.pop(key, None)
+        fut.set_result(value)
+        return value
+
+    # --------------- Invalidation ---------------
+    def invalidate(self, *keys: str) -> None:
+        """Drop the given entries (all of them if none are named)."""
+        with self._lock:
+            for key in keys or tuple(self._generation):
+                self._entries.pop(key, None)
+                self._generation[key] += 1
+
+    def on_trade_update(self, event: str, update: Any = None) -> None:
+        """Trade-update stream listener: fills move cash and positions; any event changes the order book."""
+        if event in ("fill", "partial_fill"):
+            self.invalidate()
+        else:
+            self.invalidate(ORDERS)
+
+
+_shared: Dict[str, BrokerState] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_broker_state(
+    api_key: Optional[str], api_secret: Optional[str], alpaca: Optional[AlpacaService] = None
+) -> BrokerState:
+    """
+    One cache per Alpaca key pair, shared by the trader and the dashboard. Without explicit keys
+    (client configured from the environment) the caller gets a private, unshared cache.
+    """
+    if not api_key:
+        return BrokerState(alpaca or AlpacaService(api_key, api_secret))
+    with _shared_lock:
+        state = _shared.get(api_key)
+        if state is None:
+            state = _shared[api_key] = BrokerState(alpaca or AlpacaService(api_key, api_secret))
+        return state
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+"""
+Time-series cross-validation for the direction model.
+
+Two splitters:
+- ``walk_forward_folds``: expanding training window; fold k tests the block right after it.
+- ``purged_kfold_folds``: contiguous test blocks; training uses every other row except a purge
+  gap before the block (labels look ahead, so they would leak the test period) and an embargo after.
+
+``run_folds`` fits the folds in a process pool. The feature matrix and labels are written once to
+``.npy`` files and every worker opens them with ``mmap_mode="r"``, so only fold boundaries are
+pickled to the workers. This module stays free of GUI/network imports so spawned workers start fast.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, precision_score, roc_auc_score
+from sklearn.preprocessing import StandardScaler
+
+Span = Tuple[int, int]  # [start, stop) row range
+
+
+@dataclass(frozen=True)
+class FoldSpec:
+    index: int
+    train: Tuple[Span, ...]
+    test: Span
+
+
+@dataclass
+class FoldMetrics:
+    fold: int
+    n_train: int
+    n_test: int
+    accuracy: float
+    roc_auc: float
+    precision_up: float
+    elapsed_sec: float
+
+
+def fit_scaled_logreg(Xtr: np.ndarray, ytr: np.ndarray) -> Tuple[StandardScaler, LogisticRegression]:
+    scaler = StandardScaler()
+    Xtr_s = scaler.fit_transform(Xtr)
+    clf = LogisticRegression(max_iter=1000, n_jobs=None)
+    clf.fit(Xtr_s, ytr)
+    return scaler, clf
+
+
+def classification_metrics(y_true: np.ndarray, proba: np.ndarray) -> Dict[str, float]:
+    pred = (proba >= 0.5).astype(int)
+    acc = accuracy_score(y_true, pred)
+    try:
+        auc = roc_auc_score(y_true, proba)
+    except Exception:
+        auc = float("nan")
+    try:
+        prec = precision_score(y_true, pred, zero_division=0)
+    except Exception:
+        prec = float("nan")
+    return {"accuracy": float(acc), "roc_auc": float(auc), "precision_up": float(prec)}
+
+
+def _blocks(n: int, k: int) -> List[Span]:
+    edges = np.linspace(0, n, k + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(edges[:-1], edges[1:])]
+
+
+def walk_forward_folds(n: int, n_folds: int, purge: int = 1, min_train: int = 200) -> List[FoldSpec]:
+    """Split ``n`` rows into ``n_folds + 1`` blocks; fold k trains on blocks 0..k and tests on block k+1."""
+    blocks = _blocks(n, n_folds + 1)
+    specs = []
+    for i, test in enumerate(blocks[1:]):
+        train_stop = max(0, test[0] - purge)
+        if train_stop < min_train or test[1] <= test[0]:
+            continue
+        specs.append(FoldSpec(index=len(specs), train=((0, train_stop),), test=test))
+    return specs
+
+
+def purged_kfold_folds(n: int, n_folds: int, purge: int = 1, embargo: int = 0, min_train: int = 200) -> List[FoldSpec]:
+    """Contiguous test blocks; training drops ``purge`` rows before and ``embargo`` rows after each block."""
+    specs = []
+    for test in _blocks(n, n_folds):
+        train = []
+        if test[0] - purge > 0:
+            train.append((0, test[0] - purge))
+        if test[1] + embargo < n:
+            train.append((test[1] + embargo, n))
+        if sum(b - a for a, b in train) < min_train or test[1] <= test[0]:
+            continue
+        specs.append(FoldSpec(index=len(specs), train=tuple(train), test=test))
+    return specs
+
+
+def _take(arr: np.ndarray, spans: Sequence[Span]) -> np.ndarray:
+    return np.concatenate([arr[a:b] for a, b in spans]) if len(spans) > 1 else np.asarray(arr[spans[0][0]:spans[0][1]])
+
+
+def _fit_fold(x_path: str, y_path: str, spec: FoldSpec) -> FoldMetrics:
+    t0 = time.perf_counter()
+    X = np.load(x_path, mmap_mode="r")
+    y = np.load(y_path, mmap_mode="r")
+    Xtr, ytr = _take(X, spec.train), _take(y, spec.train)
+    Xte, yte = _take(X, (spec.test,)), _take(y, (spec.test,))
+    scaler, clf = fit_scaled_logreg(Xtr, ytr)
+    proba = clf.predict_proba(scaler.transform(Xte))[:, 1]
+    m = classification_metrics(yte, proba)
+    return FoldMetrics(
+        fold=spec.index,
+        n_train=len(ytr),
+        n_test=len(yte),
+        accuracy=m["accuracy"],
+        roc_auc=m["roc_auc"],
+        precision_up=m["precision_up"],
+        elapsed_sec=time.perf_counter() - t0,
+    )
+
+
+def run_folds(
+    X: np.ndarray,
+    y: np.ndarray,
+    specs: Sequence[FoldSpec],
+    max_workers: Optional[int] = None,
+    on_fold: Optional[Callable[[FoldMetrics], None]] = None,
+) -> List[FoldMetrics]:
+    """Fit every fold (in parallel when ``max_workers`` != 1) and return metrics ordered by fold."""
+    if not specs:
+        return []
+    workers = max_workers or min(len(specs), os.cpu_count() or 1)
+    results: List[FoldMetrics] = []
+    with tempfile.TemporaryDirectory(prefix="cv_") as tmp:
+        x_path, y_path = os.path.join(tmp, "X.npy"), os.path.join(tmp, "y.npy")
+        np.save(x_path, np.ascontiguousarray(X, dtype=np.float64))
+        np.save(y_path, np.ascontiguousarray(y, dtype=np.int8))
+        if workers <= 1 or len(specs) == 1:
+            for spec in specs:
+                res = _fit_fold(x_path, y_path, spec)
+                results.append(res)
+                if on_fold is not None:
+                    on_fold(res)
+        else:
+            # spawn, not fork: the caller may be a GUI process with live threads
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                futures = [pool.submit(_fit_fold, x_path, y_path, spec) for spec in specs]
+                for fut in as_completed(futures):
+                    res = fut.result()
+                    results.append(res)
+                    if on_fold is not None:
+                        on_fold(res)
+    return sorted(results, key=lambda r: r.fold)
+
+
+def summarize(folds: Sequence[FoldMetrics]) -> Dict[str, float]:
+    """Mean of each metric across folds (NaN folds ignored)."""
+    out: Dict[str, float] = {}
+    for key in ("accuracy", "roc_auc", "precision_up"):
+        vals = np.array([getattr(f, key) for f in folds], dtype=float)
+        out[key] = float(np.nanmean(vals)) if np.isfinite(vals).any() else float("nan")
+    return out
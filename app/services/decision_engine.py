@@ -1,29 +1,25 @@
 from __future__ import annotations
 
-=======
-main
 """Deterministic decision engine for TSLA pair trading."""
 
+import contextvars
 import math
-from dataclasses import dataclass
-from typing import Dict, Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, FrozenSet, Mapping, Optional
 
+import numpy as np
 
 from app.config import settings as cfg
+from app.core import latency
 from app.core.runtime_state import state
 from app.services import pricing
 from app.services.live_vwap import vwap_distance_bps
-from app.services.market_data import get_quote
+from app.services.market_data import QuoteSnapshot, get_quote
 from app.services.model import predict_p_up_latest
-=======
-from app.core.runtime_state import state
-from app.config import settings as cfg
-from app.services.model import predict_p_up_latest
-from app.services.market_data import get_quote
-from app.services.pricing import spread_bps
-from app.services.live_vwap import vwap_distance_bps
-
-main
 
 ReasonsDict = Dict[str, float | str | bool]
 
@@ -33,13 +29,10 @@ class DecisionInputs:
 
     interval: str
     last_sentiment_daily: Optional[float]
-=======
-    interval: str                      # e.g. "5m"
-    last_sentiment_daily: Optional[float]  # [-1..1] or None
-main
     session_pre: bool
     session_rth: bool
     session_after: bool
+    quotes: Optional[QuoteSnapshot] = None  # caller's per-loop snapshot; fetched here if absent
 
 
 @dataclass
@@ -47,10 +40,6 @@ class DecisionResult:
 
     side: str
     conviction: float
-=======
-    side: str          # "TSLL" | "TSDD" | "HOLD"
-    conviction: float  # [0..1]
-main
     gate: float
     p_up: float
     p_sent: float
@@ -59,6 +48,7 @@ main
     spread_bps_tsdd: float
     vwap_bps_tsla: Optional[float]
     reasons: ReasonsDict
+    snapshot: Optional["DecisionSnapshot"] = field(default=None, compare=False, repr=False)  # set by decide()
 
 
 def _normalize_weights(w_model: float, w_sent: float) -> tuple[float, float]:
@@ -97,33 +87,316 @@ def _hold_result(
     )
 
 
+@dataclass(frozen=True)
+class DecisionKnobs:
+    """Every tunable the decision reads, captured once so a decision (or a batch) sees one set."""
+
+    w_model: float
+    w_sent: float
+    base_gate: float
+    spread_block: float
+    spread_hint: float
+    gate_buffer: float
+    gate_adj_spread_wide: float = cfg.GATE_ADJ_SPREAD_WIDE
+    gate_adj_extended: float = cfg.GATE_ADJ_EXTENDED
+    vwap_disagree_bps: float = cfg.VWAP_DISAGREE_BPS
+    conviction_dw_vwap: float = cfg.CONVICTION_DW_VWAP
+    conviction_dw_wide_spread: float = cfg.CONVICTION_DW_WIDE_SPREAD
+    gate_min: float = 0.45
+    gate_max: float = 0.70
+
+    @classmethod
+    def from_state(cls, **overrides: Any) -> "DecisionKnobs":
+        w_model, w_sent = _normalize_weights(float(state.w_model), float(state.w_sent))
+        knobs = cls(
+            w_model=w_model,
+            w_sent=w_sent,
+            base_gate=float(state.gate_threshold or cfg.GATE_THRESHOLD_DEFAULT),
+            spread_block=float(getattr(state, "spread_max_bps", cfg.SPREAD_MAX_BPS)),
+            spread_hint=float(getattr(state, "spread_wide_hint", cfg.SPREAD_WIDE_BPS_HINT)),
+            gate_buffer=float(getattr(state, "gate_buffer_near_coinflip", cfg.GATE_BUFFER_NEAR_COINFLIP)),
+            gate_adj_spread_wide=cfg.GATE_ADJ_SPREAD_WIDE,
+            gate_adj_extended=cfg.GATE_ADJ_EXTENDED,
+            vwap_disagree_bps=cfg.VWAP_DISAGREE_BPS,
+            conviction_dw_vwap=cfg.CONVICTION_DW_VWAP,
+            conviction_dw_wide_spread=cfg.CONVICTION_DW_WIDE_SPREAD,
+        )
+        return replace(knobs, **overrides) if overrides else knobs
+
+
+SIDE_HOLD, SIDE_TSLL, SIDE_TSDD = 0, 1, -1
+
+
+@dataclass
+class BatchDecision:
+    """Column-wise ``decide`` output; ``side`` holds SIDE_* codes."""
+
+    side: np.ndarray
+    conviction: np.ndarray
+    gate: np.ndarray
+    p_blend: np.ndarray
+    spread_block: np.ndarray
+    no_trade_buffer: np.ndarray
+
+    def side_labels(self) -> np.ndarray:
+        labels = np.array(["HOLD", cfg.TSLL_SYMBOL, cfg.TSDD_SYMBOL], dtype=object)
+        return labels[self.side]  # codes 0, 1, -1 index HOLD, TSLL, TSDD
+
+
+def decide_batch(
+    p_up: Any,
+    sentiment: Any,
+    spread_tsll: Any,
+    spread_tsdd: Any,
+    vwap_bps: Any,
+    session_pre: Any,
+    session_rth: Any,
+    session_after: Any,
+    knobs: Optional[DecisionKnobs] = None,
+    model_stale: Any = None,
+) -> BatchDecision:
+    """
+    Pure, vectorized ``decide``: the same gate/spread/buffer/conviction rules over whole arrays.
+    NaN stands for "missing" (model output, daily sentiment, VWAP distance); ``model_stale``
+    marks rows whose model input missed its deadline. Row i equals ``decide`` given the same
+    inputs and knobs; no quotes, VWAP or model are fetched here.
+    """
+    k = knobs or DecisionKnobs.from_state()
+    p_up = np.asarray(p_up, dtype=float)
+    sentiment = np.asarray(sentiment, dtype=float)
+    spread_tsll = np.asarray(spread_tsll, dtype=float)
+    spread_tsdd = np.asarray(spread_tsdd, dtype=float)
+    rth = np.asarray(session_rth, dtype=bool)
+    extended = np.asarray(session_pre, dtype=bool) | np.asarray(session_after, dtype=bool)
+    vwap = np.where(rth, np.asarray(vwap_bps, dtype=float), np.nan)
+
+    p_up = np.where(np.isnan(p_up), 0.5, p_up)
+    p_sent = np.where(np.isnan(sentiment), 0.5, np.clip((sentiment + 1.0) / 2.0, 0.0, 1.0))
+    p_blend = (k.w_model * p_up) + (k.w_sent * p_sent)
+
+    def _invalid(spread: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            return ~np.isfinite(spread) | (spread < 0) | (spread > 100_000)
+
+    bad = _invalid(spread_tsll) | _invalid(spread_tsdd)
+    max_spread = np.where(bad, 999999.0, np.maximum(spread_tsll, spread_tsdd))
+    held = np.zeros(p_blend.shape, dtype=bool)
+    if model_stale is not None and cfg.DECISION_HOLD_ON_STALE_MODEL:
+        held = np.asarray(model_stale, dtype=bool)
+    blocked = ~held & (max_spread > k.spread_block)
+    wide = max_spread > k.spread_hint
+
+    with np.errstate(invalid="ignore"):
+        vwap_disagree = ((p_blend >= 0.5) & (vwap < -k.vwap_disagree_bps)) | (
+            (p_blend < 0.5) & (vwap > k.vwap_disagree_bps)
+        )
+    gate = np.full(p_blend.shape, k.base_gate)
+    gate = gate + np.where(wide, k.gate_adj_spread_wide, 0.0)
+    gate = gate + np.where(extended, k.gate_adj_extended, 0.0)
+    gate = gate + np.where(vwap_disagree, k.gate_adj_extended, 0.0)
+    gate = np.maximum(k.gate_min, np.minimum(k.gate_max, gate))
+
+    buffered = ~held & ~blocked & (np.abs(p_blend - 0.5) < k.gate_buffer)
+    trade = ~held & ~blocked & ~buffered
+
+    conviction = np.abs(p_blend - 0.5) / np.maximum(1e-6, np.abs(gate - 0.5))
+    conviction = np.maximum(0.0, np.minimum(1.0, conviction))
+    conviction = conviction * np.where(vwap_disagree, k.conviction_dw_vwap, 1.0)
+    conviction = conviction * np.where(wide, k.conviction_dw_wide_spread, 1.0)
+    conviction = np.maximum(0.0, np.minimum(1.0, conviction))
+
+    side = np.where(p_blend >= gate, SIDE_TSLL, SIDE_TSDD).astype(np.int8)
+    return BatchDecision(
+        side=np.where(trade, side, SIDE_HOLD).astype(np.int8),
+        conviction=np.where(trade, conviction, 0.0),
+        gate=np.where(held | blocked, k.base_gate, gate),
+        p_blend=p_blend,
+        spread_block=blocked,
+        no_trade_buffer=buffered,
+    )
+
+
+@dataclass(frozen=True)
+class DecisionSnapshot:
+    """
+    Everything one decision reads, frozen at gather time. ``stale`` names inputs that missed
+    their deadline (their values are the fail-safe defaults); ``errors`` holds input exceptions.
+    """
+
+    interval: str
+    p_up_raw: float
+    last_sentiment_daily: Optional[float]
+    quote_tsll: Mapping[str, Any]
+    quote_tsdd: Mapping[str, Any]
+    vwap_bps_tsla: Optional[float]
+    session_pre: bool
+    session_rth: bool
+    session_after: bool
+    knobs: DecisionKnobs
+    taken_at: float
+    stale: FrozenSet[str] = frozenset()
+    errors: Mapping[str, str] = field(default_factory=dict)
+
+
+_input_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="DecisionInput")
+_inflight: Dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _timed(stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+    with latency.span(stage):
+        return fn(*args)
+
+
+def _submit(stage: str, fn: Callable[..., Any], *args: Any) -> Future:
+    # A fetch that misses its deadline keeps its worker until it returns. Later decisions join
+    # that same future instead of queueing more copies of a slow call behind it on the pool.
+    key = (stage, fn, args)
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        if fut is not None:
+            return fut
+        # Run in a copy of the caller's context so pins (e.g. the model version) and the
+        # latency trace carry over.
+        ctx = contextvars.copy_context()
+        fut = _inflight[key] = _input_pool.submit(ctx.run, _timed, stage, fn, *args)
+    fut.add_done_callback(lambda done: _forget(key, done))  # outside the lock: may run right here
+    return fut
+
+
+def _forget(key: tuple, fut: Future) -> None:
+    with _inflight_lock:
+        if _inflight.get(key) is fut:
+            del _inflight[key]
+
+
+def gather_inputs(
+    inputs: DecisionInputs,
+    deadline_sec: Optional[float] = None,
+    deadlines: Optional[Mapping[str, float]] = None,
+) -> DecisionSnapshot:
+    """
+    Fetch the model probability and VWAP distance concurrently, each bounded by its deadline
+    (``cfg.DECISION_INPUT_DEADLINE_SEC`` unless ``deadline_sec`` is given; ``deadlines`` overrides
+    it per input: "model", "vwap"), and read quotes from the streaming book. Latency is the
+    slowest input, not the sum. An input that misses its deadline is left at its fail-safe
+    default and listed in ``stale``; its fetch is still running and the next call waits on it
+    rather than starting another.
+    """
+    started = time.monotonic()
+    limit = cfg.DECISION_INPUT_DEADLINE_SEC if deadline_sec is None else deadline_sec
+    limits = {"model": limit, "vwap": limit, **(deadlines or {})}
+    pending: Dict[str, Future] = {"model": _submit("model", predict_p_up_latest, inputs.interval)}
+    if inputs.session_rth:
+        pending["vwap"] = _submit("vwap", vwap_distance_bps, cfg.TSLA_SYMBOL)
+
+    errors: Dict[str, str] = {}
+    stale = set()
+    with latency.span("quotes"):
+        try:
+            if inputs.quotes is not None:
+                q_tsll = inputs.quotes.get(cfg.TSLL_SYMBOL)
+                q_tsdd = inputs.quotes.get(cfg.TSDD_SYMBOL)
+            else:
+                q_tsll = get_quote(cfg.TSLL_SYMBOL)
+                q_tsdd = get_quote(cfg.TSDD_SYMBOL)
+            if q_tsll.get("stale") or q_tsdd.get("stale"):
+                stale.add("quote")
+        except Exception as exc:  # pragma: no cover - defensive fallback
+            errors["quote"] = str(exc)
+            q_tsll = q_tsdd = {"bid": None, "ask": None, "stale": True}
+
+    values: Dict[str, Any] = {"model": float("nan"), "vwap": None}
+    for name, fut in sorted(pending.items(), key=lambda kv: limits[kv[0]]):
+        remaining = limits[name] - (time.monotonic() - started)
+        try:
+            values[name] = fut.result(timeout=max(0.0, remaining))
+        except FutureTimeout:
+            stale.add(name)
+        except Exception as exc:
+            errors[name] = str(exc)
+
+    try:
+        p_up_raw = float(values["model"])
+    except (TypeError, ValueError):
+        p_up_raw = float("nan")
+
+    return DecisionSnapshot(
+        interval=inputs.interval,
+        p_up_raw=p_up_raw,
+        last_sentiment_daily=inputs.last_sentiment_daily,
+        quote_tsll=q_tsll,
+        quote_tsdd=q_tsdd,
+        vwap_bps_tsla=values["vwap"],
+        session_pre=inputs.session_pre,
+        session_rth=inputs.session_rth,
+        session_after=inputs.session_after,
+        knobs=DecisionKnobs.from_state(),
+        taken_at=time.time(),
+        stale=frozenset(stale),
+        errors=errors,
+    )
+
+
 def decide(inputs: DecisionInputs) -> DecisionResult:
-    """Blend model and sentiment inputs into a deterministic trading decision."""
+    """
+    Blend model and sentiment inputs into a deterministic trading decision. Per-stage timings
+    (``lat_<stage>_ms``) are added to ``reasons``.
+    """
 
+    with latency.trace() as trace:
+        with latency.span("decide"):
+            try:
+                with latency.span("inputs"):
+                    snapshot = gather_inputs(inputs)
+            except Exception as exc:  # pragma: no cover - hard safety
+                result = _hold_result(
+                    p_up=0.5,
+                    p_sent=0.5,
+                    p_blend=0.5,
+                    gate=float(state.gate_threshold or cfg.GATE_THRESHOLD_DEFAULT),
+                    spread_tsll=999999.0,
+                    spread_tsdd=999999.0,
+                    vwap_bps_tsla=None,
+                    reasons={"engine_error": str(exc)},
+                )
+            else:
+                with latency.span("gating"):
+                    result = decide_from_snapshot(snapshot)
+                result.snapshot = snapshot
+    result.reasons.update(trace.as_reasons())
+    return result
+
+
+def decide_from_snapshot(snap: DecisionSnapshot) -> DecisionResult:
+    """Pure decision over a frozen snapshot: no I/O, same output for the same snapshot."""
+
+    knobs = snap.knobs
     reasons: ReasonsDict = {
-        "session_pre": inputs.session_pre,
-        "session_rth": inputs.session_rth,
-        "session_after": inputs.session_after,
+        "session_pre": snap.session_pre,
+        "session_rth": snap.session_rth,
+        "session_after": snap.session_after,
     }
+    for name in sorted(snap.stale):
+        reasons[f"{name}_stale"] = True
+    if snap.stale:
+        reasons["stale_inputs"] = ",".join(sorted(snap.stale))
+    for name, message in snap.errors.items():
+        reasons[f"{name}_error"] = message
 
     try:
-        try:
-            p_up_raw = float(predict_p_up_latest(inputs.interval))
-        except Exception as exc:  # pragma: no cover - defensive logging only
-            reasons["model_error"] = str(exc)
-            p_up_raw = float("nan")
-
+        p_up_raw = snap.p_up_raw
         p_up = p_up_raw if not math.isnan(p_up_raw) else 0.5
 
-        if inputs.last_sentiment_daily is None or math.isnan(inputs.last_sentiment_daily):
+        if snap.last_sentiment_daily is None or math.isnan(snap.last_sentiment_daily):
             p_sent = 0.5
             reasons["sentiment_available"] = False
         else:
-            p_sent = (float(inputs.last_sentiment_daily) + 1.0) / 2.0
+            p_sent = (float(snap.last_sentiment_daily) + 1.0) / 2.0
             p_sent = _clamp(p_sent, 0.0, 1.0)
             reasons["sentiment_available"] = True
 
-        w_model_norm, w_sent_norm = _normalize_weights(float(state.w_model), float(state.w_sent))
+        w_model_norm, w_sent_norm = knobs.w_model, knobs.w_sent
         p_blend = (w_model_norm * p_up) + (w_sent_norm * p_sent)
 
         reasons.update(
@@ -136,15 +409,8 @@ def decide(inputs: DecisionInputs) -> DecisionResult:
             }
         )
 
-        try:
-            q_tsll = get_quote(cfg.TSLL_SYMBOL)
-            q_tsdd = get_quote(cfg.TSDD_SYMBOL)
-            spread_tsll = pricing.spread_bps(q_tsll["bid"], q_tsll["ask"])
-            spread_tsdd = pricing.spread_bps(q_tsdd["bid"], q_tsdd["ask"])
-        except Exception as exc:  # pragma: no cover - defensive fallback
-            reasons["quote_error"] = str(exc)
-            spread_tsll = spread_tsdd = 999999.0
-
+        spread_tsll = pricing.spread_bps(snap.quote_tsll["bid"], snap.quote_tsll["ask"])
+        spread_tsdd = pricing.spread_bps(snap.quote_tsdd["bid"], snap.quote_tsdd["ask"])
         for key, spread in (("spread_tsll", spread_tsll), ("spread_tsdd", spread_tsdd)):
             if not math.isfinite(spread) or spread < 0 or spread > 100_000:
                 reasons[f"{key}_invalid"] = True
@@ -156,25 +422,31 @@ def decide(inputs: DecisionInputs) -> DecisionResult:
         reasons["spread_bps_tsdd"] = spread_tsdd
         reasons["max_spread_bps"] = max_spread
 
-        vwap_bps_tsla: Optional[float]
-        if inputs.session_rth:
-            try:
-                vwap_bps_tsla = vwap_distance_bps(cfg.TSLA_SYMBOL)
-            except Exception as exc:  # pragma: no cover - defensive fallback
-                reasons["vwap_error"] = str(exc)
-                vwap_bps_tsla = None
-        else:
-            vwap_bps_tsla = None
+        vwap_bps_tsla = snap.vwap_bps_tsla if snap.session_rth else None
 
         reasons["vwap_bps_tsla"] = vwap_bps_tsla if vwap_bps_tsla is not None else "NA"
 
-        base_gate = float(state.gate_threshold or cfg.GATE_THRESHOLD_DEFAULT)
+        base_gate = knobs.base_gate
         reasons["base_gate"] = base_gate
         gate = base_gate
 
-        spread_block = float(getattr(state, "spread_max_bps", cfg.SPREAD_MAX_BPS))
-        spread_hint = float(getattr(state, "spread_wide_hint", cfg.SPREAD_WIDE_BPS_HINT))
-        gate_buffer = float(getattr(state, "gate_buffer_near_coinflip", cfg.GATE_BUFFER_NEAR_COINFLIP))
+        if "model" in snap.stale and cfg.DECISION_HOLD_ON_STALE_MODEL:
+            # p_up is only the 0.5 placeholder here; sentiment alone must not carry the gate
+            reasons["model_stale_hold"] = True
+            return _hold_result(
+                p_up=p_up,
+                p_sent=p_sent,
+                p_blend=p_blend,
+                gate=gate,
+                spread_tsll=spread_tsll,
+                spread_tsdd=spread_tsdd,
+                vwap_bps_tsla=vwap_bps_tsla,
+                reasons=reasons,
+            )
+
+        spread_block = knobs.spread_block
+        spread_hint = knobs.spread_hint
+        gate_buffer = knobs.gate_buffer
 
         if max_spread > spread_block:
             reasons["spread_block"] = True
@@ -190,25 +462,25 @@ def decide(inputs: DecisionInputs) -> DecisionResult:
             )
 
         if max_spread > spread_hint:
-            gate += cfg.GATE_ADJ_SPREAD_WIDE
-            reasons["gate_adj_spread"] = cfg.GATE_ADJ_SPREAD_WIDE
+            gate += knobs.gate_adj_spread_wide
+            reasons["gate_adj_spread"] = knobs.gate_adj_spread_wide
 
-        if inputs.session_pre or inputs.session_after:
-            gate += cfg.GATE_ADJ_EXTENDED
-            reasons["gate_adj_extended"] = cfg.GATE_ADJ_EXTENDED
+        if snap.session_pre or snap.session_after:
+            gate += knobs.gate_adj_extended
+            reasons["gate_adj_extended"] = knobs.gate_adj_extended
 
         vwap_disagree = False
         if vwap_bps_tsla is not None:
-            if p_blend >= 0.5 and vwap_bps_tsla < -cfg.VWAP_DISAGREE_BPS:
-                gate += cfg.GATE_ADJ_EXTENDED
-                reasons["gate_adj_vwap"] = cfg.GATE_ADJ_EXTENDED
+            if p_blend >= 0.5 and vwap_bps_tsla < -knobs.vwap_disagree_bps:
+                gate += knobs.gate_adj_extended
+                reasons["gate_adj_vwap"] = knobs.gate_adj_extended
                 vwap_disagree = True
-            elif p_blend < 0.5 and vwap_bps_tsla > cfg.VWAP_DISAGREE_BPS:
-                gate += cfg.GATE_ADJ_EXTENDED
-                reasons["gate_adj_vwap"] = cfg.GATE_ADJ_EXTENDED
+            elif p_blend < 0.5 and vwap_bps_tsla > knobs.vwap_disagree_bps:
+                gate += knobs.gate_adj_extended
+                reasons["gate_adj_vwap"] = knobs.gate_adj_extended
                 vwap_disagree = True
 
-        gate = _clamp(gate, 0.45, 0.70)
+        gate = _clamp(gate, knobs.gate_min, knobs.gate_max)
         reasons["gate_after_adjustments"] = gate
 
         if abs(p_blend - 0.5) < gate_buffer:
@@ -231,129 +503,18 @@ def decide(inputs: DecisionInputs) -> DecisionResult:
         conviction = _clamp(conviction, 0.0, 1.0)
 
         if vwap_disagree:
-            conviction *= cfg.CONVICTION_DW_VWAP
-            reasons["conviction_dw_vwap"] = cfg.CONVICTION_DW_VWAP
+            conviction *= knobs.conviction_dw_vwap
+            reasons["conviction_dw_vwap"] = knobs.conviction_dw_vwap
 
         if max_spread > spread_hint:
-            conviction *= cfg.CONVICTION_DW_WIDE_SPREAD
-            reasons["conviction_dw_spread"] = cfg.CONVICTION_DW_WIDE_SPREAD
+            conviction *= knobs.conviction_dw_wide_spread
+            reasons["conviction_dw_spread"] = knobs.conviction_dw_wide_spread
 
         conviction = _clamp(conviction, 0.0, 1.0)
 
         return DecisionResult(
             side=side,
             conviction=conviction,
-=======
-def _safe_weighted_blend(p_up: float, p_sent: float) -> tuple[float, float, float]:
-    w_model = float(getattr(state, "w_model", 1.0))
-    w_sent = float(getattr(state, "w_sent", 0.0))
-    s = w_model + w_sent
-    if s <= 0:
-        w_model, w_sent = 1.0, 0.0
-        s = 1.0
-    w_model /= s
-    w_sent /= s
-    p_blend = (w_model * p_up) + (w_sent * p_sent)
-    return p_blend, w_model, w_sent
-
-
-def _clamp(x: float, lo: float, hi: float) -> float:
-    return max(lo, min(hi, x))
-
-
-def decide(inputs: DecisionInputs) -> DecisionResult:
-    # --- Probabilities ---
-    try:
-        p_up_raw = float(predict_p_up_latest(inputs.interval))
-    except Exception:
-        p_up_raw = float("nan")
-    p_up = p_up_raw if not math.isnan(p_up_raw) else 0.5
-
-    if inputs.last_sentiment_daily is None or math.isnan(inputs.last_sentiment_daily):
-        p_sent = 0.5
-        sentiment_available = False
-    else:
-        # map [-1,1] to [0,1]
-        p_sent = (float(inputs.last_sentiment_daily) + 1.0) / 2.0
-        p_sent = _clamp(p_sent, 0.0, 1.0)
-        sentiment_available = True
-
-    p_blend, w_model, w_sent = _safe_weighted_blend(p_up, p_sent)
-
-    # --- Market microstructure ---
-    try:
-        q_tsll = get_quote(getattr(cfg, "TSLL_SYMBOL", "TSLL"))
-        q_tsdd = get_quote(getattr(cfg, "TSDD_SYMBOL", "TSDD"))
-        sp_tsll = spread_bps(q_tsll["bid"], q_tsll["ask"])
-        sp_tsdd = spread_bps(q_tsdd["bid"], q_tsdd["ask"])
-    except Exception:
-        sp_tsll = float("inf")
-        sp_tsdd = float("inf")
-
-    max_spread = max(sp_tsll, sp_tsdd)
-    spread_max_block = float(getattr(cfg, "SPREAD_MAX_BPS", 60))  # hard block above this
-    spread_wide_hint = float(getattr(cfg, "SPREAD_WIDE_BPS_HINT", 50))
-
-    # --- VWAP context (RTH only) ---
-    vwap_bps = None
-    try:
-        if inputs.session_rth:
-            vwap_bps = float(vwap_distance_bps(getattr(cfg, "TSLA_SYMBOL", "TSLA")))
-    except Exception:
-        vwap_bps = None
-
-    # --- Gate base & dynamic adjustments ---
-    gate_default = float(getattr(cfg, "GATE_THRESHOLD_DEFAULT", 0.55))
-    base_gate = float(getattr(state, "gate_threshold", gate_default))
-    gate = base_gate
-
-    # Block for extreme spreads
-    if max_spread > spread_max_block:
-        return DecisionResult(
-            side="HOLD",
-            conviction=0.0,
-            gate=gate,
-            p_up=p_up,
-            p_sent=p_sent,
-            p_blend=p_blend,
-            spread_bps_tsll=sp_tsll,
-            spread_bps_tsdd=sp_tsdd,
-            vwap_bps_tsla=vwap_bps,
-            reasons={
-                "reason": "spread too wide",
-                "spread_block": True,
-                "max_spread_bps": max_spread,
-                "sentiment_available": sentiment_available,
-                "w_model": w_model,
-                "w_sent": w_sent,
-            },
-        )
-
-    # Soft adjustments
-    if max_spread > spread_wide_hint:
-        gate += float(getattr(cfg, "GATE_ADJ_SPREAD_WIDE", 0.02))
-
-    if (inputs.session_pre or inputs.session_after) and not inputs.session_rth:
-        gate += float(getattr(cfg, "GATE_ADJ_EXTENDED", 0.02))
-
-    vwap_disagree_bps = float(getattr(cfg, "VWAP_DISAGREE_BPS", 40.0))
-    disagree_up = p_blend >= 0.5 and (vwap_bps is not None) and (vwap_bps < -vwap_disagree_bps)
-    disagree_down = p_blend < 0.5 and (vwap_bps is not None) and (vwap_bps > vwap_disagree_bps)
-    vwap_disagree = bool(disagree_up or disagree_down)
-    if vwap_disagree:
-        # Use same knob as extended-hours for a small nudge
-        gate += float(getattr(cfg, "GATE_ADJ_EXTENDED", 0.02))
-
-    # Clamp gate to a safe band
-    gate = _clamp(gate, 0.45, 0.70)
-
-    # --- No-trade buffer around coinflip ---
-    buffer = float(getattr(cfg, "GATE_BUFFER_NEAR_COINFLIP", 0.03))
-    if abs(p_blend - 0.5) < buffer:
-        return DecisionResult(
-            side="HOLD",
-            conviction=0.0,
-main
             gate=gate,
             p_up=p_up,
             p_sent=p_sent,
@@ -375,64 +536,3 @@ main
             vwap_bps_tsla=None,
             reasons=reasons,
         )
-=======
-            spread_bps_tsll=sp_tsll,
-            spread_bps_tsdd=sp_tsdd,
-            vwap_bps_tsla=vwap_bps,
-            reasons={
-                "reason": "no-trade buffer",
-                "no_trade_buffer": True,
-                "buffer": buffer,
-                "sentiment_available": sentiment_available,
-                "w_model": w_model,
-                "w_sent": w_sent,
-                "gate_after_adjustments": gate,
-            },
-        )
-
-    # --- Decide side ---
-    side = getattr(cfg, "TSLL_SYMBOL", "TSLL") if p_blend >= gate else getattr(cfg, "TSDD_SYMBOL", "TSDD")
-
-    # --- Conviction ---
-    denom = max(1e-6, abs(gate - 0.5))
-    conviction = abs(p_blend - 0.5) / denom
-    conviction = _clamp(conviction, 0.0, 1.0)
-
-    # Down-weights
-    conv_dw_vwap = float(getattr(cfg, "CONVICTION_DW_VWAP", 0.85)) if vwap_disagree else 1.0
-    conv_dw_spread = float(getattr(cfg, "CONVICTION_DW_WIDE_SPREAD", 0.90)) if max_spread > spread_wide_hint else 1.0
-    conviction *= conv_dw_vwap
-    conviction *= conv_dw_spread
-    conviction = _clamp(conviction, 0.0, 1.0)
-
-    # --- Done ---
-    reasons: ReasonsDict = {
-        "base_gate": base_gate,
-        "gate_after_adjustments": gate,
-        "w_model": w_model,
-        "w_sent": w_sent,
-        "sentiment_available": sentiment_available,
-        "no_trade_buffer": False,
-        "max_spread_bps": max_spread,
-        "vwap_bps_tsla": vwap_bps,
-        "vwap_disagree": vwap_disagree,
-        "conviction_dw_vwap": conv_dw_vwap if vwap_disagree else 1.0,
-        "conviction_dw_spread": conv_dw_spread if max_spread > spread_wide_hint else 1.0,
-        "session_pre": inputs.session_pre,
-        "session_rth": inputs.session_rth,
-        "session_after": inputs.session_after,
-    }
-
-    return DecisionResult(
-        side=side,
-        conviction=conviction,
-        gate=gate,
-        p_up=p_up,
-        p_sent=p_sent,
-        p_blend=p_blend,
-        spread_bps_tsll=sp_tsll,
-        spread_bps_tsdd=sp_tsdd,
-        vwap_bps_tsla=vwap_bps,
-        reasons=reasons,
-    )
-main
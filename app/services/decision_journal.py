@@ -0,0 +1,445 @@
+from __future__ import annotations
+
+"""
+Append-only binary journal of every decision and its full input snapshot.
+
+Each ``decide()`` call is stored as one fixed-width, little-endian record
+(``RECORD``, 217 bytes). A record holds the timestamp, the model
+probability, daily sentiment, VWAP distance, both quotes, every
+``DecisionKnobs`` field, the session/stale/error/None flags, and the
+side/conviction/gate/p_blend the engine returned. Record ``i`` starts at
+``HEADER_SIZE + i * RECORD_SIZE``, so the file is its own index: records
+are appended in ``taken_at`` order, and ``DecisionJournal.between`` bisects
+on ``ts`` directly in the memory map. A crash can only leave a partial last
+record; readers ignore it and the writer cuts it off before appending.
+Error messages are the only variable-width input. They are rare, so they go
+to a JSON-lines sidecar (``<path>.errors``) keyed by record number.
+
+``record`` encodes on the caller's thread and queues the bytes; it does no file
+I/O, so it is safe on the decision path. A writer thread appends whatever has
+queued up in one write. Once the file passes ``rotate_bytes`` it is rolled,
+with its sidecar, to ``<path>.1``; older rolls shift up to ``<path>.<keep>``
+and the oldest is deleted. A rolled file is an ordinary journal, so
+``DecisionJournal(<path>.1)`` reads it.
+
+Replay:
+- ``snapshot(i)`` / ``replay()`` rebuild the exact ``DecisionSnapshot`` and
+  run ``decide_from_snapshot``. The results, reasons included, are
+  bit-for-bit what the engine produced.
+- ``replay_batch()`` runs ``decide_batch`` on the columns, once per distinct
+  knob set. It reproduces side, conviction, gate and p_blend bit-for-bit at
+  millions of records per second.
+"""
+
+import bisect
+import json
+import math
+import os
+import struct
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings as cfg
+from app.services.decision_engine import (
+    SIDE_HOLD,
+    SIDE_TSDD,
+    SIDE_TSLL,
+    BatchDecision,
+    DecisionKnobs,
+    DecisionResult,
+    DecisionSnapshot,
+    decide_batch,
+    decide_from_snapshot,
+)
+
+MAGIC = b"DJNL"
+VERSION = 1
+_HEADER = struct.Struct("<4sHH8x")  # magic, version, record size
+HEADER_SIZE = _HEADER.size
+
+QUOTE_FIELDS = ("tsll_bid", "tsll_ask", "tsll_last", "tsdd_bid", "tsdd_ask", "tsdd_last")
+KNOB_FIELDS = (
+    "w_model", "w_sent", "base_gate", "spread_block", "spread_hint", "gate_buffer", "gate_adj_spread_wide",
+    "gate_adj_extended", "vwap_disagree_bps", "conviction_dw_vwap", "conviction_dw_wide_spread", "gate_min",
+    "gate_max",
+)
+_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("ts", "d"),
+    ("p_up_raw", "d"),
+    ("sentiment", "d"),
+    ("vwap_bps", "d"),
+    *((name, "d") for name in QUOTE_FIELDS),
+    *((name, "d") for name in KNOB_FIELDS),
+    ("out_conviction", "d"),
+    ("out_gate", "d"),
+    ("out_p_blend", "d"),
+    ("flags", "I"),
+    ("out_side", "b"),
+    ("interval", "4s"),
+)
+_STRUCT = struct.Struct("<" + "".join(code for _, code in _FIELDS))
+RECORD = np.dtype([(name, "<" + ("S4" if code == "4s" else "i1" if code == "b" else "u4" if code == "I" else "f8"))
+                   for name, code in _FIELDS])
+RECORD_SIZE = RECORD.itemsize
+assert RECORD_SIZE == _STRUCT.size
+
+# flags
+SESSION_PRE, SESSION_RTH, SESSION_AFTER = 1 << 0, 1 << 1, 1 << 2
+NONE_SENTIMENT, NONE_VWAP = 1 << 3, 1 << 4
+NONE_QUOTE = {name: 1 << (5 + i) for i, name in enumerate(QUOTE_FIELDS)}
+STALE_NAMES = ("quote", "model", "vwap")
+STALE = {name: 1 << (11 + i) for i, name in enumerate(STALE_NAMES)}
+HAS_SIDECAR = 1 << 14
+
+_SIDE_CODE = {"HOLD": SIDE_HOLD, cfg.TSLL_SYMBOL: SIDE_TSLL, cfg.TSDD_SYMBOL: SIDE_TSDD}
+_STOP = object()
+
+
+def _opt(value: Any) -> Tuple[float, bool]:
+    """(stored float, was None); NaN stays NaN so None and NaN replay distinctly."""
+    if value is None:
+        return math.nan, True
+    return float(value), False
+
+
+def encode(snap: DecisionSnapshot, result: DecisionResult) -> Tuple[bytes, Optional[Dict[str, Any]]]:
+    """One packed record, plus the sidecar entry when the snapshot has errors or unknown stale names."""
+    flags = (SESSION_PRE if snap.session_pre else 0) | (SESSION_RTH if snap.session_rth else 0) \
+        | (SESSION_AFTER if snap.session_after else 0)
+    sentiment, none = _opt(snap.last_sentiment_daily)
+    flags |= NONE_SENTIMENT if none else 0
+    vwap, none = _opt(snap.vwap_bps_tsla)
+    flags |= NONE_VWAP if none else 0
+    quotes: List[float] = []
+    for name in QUOTE_FIELDS:
+        symbol, key = name.split("_")
+        value, none = _opt((snap.quote_tsll if symbol == "tsll" else snap.quote_tsdd).get(key))
+        quotes.append(value)
+        flags |= NONE_QUOTE[name] if none else 0
+    for name in snap.stale:
+        flags |= STALE.get(name, 0)
+    extra_stale = sorted(set(snap.stale) - set(STALE_NAMES))
+    sidecar = None
+    if snap.errors or extra_stale:
+        flags |= HAS_SIDECAR
+        sidecar = {"errors": dict(snap.errors), "stale": extra_stale}
+    k = snap.knobs
+    packed = _STRUCT.pack(
+        snap.taken_at,
+        snap.p_up_raw,
+        sentiment,
+        vwap,
+        *quotes,
+        *(getattr(k, name) for name in KNOB_FIELDS),
+        result.conviction,
+        result.gate,
+        result.p_blend,
+        flags,
+        _SIDE_CODE.get(result.side, SIDE_HOLD),
+        snap.interval.encode("ascii")[:4],
+    )
+    return packed, sidecar
+
+
+def _value(x: float, none: bool) -> Optional[float]:
+    return None if none else x
+
+
+def snapshot_from_record(rec: Any, sidecar: Optional[Mapping[str, Any]] = None) -> DecisionSnapshot:
+    """Rebuild the ``DecisionSnapshot`` a record was encoded from."""
+    flags = int(rec["flags"])
+    quotes: Dict[str, Dict[str, Optional[float]]] = {"tsll": {}, "tsdd": {}}
+    for name in QUOTE_FIELDS:
+        symbol, key = name.split("_")
+        quotes[symbol][key] = _value(float(rec[name]), bool(flags & NONE_QUOTE[name]))
+    stale = {name for name, bit in STALE.items() if flags & bit}
+    errors: Dict[str, str] = {}
+    if sidecar:
+        stale.update(sidecar.get("stale", ()))
+        errors = dict(sidecar.get("errors", {}))
+    return DecisionSnapshot(
+        interval=bytes(rec["interval"]).rstrip(b"\0").decode("ascii"),
+        p_up_raw=float(rec["p_up_raw"]),
+        last_sentiment_daily=_value(float(rec["sentiment"]), bool(flags & NONE_SENTIMENT)),
+        quote_tsll=quotes["tsll"],
+        quote_tsdd=quotes["tsdd"],
+        vwap_bps_tsla=_value(float(rec["vwap_bps"]), bool(flags & NONE_VWAP)),
+        session_pre=bool(flags & SESSION_PRE),
+        session_rth=bool(flags & SESSION_RTH),
+        session_after=bool(flags & SESSION_AFTER),
+        knobs=DecisionKnobs(**{name: float(rec[name]) for name in KNOB_FIELDS}),
+        taken_at=float(rec["ts"]),
+        stale=frozenset(stale),
+        errors=errors,
+    )
+
+
+def _spread_bps(bid: np.ndarray, ask: np.ndarray) -> np.ndarray:
+    """Vectorized ``pricing.spread_bps`` (NaN stands for a None side)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ok = (bid > 0) & (ask > 0)
+        mid = (bid + ask) / 2.0
+        return np.where(ok, ((ask - bid) / mid) * 10_000.0, 999999.0)
+
+
+class DecisionJournal:
+    """Writer (``record``) and reader (``records``/``between``/``replay*``) for one journal file."""
+
+    def __init__(
+        self,
+        path: Path,
+        queue_max: int = cfg.JOURNAL_QUEUE_MAX,
+        rotate_bytes: int = cfg.DECISION_JOURNAL_ROTATE_BYTES,
+        keep: int = cfg.DECISION_JOURNAL_KEEP,
+    ) -> None:
+        self.path = Path(path)
+        self.sidecar_path = _sidecar(self.path)
+        self.queue_max = queue_max
+        self.rotate_bytes = rotate_bytes
+        self.keep = keep
+        self.dropped = 0  # decisions refused because the queue was full
+        self._pending: Deque[Any] = deque()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._file: Any = None  # owned by the writer thread
+        self._count = 0
+
+    # --------------- Writing ---------------
+    def record(self, snap: DecisionSnapshot, result: DecisionResult) -> bool:
+        """Queue one decision for the writer; False (and counted) if the queue is full.
+        ``flush`` makes everything queued so far visible to readers."""
+        if len(self._pending) >= self.queue_max:
+            self.dropped += 1
+            return False
+        self._pending.append(encode(snap, result))
+        self._start()
+        if not self._wake.is_set():
+            self._wake.set()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Barrier: wait until everything recorded before this call is written."""
+        if self._thread is None:
+            return True
+        barrier = threading.Event()
+        self._pending.append(barrier)
+        self._wake.set()
+        return barrier.wait(timeout)
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Write what is queued and stop the writer (a later ``record`` starts it again)."""
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._pending.append(_STOP)
+            self._wake.set()
+            thread.join(timeout)
+
+    def _start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="DecisionJournal", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        try:
+            while True:
+                self._wake.wait()
+                self._wake.clear()
+                records: List[Tuple[bytes, Optional[Dict[str, Any]]]] = []
+                barriers: List[threading.Event] = []
+                stop = False
+                while self._pending:
+                    item = self._pending.popleft()
+                    if isinstance(item, threading.Event):
+                        barriers.append(item)
+                    elif item is _STOP:
+                        stop = True
+                    else:
+                        records.append(item)
+                if records:
+                    try:
+                        self._write(records)
+                    except Exception as e:  # the journal must never take the writer down
+                        print(f"[DecisionJournal] write failed, {len(records)} decisions lost: {e}")
+                        self._close_file()
+                for barrier in barriers:
+                    barrier.set()
+                if stop:
+                    return
+        finally:
+            self._close_file()
+
+    def _open(self) -> Any:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        f = open(self.path, "a+b")
+        size = f.seek(0, os.SEEK_END)
+        if size < HEADER_SIZE:
+            f.truncate(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+            size = HEADER_SIZE
+        else:
+            _check_header(self.path)
+            whole = HEADER_SIZE + (size - HEADER_SIZE) // RECORD_SIZE * RECORD_SIZE
+            if whole != size:
+                f.truncate(whole)  # a crash left a partial record
+            size = whole
+        self._count = (size - HEADER_SIZE) // RECORD_SIZE
+        return f
+
+    def _write(self, records: List[Tuple[bytes, Optional[Dict[str, Any]]]]) -> None:
+        if self._file is None:
+            self._file = self._open()
+        first = self._count
+        self._file.write(b"".join(packed for packed, _ in records))
+        self._file.flush()
+        self._count += len(records)
+        lines = [json.dumps({"i": first + j, **sidecar}) + "\n"
+                 for j, (_, sidecar) in enumerate(records) if sidecar is not None]
+        if lines:
+            with open(self.sidecar_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+        if self.rotate_bytes and self._file.tell() >= self.rotate_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        self._close_file()
+        rolled = [self.path] + [self.path.with_name(f"{self.path.name}.{n}") for n in range(1, self.keep + 2)]
+        for n in range(self.keep, -1, -1):
+            for src, dst in ((rolled[n], rolled[n + 1]), (_sidecar(rolled[n]), _sidecar(rolled[n + 1]))):
+                if not src.exists():
+                    continue
+                if n == self.keep:
+                    src.unlink()  # past the retention window
+                else:
+                    os.replace(src, dst)
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
+    # --------------- Reading ---------------
+    def records(self) -> np.ndarray:
+        """Memory-mapped structured array of every complete record (read-only)."""
+        self.flush()
+        if not self.path.exists() or self.path.stat().st_size < HEADER_SIZE:
+            return np.zeros(0, dtype=RECORD)
+        _check_header(self.path)
+        n = (self.path.stat().st_size - HEADER_SIZE) // RECORD_SIZE
+        if n == 0:
+            return np.zeros(0, dtype=RECORD)
+        return np.memmap(self.path, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(n,))
+
+    def between(self, since: Optional[float] = None, until: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """Records with ``since <= ts < until`` and the record number of the first one.
+        Bisects the map, touching O(log n) pages."""
+        recs = self.records()
+        ts = _TsView(recs)
+        lo = 0 if since is None else bisect.bisect_left(ts, since)
+        hi = len(recs) if until is None else bisect.bisect_left(ts, until)
+        return recs[lo:max(lo, hi)], lo
+
+    def sidecar(self) -> Dict[int, Dict[str, Any]]:
+        out: Dict[int, Dict[str, Any]] = {}
+        if not self.sidecar_path.exists():
+            return out
+        with open(self.sidecar_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a torn last line
+                out[int(entry.pop("i"))] = entry
+        return out
+
+    def snapshot(self, i: int) -> DecisionSnapshot:
+        rec = self.records()[i]
+        sidecar = self.sidecar().get(i) if int(rec["flags"]) & HAS_SIDECAR else None
+        return snapshot_from_record(rec, sidecar)
+
+    def replay(self, recs: Optional[np.ndarray] = None, first: int = 0) -> Iterator[DecisionResult]:
+        """``decide_from_snapshot`` over each record (``first`` = record number of ``recs[0]``)."""
+        recs = self.records() if recs is None else recs
+        sidecars = self.sidecar() if len(recs) and (recs["flags"] & HAS_SIDECAR).any() else {}
+        for j in range(len(recs)):
+            yield decide_from_snapshot(snapshot_from_record(recs[j], sidecars.get(first + j)))
+
+    def replay_batch(self, recs: Optional[np.ndarray] = None) -> BatchDecision:
+        return replay_batch(self.records() if recs is None else recs)
+
+
+class _TsView:
+    """Sequence over the ``ts`` field for ``bisect`` without materialising the column."""
+
+    def __init__(self, recs: np.ndarray) -> None:
+        self._recs = recs
+
+    def __len__(self) -> int:
+        return len(self._recs)
+
+    def __getitem__(self, i: int) -> float:
+        return float(self._recs[i]["ts"])
+
+
+def _sidecar(path: Path) -> Path:
+    return path.with_name(path.name + ".errors")
+
+
+def _check_header(path: Path) -> None:
+    with open(path, "rb") as f:
+        magic, version, size = _HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or version != VERSION or size != RECORD_SIZE:
+        raise ValueError(f"{path}: not a v{VERSION} decision journal")
+
+
+def replay_batch(recs: np.ndarray) -> BatchDecision:
+    """Vectorized replay: ``decide_batch`` once per distinct knob set, scattered back in order."""
+    n = len(recs)
+    flags = recs["flags"].astype(np.uint32)
+    spread_tsll = _spread_bps(recs["tsll_bid"], recs["tsll_ask"])
+    spread_tsdd = _spread_bps(recs["tsdd_bid"], recs["tsdd_ask"])
+    pre = (flags & SESSION_PRE) != 0
+    rth = (flags & SESSION_RTH) != 0
+    after = (flags & SESSION_AFTER) != 0
+    # Knobs change only when someone moves a slider: find runs of equal knobs, then group the runs
+    changed = np.zeros(max(n - 1, 0), dtype=bool)
+    for name in KNOB_FIELDS:
+        col = recs[name]
+        changed |= col[1:] != col[:-1]
+    starts = np.flatnonzero(np.r_[True, changed]) if n else np.zeros(0, dtype=np.int64)
+    ends = np.r_[starts[1:], n]
+    groups: Dict[Tuple[float, ...], List[Tuple[int, int]]] = {}
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        groups.setdefault(tuple(float(recs[name][start]) for name in KNOB_FIELDS), []).append((start, end))
+
+    out = BatchDecision(
+        side=np.zeros(n, dtype=np.int8),
+        conviction=np.zeros(n),
+        gate=np.zeros(n),
+        p_blend=np.zeros(n),
+        spread_block=np.zeros(n, dtype=bool),
+        no_trade_buffer=np.zeros(n, dtype=bool),
+    )
+    for row, runs in groups.items():
+        if len(runs) == 1:
+            idx: Any = slice(*runs[0])
+        else:
+            idx = np.concatenate([np.arange(start, end) for start, end in runs])
+        b = decide_batch(
+            recs["p_up_raw"][idx], recs["sentiment"][idx], spread_tsll[idx], spread_tsdd[idx], recs["vwap_bps"][idx],
+            pre[idx], rth[idx], after[idx], DecisionKnobs(**dict(zip(KNOB_FIELDS, row))),
+            model_stale=(flags[idx] & STALE["model"]) != 0,
+        )
+        for name in ("side", "conviction", "gate", "p_blend", "spread_block", "no_trade_buffer"):
+            getattr(out, name)[idx] = getattr(b, name)
+    return out
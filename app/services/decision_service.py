@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+"""
+One decision per tick, shared by every consumer.
+
+``DecisionService`` gathers sentiment, session flags and a quote snapshot, runs
+``decide()`` once and publishes the resulting ``DecisionTick`` to subscribers
+(dashboard, trade panel, Telegram alerts). The trader reads the same tick through
+``current()``, which only recomputes when the last tick is older than the caller
+allows; concurrent callers wait for the in-flight computation instead of
+starting their own. It also gates its sessions on the service's ``session``
+toggles, so a session switched off in the settings panel is off for both.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as dtime
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+import pytz
+
+from app.config import settings as cfg
+from app.config.paths import DATA_DIR, DECISIONS_JOURNAL
+from app.core.runtime_state import state
+from app.services import model as model_service
+from app.services.decision_engine import DecisionInputs, DecisionResult, decide
+from app.services.decision_journal import DecisionJournal
+from app.services.market_data import QuoteSnapshot, get_quotes
+from app.services.sentiment import load_latest_daily_score
+
+NY = pytz.timezone(cfg.TZ)
+
+
+@dataclass(frozen=True)
+class DecisionTick:
+    """A published decision together with the inputs consumers need to act on it."""
+
+    seq: int
+    ts: float  # time.time() when the decision was made
+    result: DecisionResult
+    quotes: QuoteSnapshot
+    session_pre: bool
+    session_rth: bool
+    session_after: bool
+
+    @property
+    def age_sec(self) -> float:
+        return time.time() - self.ts
+
+
+Subscriber = Callable[[DecisionTick], None]
+
+
+class RuntimeSessionToggles:
+    """``SessionToggles`` over the runtime state's ``session_*`` switches (the ones the settings panel edits)."""
+
+    @property
+    def pre(self) -> bool:
+        return bool(state.session_pre)
+
+    @pre.setter
+    def pre(self, value: bool) -> None:
+        state.session_pre = value
+
+    @property
+    def rth(self) -> bool:
+        return bool(state.session_rth)
+
+    @rth.setter
+    def rth(self, value: bool) -> None:
+        state.session_rth = value
+
+    @property
+    def after(self) -> bool:
+        return bool(state.session_after)
+
+    @after.setter
+    def after(self, value: bool) -> None:
+        state.session_after = value
+
+
+def session_flags(now: Optional[datetime] = None, toggles: Any = None) -> Tuple[bool, bool, bool]:
+    """(pre, rth, after): each session's toggle (default: the runtime state's) AND-ed with the ET clock."""
+    toggles = toggles if toggles is not None else RuntimeSessionToggles()
+    tod = (now or datetime.now(NY)).time()
+    pre = bool(toggles.pre) and dtime(4, 0) <= tod < dtime(9, 30)
+    rth = bool(toggles.rth) and dtime(9, 30) <= tod < dtime(16, 0)
+    after = bool(toggles.after) and dtime(16, 0) <= tod < dtime(20, 0)
+    return pre, rth, after
+
+
+class DecisionService:
+    def __init__(
+        self,
+        tick_sec: float = cfg.DECISION_TICK_SEC,
+        sentiment_dir: Path = DATA_DIR / "sentiment",
+        journal: Optional[DecisionJournal] = None,
+        session: Any = None,
+    ) -> None:
+        self.tick_sec = tick_sec
+        self.sentiment_dir = sentiment_dir
+        self.journal = journal
+        # Session toggles for this service and the trader reading it (``cfg.SessionToggles`` or the runtime view)
+        self.session = session if session is not None else cfg.SessionToggles()
+        self._subscribers: List[Subscriber] = []
+        self._sub_lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._latest: Optional[DecisionTick] = None
+        self._seq = 0
+        self._wake = threading.Event()
+        self._force = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    # --------------- Subscribers ---------------
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Call ``callback(tick)`` on every published decision (from the publishing thread). Returns an unsubscribe."""
+        with self._sub_lock:
+            self._subscribers.append(callback)
+
+        def _unsubscribe() -> None:
+            with self._sub_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return _unsubscribe
+
+    def _publish(self, tick: DecisionTick) -> None:
+        with self._sub_lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(tick)
+            except Exception as exc:  # a broken consumer must not starve the others
+                print(f"[DecisionService] subscriber error: {exc}")
+
+    # --------------- Decisions ---------------
+    def latest(self) -> Optional[DecisionTick]:
+        return self._latest
+
+    def tick(self) -> DecisionTick:
+        """Compute and publish a fresh decision."""
+        with self._compute_lock:
+            return self._compute()
+
+    def current(self, max_age_sec: Optional[float] = None) -> DecisionTick:
+        """The latest tick if it is at most ``max_age_sec`` old (default: one tick), else a fresh one."""
+        limit = self.tick_sec if max_age_sec is None else max_age_sec
+        latest = self._latest
+        if latest is not None and latest.age_sec <= limit:
+            return latest
+        with self._compute_lock:
+            latest = self._latest  # another caller may have refreshed it while we waited
+            if latest is not None and latest.age_sec <= limit:
+                return latest
+            return self._compute()
+
+    def _compute(self) -> DecisionTick:
+        pre, rth, after = session_flags(toggles=self.session)
+        quotes = get_quotes((cfg.TSLL_SYMBOL, cfg.TSDD_SYMBOL))
+        result = decide(
+            DecisionInputs(
+                interval=state.interval,
+                last_sentiment_daily=load_latest_daily_score(self.sentiment_dir),
+                session_pre=pre,
+                session_rth=rth,
+                session_after=after,
+                quotes=quotes,
+            )
+        )
+        if self.journal is not None and result.snapshot is not None:
+            try:
+                self.journal.record(result.snapshot, result)
+            except Exception as e:  # the journal must never cost a decision
+                print(f"[DecisionService] journal error: {e}")
+        self._seq += 1
+        tick = DecisionTick(
+            seq=self._seq,
+            ts=time.time(),
+            result=result,
+            quotes=quotes,
+            session_pre=pre,
+            session_rth=rth,
+            session_after=after,
+        )
+        self._latest = tick
+        self._publish(tick)
+        return tick
+
+    # --------------- Background loop ---------------
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run_loop, name="DecisionService", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self.journal is not None:
+            self.journal.flush(timeout=2.0)
+
+    def request_refresh(self) -> None:
+        """Recompute now instead of at the next tick."""
+        self._force = True
+        self._wake.set()
+
+    def _run_loop(self) -> None:
+        while self._running:
+            force, self._force = self._force, False
+            try:
+                with model_service.model_cache.pin():
+                    # The trader may have just refreshed the tick; don't redo that work
+                    self.current(max_age_sec=0.0 if force else self.tick_sec * 0.5)
+            except Exception as e:
+                print(f"[DecisionService] Error: {e}")
+            self._wake.wait(self.tick_sec)
+            self._wake.clear()
+
+
+decision_service = DecisionService(
+    journal=DecisionJournal(DECISIONS_JOURNAL) if cfg.DECISION_JOURNAL_ENABLED else None,
+    session=RuntimeSessionToggles(),
+)
@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+"""
+Streaming feature engine: the ``FEATURE_COLS`` row for the newest bar in O(1).
+
+``add_all_features`` recomputes every indicator over the whole lookback to
+score one row. ``FeatureEngine`` keeps the recursions instead (EMA/RSI/MACD,
+rolling mean/variance windows, session VWAP and overnight-gap state) and
+advances them one bar at a time.
+
+Parity with ``add_all_features`` is exact, not approximate: each component
+replays the arithmetic pandas uses (Kahan-compensated rolling mean, Welford
+rolling variance, the cython ``ewm`` recursion with ``adjust=False``,
+pad-filled ``pct_change``), including its NaN/inf handling. Because those
+recursions depend on where the series starts, ``sync`` rebuilds the state
+whenever the first bar of the frame changes (the lookback window slides once
+per session).
+
+The last bar of a live frame is usually still forming, so ``sync`` commits
+every bar but the last and only previews the last one.
+"""
+
+import math
+from collections import deque
+from datetime import date
+from typing import Any, Deque, Optional
+
+import numpy as np
+import pandas as pd
+
+_NAN = float("nan")
+_INF = float("inf")
+
+# Same expression as add_all_features, evaluated once per minute of the day.
+_MINUTES = np.arange(1440)
+_TOD_SIN = np.sin(2 * np.pi * _MINUTES / 1440.0).tolist()
+_TOD_COS = np.cos(2 * np.pi * _MINUTES / 1440.0).tolist()
+
+
+def _window_value(x: float) -> float:
+    """pandas window ops treat +/-inf as missing."""
+    return _NAN if x in (_INF, -_INF) else x
+
+
+def _div(a: float, b: float) -> float:
+    """Float division with numpy semantics (x/0 -> +/-inf, 0/0 -> nan) instead of raising."""
+    if b == 0:
+        if a != a or a == 0:
+            return _NAN
+        return math.copysign(_INF, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _RollingMean:
+    """pandas ``roll_mean`` for a fixed window (Kahan add/remove, same-value and sign rules)."""
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.buf: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.nobs = 0
+        self.neg_ct = 0
+        self.sum_x = 0.0
+        self.comp_add = 0.0
+        self.comp_rem = 0.0
+        self.same = 0
+        self.prev = _NAN
+
+    def step(self, val: float, commit: bool = True) -> float:
+        val = _window_value(val)
+        nobs, neg_ct, sum_x = self.nobs, self.neg_ct, self.sum_x
+        comp_add, comp_rem, same, prev = self.comp_add, self.comp_rem, self.same, self.prev
+
+        if self.count >= self.window:
+            old = self.buf[0]
+            if old == old:
+                nobs -= 1
+                y = -old - comp_rem
+                t = sum_x + y
+                comp_rem = t - sum_x - y
+                sum_x = t
+                if math.copysign(1.0, old) < 0:
+                    neg_ct -= 1
+        if val == val:
+            nobs += 1
+            y = val - comp_add
+            t = sum_x + y
+            comp_add = t - sum_x - y
+            sum_x = t
+            if math.copysign(1.0, val) < 0:
+                neg_ct += 1
+            same = same + 1 if val == prev else 1
+            prev = val
+
+        if nobs >= self.window and nobs > 0:
+            out = sum_x / nobs
+            if same >= nobs:
+                out = prev
+            elif neg_ct == 0 and out < 0:
+                out = 0.0
+            elif neg_ct == nobs and out > 0:
+                out = 0.0
+        else:
+            out = _NAN
+
+        if commit:
+            self.buf.append(val)
+            self.count += 1
+            self.nobs, self.neg_ct, self.sum_x = nobs, neg_ct, sum_x
+            self.comp_add, self.comp_rem, self.same, self.prev = comp_add, comp_rem, same, prev
+        return out
+
+
+class _RollingStd:
+    """pandas ``roll_var`` (Welford with Kahan compensation) followed by ``zsqrt``."""
+
+    def __init__(self, window: int, ddof: int = 0) -> None:
+        self.window = window
+        self.ddof = ddof
+        self.buf: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.nobs = 0.0
+        self.mean_x = 0.0
+        self.ssqdm_x = 0.0
+        self.comp_add = 0.0
+        self.comp_rem = 0.0
+        self.same = 0
+        self.prev = _NAN
+
+    def step(self, val: float, commit: bool = True) -> float:
+        val = _window_value(val)
+        nobs, mean_x, ssqdm_x = self.nobs, self.mean_x, self.ssqdm_x
+        comp_add, comp_rem, same, prev = self.comp_add, self.comp_rem, self.same, self.prev
+
+        if self.count >= self.window:
+            old = self.buf[0]
+            if old == old:
+                nobs -= 1
+                if nobs:
+                    prev_mean = mean_x - comp_rem
+                    y = old - comp_rem
+                    t = y - mean_x
+                    comp_rem = t + mean_x - y
+                    mean_x = mean_x - t / nobs
+                    ssqdm_x = ssqdm_x - (old - prev_mean) * (old - mean_x)
+                else:
+                    mean_x = 0.0
+                    ssqdm_x = 0.0
+        if val == val:
+            nobs += 1
+            same = same + 1 if val == prev else 1
+            prev = val
+            prev_mean = mean_x - comp_add
+            y = val - comp_add
+            t = y - mean_x
+            comp_add = t + mean_x - y
+            mean_x = mean_x + t / nobs
+            ssqdm_x = ssqdm_x + (val - prev_mean) * (val - mean_x)
+
+        if nobs >= self.window and nobs > self.ddof:
+            var = 0.0 if (nobs == 1 or same >= nobs) else ssqdm_x / (nobs - self.ddof)
+            out = 0.0 if var < 0 else math.sqrt(var)
+        else:
+            out = _NAN
+
+        if commit:
+            self.buf.append(val)
+            self.count += 1
+            self.nobs, self.mean_x, self.ssqdm_x = nobs, mean_x, ssqdm_x
+            self.comp_add, self.comp_rem, self.same, self.prev = comp_add, comp_rem, same, prev
+        return out
+
+
+class _Ewm:
+    """pandas cython ``ewm`` mean with ``adjust=False, ignore_na=False, min_periods=0``."""
+
+    def __init__(self, *, span: Optional[float] = None, alpha: Optional[float] = None) -> None:
+        com = (span - 1) / 2 if span is not None else (1 - alpha) / alpha  # get_center_of_mass
+        a = 1.0 / (1.0 + com)
+        self.factor = 1.0 - a
+        self.new_wt = a
+        self.started = False
+        self.weighted = _NAN
+        self.old_wt = 1.0
+        self.nobs = 0
+
+    def step(self, cur: float, commit: bool = True) -> float:
+        cur = _window_value(cur)
+        is_obs = cur == cur
+        if not self.started:
+            weighted, old_wt, nobs = cur, 1.0, int(is_obs)
+        else:
+            weighted, old_wt, nobs = self.weighted, self.old_wt, self.nobs + int(is_obs)
+            if weighted == weighted:
+                old_wt *= self.factor
+                if is_obs:
+                    if weighted != cur:
+                        weighted = old_wt * weighted + self.new_wt * cur
+                        weighted /= old_wt + self.new_wt
+                    old_wt = 1.0
+            elif is_obs:
+                weighted = cur
+        if commit:
+            self.started = True
+            self.weighted, self.old_wt, self.nobs = weighted, old_wt, nobs
+        return weighted if nobs >= 1 else _NAN
+
+
+class _PctChange:
+    """``Series.pct_change(periods)`` with the default pad fill."""
+
+    def __init__(self, periods: int = 1) -> None:
+        self.periods = periods
+        self.filled: Deque[float] = deque(maxlen=periods)
+        self.last = _NAN
+
+    def step(self, x: float, commit: bool = True) -> float:
+        cur = x if x == x else self.last
+        base = self.filled[0] if len(self.filled) == self.periods else _NAN
+        out = _div(cur, base) - 1
+        if commit:
+            self.filled.append(cur)
+            self.last = cur
+        return out
+
+
+class _Diff:
+    def __init__(self) -> None:
+        self.prev = _NAN
+
+    def step(self, x: float, commit: bool = True) -> float:
+        out = x - self.prev
+        if commit:
+            self.prev = x
+        return out
+
+
+class _Session:
+    """Per-day RTH VWAP (skipna cumsums, forward-filled) and the overnight gap."""
+
+    def __init__(self) -> None:
+        self.day: Optional[date] = None
+        self.pv = 0.0
+        self.vv = 0.0
+        self.vwap = _NAN            # last non-NaN VWAP this session (ffill)
+        self.day_open = _NAN        # first RTH open this session
+        self.day_has_rth = False
+        self.day_close = _NAN       # last RTH close this session
+        self.prev_close: Optional[float] = None
+
+    def step(self, day: date, is_rth: bool, o: float, h: float, l: float, c: float, v: float,
+             commit: bool = True):
+        pv_sum, vv_sum, vwap_ff = self.pv, self.vv, self.vwap
+        day_open, has_rth, day_close, prev_close = self.day_open, self.day_has_rth, self.day_close, self.prev_close
+        if day != self.day:
+            if has_rth:
+                prev_close = day_close
+            pv_sum = vv_sum = 0.0
+            vwap_ff = day_open = day_close = _NAN
+            has_rth = False
+
+        if is_rth:
+            pv = (h + l + c) / 3.0 * v
+            pv_sum = pv_sum + (pv if pv == pv else 0.0)
+            vv_sum = vv_sum + (v if v == v else 0.0)
+            vwap = _NAN if (pv != pv or v != v or vv_sum == 0) else pv_sum / vv_sum
+            if vwap == vwap:
+                vwap_ff = vwap
+            else:
+                vwap = vwap_ff
+            vw_dist = (c - vwap) / (_NAN if vwap == 0 else vwap)
+
+            if not has_rth:
+                day_open = o
+            has_rth = True
+            day_close = c
+            if prev_close is None or prev_close == 0:
+                gap = 0.0
+            else:
+                gap = (day_open - prev_close) / prev_close
+        else:
+            vw_dist = 0.0
+            gap = 0.0
+
+        if commit:
+            self.day = day
+            self.pv, self.vv, self.vwap = pv_sum, vv_sum, vwap_ff
+            self.day_open, self.day_has_rth, self.day_close, self.prev_close = day_open, has_rth, day_close, prev_close
+        return vw_dist, gap
+
+
+class FeatureEngine:
+    """Incremental ``add_all_features`` for the newest bar; see the module docstring."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self._ret1 = _PctChange(1)
+        self._ret5 = _PctChange(5)
+        self._sma5 = _RollingMean(5)
+        self._sma20 = _RollingMean(20)
+        self._sma5_slope = _PctChange(1)
+        self._sma20_slope = _PctChange(1)
+        self._std20 = _RollingStd(20)
+        self._ema12 = _Ewm(span=12)
+        self._ema26 = _Ewm(span=26)
+        self._ema12_slope = _PctChange(1)
+        self._ema26_slope = _PctChange(1)
+        self._signal = _Ewm(span=9)
+        self._diff = _Diff()
+        self._rsi_up = _Ewm(alpha=1 / 14)
+        self._rsi_down = _Ewm(alpha=1 / 14)
+        self._vol_mean = _RollingMean(50)
+        self._vol_std = _RollingStd(50)
+        self._session = _Session()
+        self._origin: Any = None
+        self._last_ts: Any = None
+        self._last_close = _NAN
+        self._n = 0
+        self._last_complete: Optional[np.ndarray] = None
+
+    @property
+    def n_bars(self) -> int:
+        """Number of committed bars."""
+        return self._n
+
+    def update(
+        self,
+        day: date,
+        minute_of_day: int,
+        is_rth: bool,
+        o: float,
+        h: float,
+        l: float,
+        c: float,
+        v: float,
+        commit: bool = True,
+    ) -> np.ndarray:
+        """Advance by one bar and return its features in ``FEATURE_COLS`` order."""
+        ret_1 = self._ret1.step(c, commit)
+        ret_5 = self._ret5.step(c, commit)
+        sma5 = self._sma5.step(c, commit)
+        sma20 = self._sma20.step(c, commit)
+        ema12 = self._ema12.step(c, commit)
+        ema26 = self._ema26.step(c, commit)
+
+        delta = self._diff.step(c, commit)
+        up = delta if not delta < 0 else 0.0        # clip(lower=0), NaN kept
+        down = -(delta if not delta > 0 else 0.0)   # -clip(upper=0), NaN kept
+        roll_up = self._rsi_up.step(up, commit)
+        roll_down = self._rsi_down.step(down, commit)
+        rs = roll_up / (_NAN if roll_down == 0 else roll_down)
+        rsi = 100 - (100 / (1 + rs))
+
+        macd = ema12 - ema26
+        signal = self._signal.step(macd, commit)
+
+        vol_mean = self._vol_mean.step(v, commit)
+        vol_std = self._vol_std.step(v, commit)
+        vol_z = (v - vol_mean) / (_NAN if vol_std == 0 else vol_std)
+
+        std20 = self._std20.step(c, commit)
+        upper = sma20 + 2.0 * std20
+        lower = sma20 - 2.0 * std20
+
+        vw_dist, gap = self._session.step(day, is_rth, o, h, l, c, v, commit)
+
+        return np.array(
+            [
+                ret_1,
+                ret_5,
+                self._sma5_slope.step(sma5, commit),
+                self._sma20_slope.step(sma20, commit),
+                self._ema12_slope.step(ema12, commit),
+                self._ema26_slope.step(ema26, commit),
+                rsi / 100.0,
+                macd,
+                signal,
+                macd - signal,
+                vol_z,
+                _TOD_SIN[minute_of_day],
+                _TOD_COS[minute_of_day],
+                _div(c - lower, upper - lower),
+                _div(upper - lower, sma20),
+                vw_dist,
+                gap,
+            ]
+        )
+
+    def sync(self, df: pd.DataFrame) -> Optional[np.ndarray]:
+        """
+        Bring the engine up to date with ``df`` (a ``fetch_bars`` frame) and return the features
+        ``add_all_features(df)[FEATURE_COLS].dropna().iloc[-1]`` would give, or None if no row is complete.
+        """
+        if df is None or df.empty:
+            return None
+        n = len(df)
+        idx = df.index
+        close = df["Close"]
+        if (
+            self._origin != idx[0]
+            or self._n >= n
+            or (self._n and (idx[self._n - 1] != self._last_ts or not _same(close.iat[self._n - 1], self._last_close)))
+        ):
+            self.reset()
+            self._origin = idx[0]
+
+        lo = self._n
+        tail = df.iloc[lo:]
+        days = tail["Date"].tolist() if "Date" in tail.columns else list(tail.index.date)
+        hours, mins = tail.index.hour, tail.index.minute
+        minutes = (hours * 60 + mins).tolist()
+        if "IsRTH" in tail.columns:
+            rth = tail["IsRTH"].to_numpy(dtype=bool).tolist()
+        else:
+            rth = (((hours > 9) | ((hours == 9) & (mins >= 30))) & (hours < 16)).tolist()
+        o = tail["Open"].to_numpy(dtype=float).tolist()
+        h = tail["High"].to_numpy(dtype=float).tolist()
+        l = tail["Low"].to_numpy(dtype=float).tolist()
+        c = tail["Close"].to_numpy(dtype=float).tolist()
+        v = tail["Volume"].to_numpy(dtype=float).tolist()
+
+        latest: Optional[np.ndarray] = None
+        for k in range(len(c)):
+            commit = lo + k < n - 1
+            row = self.update(days[k], minutes[k], rth[k], o[k], h[k], l[k], c[k], v[k], commit=commit)
+            if commit:
+                self._n += 1
+                if not np.isnan(row).any():
+                    self._last_complete = row
+            else:
+                latest = row
+        self._last_ts = idx[n - 2] if n > 1 else None
+        self._last_close = float(close.iat[n - 2]) if n > 1 else _NAN
+        if latest is not None and not np.isnan(latest).any():
+            return latest
+        return self._last_complete
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (a != a and b != b)
+
@@ -25,25 +25,48 @@ def _bb(series: pd.Series, window: int = 20, num_std: float = 2.0):
     percentB = (series - lower) / (upper - lower)
     bandwidth = (upper - lower) / mid
     return percentB, bandwidth
+def _grouped_cumsum(values: np.ndarray, group: np.ndarray, pos: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Per-group running sum, added strictly left to right like ``Series.cumsum`` on each group
+    (NaNs skipped, NaN at their own position). ``GroupBy.cumsum`` uses compensated summation
+    and can differ in the last bit. Groups are laid out as zero-padded rows so a single
+    ``np.cumsum(axis=1)`` does all of them.
+    """
+    missing = np.isnan(values)
+    grid = np.zeros((n_groups, int(pos.max()) + 1 if len(pos) else 0))
+    grid[group, pos] = np.where(missing, 0.0, values)
+    out = np.cumsum(grid, axis=1)[group, pos]
+    out[missing] = np.nan
+    return out
 def _session_vwap(df: pd.DataFrame) -> pd.Series:
-    typical = (df["High"] + df["Low"] + df["Close"]) / 3.0
+    """RTH-anchored VWAP per session (0.0 outside RTH), computed for all sessions at once."""
+    rth = df["IsRTH"].to_numpy(dtype=bool)
+    bars = df[rth]
+    by_day = bars.groupby("Date", sort=False)
+    group = by_day.ngroup().to_numpy()
+    pos = by_day.cumcount().to_numpy()
+    typical = (bars["High"] + bars["Low"] + bars["Close"]) / 3.0
+    pv = _grouped_cumsum((typical * bars["Volume"]).to_numpy(dtype=float), group, pos, by_day.ngroups)
+    vv = _grouped_cumsum(bars["Volume"].to_numpy(dtype=float), group, pos, by_day.ngroups)
+    rth_vwap = pd.Series(pv / np.where(vv == 0, np.nan, vv), index=bars.index)
+    rth_vwap = rth_vwap.groupby(group).ffill().groupby(group).bfill()
     vwap = pd.Series(0.0, index=df.index)
-    for date, grp in df[df["IsRTH"]].groupby(df["Date"]):
-        pv = (typical.loc[grp.index] * df["Volume"].loc[grp.index]).cumsum()
-        vv = df["Volume"].loc[grp.index].cumsum().replace(0, np.nan)
-        vwap.loc[grp.index] = (pv / vv).fillna(method="ffill").fillna(method="bfill")
+    vwap[rth] = rth_vwap.to_numpy()
     return vwap
 def _overnight_gap(df: pd.DataFrame) -> pd.Series:
+    """RTH open vs. the previous session's last RTH close, broadcast over that day's RTH bars."""
+    rth = df["IsRTH"].to_numpy(dtype=bool)
+    bars = df[rth]
     out = pd.Series(0.0, index=df.index)
-    by_date = df.groupby(df["Date"])
-    prev_close = None
-    for date, grp in by_date:
-        rth = grp[grp["IsRTH"]]
-        if not rth.empty and prev_close is not None:
-            open_930 = rth["Open"].iloc[0]
-            gap = (open_930 - prev_close) / prev_close if prev_close not in (0, None) else 0.0
-            out.loc[rth.index] = gap
-        prev_close = grp.loc[grp["IsRTH"]].iloc[-1]["Close"] if not rth.empty else prev_close
+    if bars.empty:
+        return out
+    by_day = bars.groupby("Date", sort=True)
+    day_open = by_day.head(1).set_index("Date")["Open"].sort_index()
+    day_close = by_day.tail(1).set_index("Date")["Close"].sort_index()
+    prev_close = day_close.shift(1)
+    gap = ((day_open - prev_close) / prev_close).where(prev_close != 0, 0.0)
+    gap.iloc[0] = 0.0  # no earlier session to gap from
+    out[rth] = bars["Date"].map(gap).to_numpy()
     return out
 def add_all_features(df: pd.DataFrame) -> pd.DataFrame:
     out = df.copy()
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+"""
+Concurrent flip execution.
+
+A flip sells the side we hold and buys the other one. Instead of running the
+two order lifecycles back to back, ``FlipExecutor`` submits the closing leg and
+grows the opening leg while the close fills: every fill releases cash, the buy
+budget is recomputed from it, and any extra whole shares go out as another buy
+order straight away. Cash that was already free is used from the start. An
+overall deadline cancels whatever is still working, so a flip cannot leave the
+trader half-rotated indefinitely. The flip only finishes (and ``on_done`` only
+runs) once every cancelled leg has reported DONE, so fills that land while a
+cancel is in flight are counted before the trader places its stops.
+
+Leg updates arrive on the order manager's threads (often while it holds its own
+lock), so a flip's lock only guards bookkeeping and is never held across a
+broker call.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from app.config import settings as cfg
+from app.core.clock import CallLater, call_later
+from app.services.order_manager import WorkingOrder
+
+# (symbol, qty, side, limit_price, on_update) -> WorkingOrder
+SubmitFn = Callable[[str, float, str, float, Optional[Callable[[WorkingOrder], None]]], WorkingOrder]
+PriceFn = Callable[[str, str], Optional[float]]  # (symbol, side) -> limit price, None without a quote
+BudgetFn = Callable[[float], float]  # cash available -> cash to put into the opening leg
+
+RUNNING = "running"
+DONE = "done"
+DEADLINE = "deadline"
+
+
+@dataclass
+class Flip:
+    close_symbol: str
+    open_symbol: str
+    free_cash: float  # cash usable before any of the close fills
+    budget: BudgetFn
+    on_done: Optional[Callable[["Flip"], None]] = None
+    started_ts: float = field(default_factory=time.time)
+    finished_ts: Optional[float] = None
+    status: str = RUNNING
+    close_order: Optional[WorkingOrder] = None
+    open_orders: List[WorkingOrder] = field(default_factory=list)
+    open_qty_claimed: float = 0.0  # submitted or being submitted
+    cancelling: List[WorkingOrder] = field(default_factory=list)  # legs cancelled at the deadline
+    expired: bool = False  # the deadline passed; no new legs, finish as DEADLINE once all are done
+    _submitting: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def released_cash(self) -> float:
+        o = self.close_order
+        if o is None or not o.filled_qty:
+            return 0.0
+        return o.filled_qty * (o.filled_avg_price or o.limit_price)
+
+    @property
+    def opened_qty(self) -> float:
+        return sum(o.filled_qty for o in self.open_orders)
+
+    @property
+    def opened_avg_price(self) -> Optional[float]:
+        qty = self.opened_qty
+        if qty <= 0:
+            return None
+        return sum(o.filled_qty * (o.filled_avg_price or o.limit_price) for o in self.open_orders) / qty
+
+    @property
+    def done(self) -> bool:
+        return self.status != RUNNING
+
+
+class FlipExecutor:
+    def __init__(
+        self,
+        submit: SubmitFn,
+        cancel: Callable[[WorkingOrder], None],
+        price: PriceFn,
+        deadline_sec: float = cfg.FLIP_DEADLINE_SEC,
+        *,
+        clock: Callable[[], float] = time.time,
+        call_later: CallLater = call_later,
+    ) -> None:
+        self._submit = submit
+        self._cancel = cancel
+        self._price = price
+        self.deadline_sec = deadline_sec
+        self._clock = clock
+        self._call_later = call_later
+
+    def start(
+        self,
+        close_symbol: str,
+        close_qty: float,
+        close_limit: float,
+        open_symbol: str,
+        free_cash: float,
+        budget: BudgetFn,
+        on_done: Optional[Callable[[Flip], None]] = None,
+    ) -> Flip:
+        """
+        Submit the closing leg and, if ``free_cash`` already pays for some shares, the first
+        opening leg; returns without waiting for either. ``budget(free_cash + released)`` is the
+        cash to deploy into the opening side, ``on_done(flip)`` runs once both legs are finished
+        or, after the deadline, once the legs it cancelled have settled. Raises if the closing
+        leg cannot be submitted.
+        """
+        flip = Flip(
+            close_symbol=close_symbol, open_symbol=open_symbol, free_cash=free_cash, budget=budget, on_done=on_done,
+            started_ts=self._clock(),
+        )
+        with flip._lock:
+            flip._submitting += 1  # nothing can complete the flip before the close is recorded
+        try:
+            close = self._submit(close_symbol, close_qty, "SELL", close_limit, lambda _o: self._on_leg_update(flip))
+        except Exception:
+            flip.status = DONE
+            raise
+        with flip._lock:
+            flip.close_order = close
+            flip._submitting -= 1
+
+        self._top_up(flip)
+        self._check_done(flip)
+
+        self._call_later(self.deadline_sec, self._expire, flip)
+        return flip
+
+    # --------------- Internals ---------------
+    def _on_leg_update(self, flip: Flip) -> None:
+        if flip.done:
+            return
+        self._top_up(flip)
+        self._check_done(flip)
+
+    def _top_up(self, flip: Flip) -> None:
+        """Buy whatever the cash released so far pays for beyond what is already claimed."""
+        px = self._price(flip.open_symbol, "BUY")
+        if px is None or px <= 0:
+            return
+        with flip._lock:
+            if flip.done or flip.expired or flip.close_order is None:
+                return
+            cash = flip.budget(flip.free_cash + flip.released_cash)
+            # Unfilled remainders of finished legs no longer hold any of the budget
+            committed = flip.open_qty_claimed - sum(o.remaining for o in flip.open_orders if o.done)
+            extra = math.floor(cash / px) - committed
+            if extra < 1:
+                return
+            flip.open_qty_claimed += extra
+            flip._submitting += 1
+
+        order = None
+        try:
+            order = self._submit(flip.open_symbol, extra, "BUY", px, lambda _o: self._on_leg_update(flip))
+        except Exception as e:
+            print(f"[FlipExecutor] opening leg submit failed: {e}")
+        with flip._lock:
+            flip._submitting -= 1
+            if order is None:
+                flip.open_qty_claimed -= extra
+            else:
+                flip.open_orders.append(order)
+            late = order is not None and flip.expired and not order.done
+            if late:
+                flip.cancelling.append(order)
+        if late:
+            self._cancel(order)  # submitted while the deadline passed
+
+    def _check_done(self, flip: Flip) -> None:
+        with flip._lock:
+            if flip.done or flip._submitting:
+                return
+            close = flip.close_order
+            if close is None or not close.done or any(not o.done for o in flip.open_orders):
+                return
+            self._mark(flip, DEADLINE if flip.expired else DONE)
+        self._finished(flip)
+
+    def _expire(self, flip: Flip) -> None:
+        with flip._lock:
+            if flip.done or flip.expired:
+                return
+            flip.expired = True
+            live = [o for o in [flip.close_order, *flip.open_orders] if o is not None and not o.done]
+            flip.cancelling.extend(live)
+        for order in live:
+            self._cancel(order)
+        # The cancels confirm through the legs' updates; a leg that already settled may have been the last
+        self._check_done(flip)
+
+    def _mark(self, flip: Flip, status: str) -> None:
+        flip.status = status
+        flip.finished_ts = self._clock()
+
+    @staticmethod
+    def _finished(flip: Flip) -> None:
+        if flip.on_done is None:
+            return
+        try:
+            flip.on_done(flip)
+        except Exception as e:
+            print(f"[FlipExecutor] on_done error: {e}")
@@ -4,20 +4,23 @@ import pandas as pd
 import pytz
 import yfinance as yf
 
+from app.config.paths import BARS_DIR
+from app.services.bar_cache import bar_cache
+from app.services.bar_store import COLUMNS, BarStore
+
 NY = pytz.timezone("America/New_York")
-def _cap_period(interval: str, lookback_days: int) -> str:
-    if interval == "1m":
-        days = min(lookback_days, 7)
-        return f"{days}d"
-    elif interval == "5m":
-        days = min(lookback_days, 60)
-        return f"{days}d"
-    else:
+_store = BarStore(BARS_DIR)
+_MAX_DAYS = {"1m": 7, "5m": 60}  # yfinance intraday history limits; also how many trading days the store keeps
+def _cap_days(interval: str, lookback_days: int) -> int:
+    if interval not in _MAX_DAYS:
         raise ValueError("interval must be '1m' or '5m'")
-def fetch_tsla_bars(interval: str = "1m", lookback_days: int = 5) -> pd.DataFrame:
-    period = _cap_period(interval, lookback_days)
-    tkr = yf.Ticker("TSLA")
-    df = tkr.history(period=period, interval=interval, prepost=True, actions=False, raise_errors=False)
+    return min(lookback_days, _MAX_DAYS[interval])
+def _cap_period(interval: str, lookback_days: int) -> str:
+    return f"{_cap_days(interval, lookback_days)}d"
+def _download(symbol: str, interval: str, **window) -> pd.DataFrame:
+    """Raw yfinance pull (``period=`` or ``start=``) normalised to OHLCV on a NY index."""
+    tkr = yf.Ticker(symbol)
+    df = tkr.history(interval=interval, prepost=True, actions=False, raise_errors=False, **window)
     if df is None or df.empty:
         return pd.DataFrame()
     if df.index.tz is None:
@@ -25,6 +28,42 @@ def fetch_tsla_bars(interval: str = "1m", lookback_days: int = 5) -> pd.DataFram
     else:
         df.index = df.index.tz_convert(NY)
     df = df.rename(columns={c: c.capitalize() for c in df.columns})
+    return df[list(COLUMNS)]
+def _top_up(symbol: str, interval: str, days: int) -> None:
+    """Download only what the store is missing: the full window once, then the tail."""
+    last_ts = _store.last_timestamp(symbol, interval)
+    gap_days = (pd.Timestamp.now(NY) - last_ts).days if last_ts is not None else None
+    if last_ts is None or _store.covered_days(symbol, interval) < days or gap_days >= _MAX_DAYS[interval]:
+        fresh = _download(symbol, interval, period=_cap_period(interval, days))
+        if not fresh.empty:
+            _store.write(symbol, interval, fresh)
+            _store.mark_covered(symbol, interval, days)
+    else:
+        # Re-request from the last stored bar (inclusive) so a bar that was still forming is replaced.
+        _store.write(symbol, interval, _download(symbol, interval, start=last_ts))
+    # No caller can ask for more than the download window, so older sessions are dead weight
+    _store.prune(symbol, interval, _MAX_DAYS[interval])
+def _load_bars(symbol: str, interval: str, days: int) -> pd.DataFrame:
+    try:
+        _top_up(symbol, interval, days)
+    except Exception as e:
+        print(f"[BarStore] top-up failed for {symbol} {interval}, serving what is on disk: {e}")
+    df = _store.read(symbol, interval, days)
+    if df.empty:
+        return pd.DataFrame()
+    return with_session_columns(df)
+def with_session_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """OHLCV on a NY index plus the ``Date`` / ``IsRTH`` columns the feature code expects."""
+    df = df.copy()
     df["Date"] = df.index.date
     df["IsRTH"] = ((df.index.hour > 9) | ((df.index.hour == 9) & (df.index.minute >= 30))) & (df.index.hour < 16)
-    return df[["Open","High","Low","Close","Volume","Date","IsRTH"]].copy()
+    return df[["Open","High","Low","Close","Volume","Date","IsRTH"]]
+def fetch_bars(symbol: str, interval: str = "1m", lookback_days: int = 5) -> pd.DataFrame:
+    """
+    Bars for the last ``lookback_days`` sessions, shared across callers until the next bar close.
+    The returned frame is cached — copy it before mutating.
+    """
+    days = _cap_days(interval, lookback_days)
+    return bar_cache.get((symbol, interval, f"{days}d"), lambda: _load_bars(symbol, interval, days))
+def fetch_tsla_bars(interval: str = "1m", lookback_days: int = 5) -> pd.DataFrame:
+    return fetch_bars("TSLA", interval=interval, lookback_days=lookback_days)
@@ -1,11 +1,27 @@
 from __future__ import annotations
 
+"""
+Incremental anchored VWAP.
+
+A ``VwapAccumulator`` keeps running sums of price x volume and volume for one
+symbol and one anchor, so reading the VWAP or the distance to it is O(1).
+Bars are ingested as they arrive; the bar that is still forming is held aside
+and replaced on every update, then folded into the sums once the next bar
+starts. Daily anchors (RTH open, pre-market open) reset themselves when the
+first bar of a new session arrives; a custom anchor accumulates from a fixed
+timestamp onwards.
+"""
+
+import threading
+from dataclasses import dataclass
 from datetime import datetime, time
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 import pytz
-import yfinance as yf
+
+from app.services.history import fetch_bars
 
 NY = pytz.timezone("America/New_York")
 
@@ -13,34 +29,157 @@ def rth_session_now():
     now = datetime.now(NY).time()
     return time(9,30) <= now < time(16,0)
 
-def vwap_distance_bps(symbol: str = "TSLA") -> float | None:
+
+@dataclass(frozen=True)
+class VwapAnchor:
+    """Where accumulation starts: a daily ``start``/``end`` window (ET) or a fixed timestamp ``at``."""
+
+    name: str
+    start: Optional[time] = None
+    end: Optional[time] = None
+    at: Optional[datetime] = None
+
+    def session_of(self, ts: datetime) -> Optional[object]:
+        """Session key ``ts`` belongs to, or None if the bar falls outside the anchor's window."""
+        if self.at is not None:
+            return self.at if ts >= self.at else None
+        t = ts.time()
+        if self.start is not None and t < self.start:
+            return None
+        if self.end is not None and t >= self.end:
+            return None
+        return ts.date()
+
+
+RTH_ANCHOR = VwapAnchor("rth", start=time(9, 30), end=time(16, 0))
+PREMARKET_ANCHOR = VwapAnchor("premarket", start=time(4, 0), end=time(20, 0))
+
+
+def custom_anchor(at: datetime) -> VwapAnchor:
+    """Anchor at a fixed ET timestamp (e.g. a news print); never resets on its own."""
+    if at.tzinfo is None:
+        at = NY.localize(at)
+    return VwapAnchor(f"custom@{at.isoformat()}", at=at)
+
+
+class VwapAccumulator:
     """
-    Compute RTH-anchored VWAP distance in basis points for today's session.
-    Returns None if not RTH or insufficient data.
+    Running VWAP for one anchor. Feed it either bars (``ingest_bar``) or trades
+    (``ingest_trade``), not both, or volume is counted twice.
     """
-    if not rth_session_now():
-        return None
-    tkr = yf.Ticker(symbol)
-    df = tkr.history(period="2d", interval="1m", prepost=True, actions=False, raise_errors=False)
-    if df is None or df.empty:
-        return None
-    if df.index.tz is None:
-        df.index = df.index.tz_localize("UTC").tz_convert(NY)
-    else:
-        df.index = df.index.tz_convert(NY)
-    df = df.rename(columns={c: c.capitalize() for c in df.columns})
-    today = pd.Timestamp.now(NY).date()
-    day = df.loc[df.index.date == today]
-    if day.empty:
+
+    def __init__(self, anchor: VwapAnchor = RTH_ANCHOR) -> None:
+        self.anchor = anchor
+        self.reset(None)
+
+    def reset(self, session: Optional[object]) -> None:
+        self.session = session
+        self._pv = 0.0
+        self._v = 0.0
+        self._pending_ts: Optional[datetime] = None
+        self._pending_pv = 0.0
+        self._pending_v = 0.0
+        self.last_price: Optional[float] = None
+        self.last_ts: Optional[datetime] = None
+
+    def _enter(self, ts: datetime) -> bool:
+        session = self.anchor.session_of(ts)
+        if session is None:
+            return False
+        if session != self.session:
+            if self.session is not None and self.last_ts is not None and ts < self.last_ts:
+                return False  # late data for a session we've already left
+            self.reset(session)
+        return True
+
+    def ingest_bar(self, ts: datetime, high: float, low: float, close: float, volume: float) -> None:
+        """Add or update the bar starting at ``ts``. Re-sending the forming bar replaces it."""
+        if not self._enter(ts):
+            return
+        if self._pending_ts is not None:
+            if ts < self._pending_ts:
+                return  # already folded in
+            if ts > self._pending_ts:
+                self._pv += self._pending_pv
+                self._v += self._pending_v
+        volume = float(volume)
+        self._pending_ts = ts
+        self._pending_pv = (high + low + close) / 3.0 * volume
+        self._pending_v = volume
+        self.last_price = float(close)
+        self.last_ts = ts
+
+    def ingest_trade(self, ts: datetime, price: float, size: float) -> None:
+        if not self._enter(ts):
+            return
+        self._pv += float(price) * float(size)
+        self._v += float(size)
+        self.last_price = float(price)
+        self.last_ts = ts
+
+    @property
+    def vwap(self) -> Optional[float]:
+        v = self._v + self._pending_v
+        if v <= 0:
+            return None
+        return (self._pv + self._pending_pv) / v
+
+    def distance_bps(self, price: Optional[float] = None) -> Optional[float]:
+        """(price - VWAP) / VWAP in bps; ``price`` defaults to the last ingested close/trade."""
+        vwap = self.vwap
+        px = self.last_price if price is None else price
+        if vwap is None or vwap <= 0 or px is None:
+            return None
+        return float((px - vwap) / vwap * 10_000.0)
+
+
+class VwapBook:
+    """Accumulators per (symbol, anchor), synced from the shared bar cache one new bar at a time."""
+
+    def __init__(self) -> None:
+        self._accs: Dict[Tuple[str, VwapAnchor], VwapAccumulator] = {}
+        self._seen: Dict[Tuple[str, VwapAnchor], datetime] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, anchor: VwapAnchor = RTH_ANCHOR) -> VwapAccumulator:
+        with self._lock:
+            acc = self._accs.get((symbol, anchor))
+            if acc is None:
+                acc = self._accs[(symbol, anchor)] = VwapAccumulator(anchor)
+            return acc
+
+    def sync(self, symbol: str, df: pd.DataFrame, anchor: VwapAnchor = RTH_ANCHOR) -> VwapAccumulator:
+        """Ingest the rows of ``df`` not seen yet; the last seen bar is re-read in case it was still forming."""
+        acc = self.get(symbol, anchor)
+        with self._lock:
+            if df is None or df.empty:
+                return acc
+            seen = self._seen.get((symbol, anchor))
+            start = 0 if seen is None else int(df.index.searchsorted(seen, side="left"))
+            tail = df.iloc[start:]
+            self._seen[(symbol, anchor)] = df.index[-1]
+            high = tail["High"].to_numpy(dtype=float)
+            low = tail["Low"].to_numpy(dtype=float)
+            close = tail["Close"].to_numpy(dtype=float)
+            volume = np.nan_to_num(tail["Volume"].to_numpy(dtype=float))
+            for i, ts in enumerate(tail.index):
+                acc.ingest_bar(ts, high[i], low[i], close[i], volume[i])
+        return acc
+
+
+vwap_book = VwapBook()
+
+
+def vwap_distance_bps(symbol: str = "TSLA", anchor: VwapAnchor = RTH_ANCHOR) -> float | None:
+    """
+    VWAP distance in basis points for today's session (RTH-anchored by default).
+    Returns None if not RTH (for the RTH anchor) or insufficient data.
+    """
+    if anchor is RTH_ANCHOR and not rth_session_now():
         return None
-    rth = day.between_time("09:30","16:00")
-    if rth.empty:
+    df = fetch_bars(symbol, interval="1m", lookback_days=2)
+    acc = vwap_book.sync(symbol, df, anchor)
+    if anchor.at is None and acc.session != pd.Timestamp.now(NY).date():
         return None
-    typical = (rth["High"] + rth["Low"] + rth["Close"])/3.0
-    pv = (typical * rth["Volume"]).cumsum()
-    vv = rth["Volume"].cumsum().replace(0, np.nan)
-    vwap = (pv / vv).iloc[-1]
-    last = rth["Close"].iloc[-1]
-    if vwap and vwap > 0:
-        return float(((last - vwap) / vwap) * 10_000.0)
-    return None
+    return acc.distance_bps()
+
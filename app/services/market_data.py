@@ -1,8 +1,296 @@
+from __future__ import annotations
 
-# Placeholder shim for get_quote(symbol) used by trader.py if the real market_data
-# service isn't present during initial import. Section 02 should have implemented this.
+"""
+Streaming latest-quote service.
+
+A feed (Alpaca data websocket in production, ``LocalQuoteFeed`` offline) pushes
+quotes and trades into a ``QuoteBook``. The book keeps one immutable ``Quote``
+per symbol and swaps whole objects on update, so readers never take a lock:
+a read is a single dict lookup. Every quote carries ``quote_recv_ts`` and
+``trade_recv_ts`` (epoch seconds at receipt of the last bid/ask and the last
+print). Staleness is judged on the bid/ask alone, so a stream of trade prints
+never makes an old bid/ask look fresh and consumers can refuse to act on it.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, replace
 from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Protocol, Tuple
+
+from app.config import settings as cfg
+
+
+@dataclass(frozen=True)
+class Quote:
+    symbol: str
+    bid: Optional[float]
+    ask: Optional[float]
+    last: Optional[float]
+    ts: Optional[datetime]  # exchange timestamp
+    quote_recv_ts: float    # local receive time (time.time()) of the bid/ask
+    trade_recv_ts: Optional[float] = None  # local receive time of ``last``, once a print arrived
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the bid/ask was received."""
+        return (time.time() if now is None else now) - self.quote_recv_ts
+
+    def is_stale(self, max_age_sec: float, now: Optional[float] = None) -> bool:
+        return self.age(now) > max_age_sec
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "symbol": self.symbol,
+            "bid": self.bid,
+            "ask": self.ask,
+            "last": self.last,
+            "ts": self.ts,
+            "quote_recv_ts": self.quote_recv_ts,
+            "trade_recv_ts": self.trade_recv_ts,
+        }
+
+
+class QuoteBook:
+    """
+    Latest quote per symbol. Writers are serialised among themselves; readers are lock-free
+    because each update publishes a new frozen ``Quote`` with a single dict assignment.
+    """
+
+    def __init__(self) -> None:
+        self._quotes: Dict[str, Quote] = {}
+        self._write_lock = threading.Lock()
+        self._listeners: Tuple[Callable[[Quote], None], ...] = ()
+
+    def get(self, symbol: str) -> Optional[Quote]:
+        return self._quotes.get(symbol)
+
+    def subscribe(self, callback: Callable[[Quote], None]) -> Callable[[], None]:
+        """Call ``callback(quote)`` after every update, on the feed's thread. Returns an unsubscribe."""
+        with self._write_lock:
+            self._listeners = self._listeners + (callback,)
+
+        def _unsubscribe() -> None:
+            with self._write_lock:
+                self._listeners = tuple(cb for cb in self._listeners if cb is not callback)
+
+        return _unsubscribe
+
+    def _notify(self, q: Quote) -> None:
+        for callback in self._listeners:
+            try:
+                callback(q)
+            except Exception:
+                pass  # a listener must never break the feed
+
+    def snapshot(self) -> Dict[str, Quote]:
+        """Point-in-time copy of the whole table (a single atomic dict copy)."""
+        return self._quotes.copy()
+
+    def update_quote(
+        self,
+        symbol: str,
+        bid: Optional[float],
+        ask: Optional[float],
+        ts: Optional[datetime] = None,
+        recv_ts: Optional[float] = None,
+    ) -> Quote:
+        with self._write_lock:
+            prev = self._quotes.get(symbol)
+            last = prev.last if prev is not None else None
+            if last is None and bid and ask:
+                last = (bid + ask) / 2.0
+            trade_recv_ts = prev.trade_recv_ts if prev is not None else None
+            q = Quote(symbol, bid, ask, last, ts, time.time() if recv_ts is None else recv_ts, trade_recv_ts)
+            self._quotes[symbol] = q
+        self._notify(q)
+        return q
+
+    def update_trade(
+        self,
+        symbol: str,
+        price: float,
+        ts: Optional[datetime] = None,
+        recv_ts: Optional[float] = None,
+    ) -> Quote:
+        with self._write_lock:
+            prev = self._quotes.get(symbol)
+            now = time.time() if recv_ts is None else recv_ts
+            if prev is None:
+                q = Quote(symbol, None, None, price, ts, 0.0, now)  # no bid/ask yet: stale until one arrives
+            else:
+                q = replace(prev, last=price, ts=ts or prev.ts, trade_recv_ts=now)
+            self._quotes[symbol] = q
+        self._notify(q)
+        return q
+
+
+class QuoteFeed(Protocol):
+    def start(self, book: QuoteBook, symbols: Iterable[str]) -> None: ...
+    def stop(self) -> None: ...
+
+
+class LocalQuoteFeed:
+    """In-process stand-in feed for offline runs and tests; quotes are pushed via ``publish``."""
+
+    def __init__(self) -> None:
+        self._book: Optional[QuoteBook] = None
+
+    def start(self, book: QuoteBook, symbols: Iterable[str]) -> None:
+        self._book = book
+
+    def stop(self) -> None:
+        self._book = None
+
+    def publish(
+        self,
+        symbol: str,
+        bid: float,
+        ask: float,
+        last: Optional[float] = None,
+        ts: Optional[datetime] = None,
+        recv_ts: Optional[float] = None,
+    ) -> None:
+        if self._book is None:
+            return
+        self._book.update_quote(symbol, bid, ask, ts=ts, recv_ts=recv_ts)
+        if last is not None:
+            self._book.update_trade(symbol, last, ts=ts, recv_ts=recv_ts)
+
+
+class AlpacaQuoteFeed:
+    """Alpaca stock data websocket (quotes + trades) running on a daemon thread."""
+
+    def __init__(self, api_key: str, api_secret: str, feed: str = cfg.QUOTE_FEED) -> None:
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.feed = feed
+        self._stream: Any = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, book: QuoteBook, symbols: Iterable[str]) -> None:
+        from alpaca.data.enums import DataFeed
+        from alpaca.data.live import StockDataStream
+
+        stream = StockDataStream(self.api_key, self.api_secret, feed=DataFeed(self.feed))
+
+        async def _on_quote(q: Any) -> None:
+            book.update_quote(q.symbol, float(q.bid_price), float(q.ask_price), ts=q.timestamp)
+
+        async def _on_trade(t: Any) -> None:
+            book.update_trade(t.symbol, float(t.price), ts=t.timestamp)
+
+        syms = list(symbols)
+        stream.subscribe_quotes(_on_quote, *syms)
+        stream.subscribe_trades(_on_trade, *syms)
+        self._stream = stream
+        self._thread = threading.Thread(target=stream.run, name="AlpacaQuoteFeed", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+            except Exception:
+                pass
+        self._stream = None
+
+
+class QuoteService:
+    """Owns the quote book and whichever feed is currently populating it."""
+
+    def __init__(self, book: Optional[QuoteBook] = None) -> None:
+        self.book = book or QuoteBook()
+        self._feed: Optional[QuoteFeed] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._feed is not None
+
+    def start(self, feed: QuoteFeed, symbols: Iterable[str] = cfg.QUOTE_STREAM_SYMBOLS) -> None:
+        with self._lock:
+            if self._feed is not None:
+                self._feed.stop()
+            feed.start(self.book, symbols)
+            self._feed = feed
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._feed is not None:
+                self._feed.stop()
+            self._feed = None
+
+
+quote_service = QuoteService()
+
+
+def get_latest(symbol: str) -> Optional[Quote]:
+    return quote_service.book.get(symbol)
+
+
+def _quote_dict(symbol: str, q: Optional[Quote], max_age_sec: Optional[float], now: float) -> Dict[str, Any]:
+    if q is None or (max_age_sec is not None and q.is_stale(max_age_sec, now)):
+        return {
+            "symbol": symbol,
+            "bid": None,
+            "ask": None,
+            "last": None,
+            "ts": q.ts if q else None,
+            "quote_recv_ts": q.quote_recv_ts if q else None,
+            "trade_recv_ts": q.trade_recv_ts if q else None,
+            "stale": True,
+        }
+    out = q.as_dict()
+    out["stale"] = False
+    return out
+
+
+def get_quote(symbol: str, max_age_sec: Optional[float] = cfg.QUOTE_MAX_AGE_SEC) -> Dict[str, Any]:
+    """
+    Latest quote as a dict (symbol, bid, ask, last, ts, quote_recv_ts, trade_recv_ts, stale).
+    Missing or stale quotes come back with ``None`` prices and ``stale=True`` so callers fail closed;
+    only the bid/ask receive time counts toward ``max_age_sec``.
+    """
+    return _quote_dict(symbol, quote_service.book.get(symbol), max_age_sec, time.time())
+
+
+@dataclass(frozen=True)
+class QuoteSnapshot:
+    """Quotes for several symbols taken at one instant; pass it down instead of re-quoting."""
+
+    quotes: Mapping[str, Dict[str, Any]]
+    taken_at: float
+
+    def get(self, symbol: str) -> Dict[str, Any]:
+        q = self.quotes.get(symbol)
+        return q if q is not None else _quote_dict(symbol, None, None, self.taken_at)
+
+    def __getitem__(self, symbol: str) -> Dict[str, Any]:
+        return self.get(symbol)
+
+
+def get_quotes(symbols: Iterable[str], max_age_sec: Optional[float] = cfg.QUOTE_MAX_AGE_SEC) -> QuoteSnapshot:
+    """One consistent snapshot for ``symbols`` (same staleness rules as ``get_quote``)."""
+    table = quote_service.book.snapshot()
+    now = time.time()
+    return QuoteSnapshot(
+        quotes={sym: _quote_dict(sym, table.get(sym), max_age_sec, now) for sym in symbols},
+        taken_at=now,
+    )
+
 
+def start_stream_from_usb(usb_path: Optional[str]) -> bool:
+    """Start the Alpaca quote stream using keys from the USB keys.env (no-op if already running)."""
+    if quote_service.running:
+        return True
+    from app.core.usb_guard import get_keys_dict
 
-def get_quote(symbol: str):
-    return {"symbol": symbol, "bid": 100.0, "ask": 100.2, "last": 100.1, "ts": datetime.utcnow()}
+    kv = get_keys_dict(usb_path)
+    key, secret = kv.get("ALPACA_API_KEY_ID"), kv.get("ALPACA_API_SECRET_KEY")
+    if not (key and secret):
+        return False
+    try:
+        quote_service.start(AlpacaQuoteFeed(key, secret))
+    except Exception:
+        return False
+    return True
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+"""
+In-process stand-in for ``AlpacaService``.
+
+``MockBroker`` has the same methods the trader, ``OrderManager`` and
+``BrokerState`` use (account, positions, limit/stop-limit submit, replace,
+cancel, open orders, get_order), so a ``TraderEngine`` runs against it
+unchanged. Nothing fills on its own. Quotes drive the book: subscribe
+``on_quote`` to a ``QuoteBook`` (or call it from a replay) and every working
+order is checked against the new bid/ask with a deterministic ``FillModel``.
+Trade updates go to ``subscribe``d listeners with the same ``(event, update)``
+shape as ``TradeUpdateFeed``.
+
+Latency is explicit. Each API call pays ``ack_latency_sec`` through the injected
+``sleep``: a real sleep when benchmarking, a no-op or a virtual-clock advance in
+a backtest. An order cannot fill until ``fill_latency_sec`` after its
+submission, measured on the injected ``clock`` against the quotes'
+``quote_recv_ts``. Cash is the only funding source (no margin, and no settlement
+lag).
+"""
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.services.market_data import Quote
+
+OPEN_STATUSES = ("pending_new", "new", "accepted", "partially_filled")
+
+
+class MockBrokerError(Exception):
+    """Raised where Alpaca would answer with an API error (unknown order, insufficient funds)."""
+
+
+@dataclass(frozen=True)
+class FillModel:
+    # Buys fill at the ask once ask <= limit (sells at the bid once bid >= limit). ``through_bps``
+    # asks for the price to trade through the limit by that much first (queue-position haircut)
+    through_bps: float = 0.0
+    max_fill_per_quote: Optional[float] = None  # shares per quote event; None fills the remainder at once
+    reject_every: int = 0  # every n-th order is rejected after its ack (0 = never)
+    reject_symbols: Tuple[str, ...] = ()
+
+
+@dataclass
+class MockOrder:
+    id: str
+    symbol: str
+    side: str  # "buy" | "sell"
+    qty: float
+    limit_price: float
+    type: str = "limit"
+    stop_price: Optional[float] = None
+    time_in_force: str = "day"
+    extended_hours: bool = False
+    client_order_id: Optional[str] = None
+    status: str = "new"
+    filled_qty: float = 0.0
+    filled_avg_price: Optional[float] = None
+    replaced_by: Optional[str] = None
+    triggered: bool = False  # stop-limit: stop price reached, now working as a limit
+    submitted_ts: float = 0.0
+    submitted_at: Optional[datetime] = None
+    events: List[str] = field(default_factory=list)
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.qty - self.filled_qty)
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in OPEN_STATUSES
+
+
+@dataclass
+class MockPosition:
+    symbol: str
+    qty: float
+    avg_entry_price: float
+    current_price: float = 0.0
+
+    @property
+    def market_value(self) -> float:
+        return self.qty * self.current_price
+
+
+def _enum_value(value: Any) -> str:
+    return str(getattr(value, "value", value)).lower()
+
+
+class MockBroker:
+    api_key: Optional[str] = None  # no live stream; the trader falls back to reconcile()
+    api_secret: Optional[str] = None
+
+    def __init__(
+        self,
+        cash: float = 10_000.0,
+        fill_model: FillModel = FillModel(),
+        ack_latency_sec: float = 0.0,
+        fill_latency_sec: float = 0.0,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.cash = float(cash)
+        self.fill_model = fill_model
+        self.ack_latency_sec = ack_latency_sec
+        self.fill_latency_sec = fill_latency_sec
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._submits = 0
+        self.orders: Dict[str, MockOrder] = {}
+        self._working: Dict[str, MockOrder] = {}  # open orders only; what quotes are matched against
+        self.positions: Dict[str, MockPosition] = {}
+        self.quotes: Dict[str, Quote] = {}
+        self.fills: List[Dict[str, Any]] = []  # one row per execution, in order
+        self.calls: Dict[str, int] = {}
+        self._listeners: List[Callable[[str, Any], None]] = []
+
+    # --------------- Account & Positions ---------------
+    def get_account(self) -> Any:
+        self._call("get_account")
+        with self._lock:
+            equity = self.cash + sum(p.market_value for p in self.positions.values())
+            buying_power = self._buying_power()
+        return SimpleNamespace(
+            cash=f"{self.cash:.2f}",
+            equity=f"{equity:.2f}",
+            non_marginable_buying_power=f"{buying_power:.2f}",
+            buying_power=f"{buying_power:.2f}",
+            daytrading_buying_power="0",
+            daytrade_count=0,
+            classification="cash",
+            trading_blocked=False,
+            account_blocked=False,
+            status="ACTIVE",
+        )
+
+    def get_all_positions(self) -> List[Any]:
+        self._call("get_all_positions")
+        with self._lock:
+            return [self._position_view(p) for p in self.positions.values()]
+
+    def get_position(self, symbol: str) -> Any | None:
+        self._call("get_position")
+        with self._lock:
+            p = self.positions.get(symbol)
+            return self._position_view(p) if p is not None else None
+
+    @staticmethod
+    def _position_view(p: MockPosition) -> Any:
+        return SimpleNamespace(
+            symbol=p.symbol, qty=str(p.qty), avg_entry_price=str(p.avg_entry_price),
+            current_price=str(p.current_price), market_value=str(p.market_value),
+        )
+
+    # --------------- Orders ---------------
+    def submit_limit(
+        self,
+        *,
+        symbol: str,
+        qty: Union[int, float],
+        side: Any,
+        limit_price: float,
+        tif: Any = "day",
+        extended_hours: bool = False,
+        client_order_id: Optional[str] = None,
+    ) -> MockOrder:
+        self._call("submit_limit")
+        return self._submit(symbol, qty, _enum_value(side), limit_price, None, tif, extended_hours, client_order_id)
+
+    def submit_stop_limit(
+        self,
+        *,
+        symbol: str,
+        qty: Union[int, float],
+        side: Any,
+        stop_price: float,
+        limit_price: float,
+        tif: Any = "day",
+        extended_hours: bool = False,
+        client_order_id: Optional[str] = None,
+    ) -> MockOrder:
+        self._call("submit_stop_limit")
+        return self._submit(symbol, qty, _enum_value(side), limit_price, stop_price, tif, extended_hours, client_order_id)
+
+    def replace_limit(self, order_id: str, *, new_limit_price: float, qty: Optional[float] = None) -> MockOrder:
+        self._call("replace_limit")
+        with self._lock:
+            old = self._open_order(order_id)
+            new = self._new_order(
+                old.symbol, old.remaining if qty is None else qty, old.side, new_limit_price, old.stop_price,
+                old.time_in_force, old.extended_hours, None,
+            )
+            new.triggered = old.triggered
+            old.replaced_by = new.id
+            self._finish(old, "replaced")
+            self._emit("replaced", old)
+            self._emit("new", new)
+            self._match(new)
+            return new
+
+    def cancel_order(self, order_id: str) -> None:
+        self._call("cancel_order")
+        with self._lock:
+            order = self._open_order(order_id)
+            self._finish(order, "canceled")
+            self._emit("canceled", order)
+
+    def expire_day_orders(self) -> None:
+        """End of the trading day: every open DAY order expires, as it would at the broker."""
+        with self._lock:
+            for order in [o for o in self._working.values() if o.time_in_force == "day"]:
+                self._finish(order, "expired")
+                self._emit("expired", order)
+
+    def get_open_orders(self, symbol: Optional[str] = None) -> List[MockOrder]:
+        self._call("get_open_orders")
+        with self._lock:
+            return [o for o in self._working.values() if symbol is None or o.symbol == symbol]
+
+    def get_order(self, order_id: str) -> MockOrder:
+        self._call("get_order")
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                raise MockBrokerError(f"order not found: {order_id}")
+            return order
+
+    # --------------- Events ---------------
+    def subscribe(self, callback: Callable[[str, Any], None]) -> None:
+        """``callback(event, update)`` like ``TradeUpdateFeed``; ``update.order`` is the ``MockOrder``."""
+        self._listeners.append(callback)
+
+    def on_quote(self, q: Quote) -> None:
+        """Quote-book listener: mark positions and fill whatever the new bid/ask reaches."""
+        with self._lock:
+            self.quotes[q.symbol] = q
+            pos = self.positions.get(q.symbol)
+            if pos is not None and q.bid and q.ask:
+                pos.current_price = q.last if q.last is not None else (q.bid + q.ask) / 2.0
+            for order in [o for o in self._working.values() if o.symbol == q.symbol]:
+                self._match(order)
+
+    # --------------- Internals ---------------
+    def _call(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.ack_latency_sec > 0:
+            self._sleep(self.ack_latency_sec)
+
+    def _open_order(self, order_id: str) -> MockOrder:
+        order = self.orders.get(order_id)
+        if order is None:
+            raise MockBrokerError(f"order not found: {order_id}")
+        if not order.is_open:
+            raise MockBrokerError(f"order is {order.status}: {order_id}")
+        return order
+
+    def _new_order(self, symbol, qty, side, limit_price, stop_price, tif, extended_hours, client_order_id) -> MockOrder:
+        now = self._clock()
+        order = MockOrder(
+            id=f"mock-{next(self._ids)}",
+            symbol=symbol,
+            side=side,
+            qty=float(qty),
+            limit_price=float(limit_price),
+            type="stop_limit" if stop_price is not None else "limit",
+            stop_price=stop_price,
+            time_in_force=_enum_value(tif),
+            extended_hours=extended_hours,
+            client_order_id=client_order_id,
+            submitted_ts=now,
+            submitted_at=datetime.fromtimestamp(now, tz=timezone.utc),
+        )
+        self.orders[order.id] = order
+        self._working[order.id] = order
+        return order
+
+    def _submit(self, symbol, qty, side, limit_price, stop_price, tif, extended_hours, client_order_id) -> MockOrder:
+        with self._lock:
+            if qty <= 0 or limit_price <= 0:
+                raise MockBrokerError("qty and limit_price must be positive")
+            if side == "buy" and stop_price is None:
+                if qty * limit_price > self._buying_power() + 1e-9:
+                    raise MockBrokerError("insufficient buying power")
+            if side == "sell":
+                pos = self.positions.get(symbol)
+                held = sum(o.remaining for o in self._working.values() if o.symbol == symbol and o.side == "sell")
+                if pos is None or qty > pos.qty - held + 1e-9:
+                    raise MockBrokerError("insufficient qty available for order")
+            order = self._new_order(symbol, qty, side, limit_price, stop_price, tif, extended_hours, client_order_id)
+            self._submits += 1
+            fm = self.fill_model
+            if symbol in fm.reject_symbols or (fm.reject_every and self._submits % fm.reject_every == 0):
+                self._finish(order, "rejected")
+                self._emit("rejected", order)
+                return order
+            self._emit("new", order)
+            self._match(order)
+            return order
+
+    def _buying_power(self) -> float:
+        """Cash not already held for open buy orders."""
+        held = sum(o.remaining * o.limit_price for o in self._working.values() if o.side == "buy")
+        return max(0.0, self.cash - held)
+
+    def _match(self, order: MockOrder) -> None:
+        q = self.quotes.get(order.symbol)
+        if q is None or q.bid is None or q.ask is None or not order.is_open:
+            return
+        if q.quote_recv_ts < order.submitted_ts + self.fill_latency_sec:
+            return
+        if order.stop_price is not None and not order.triggered:
+            hit = q.bid <= order.stop_price if order.side == "sell" else q.ask >= order.stop_price
+            if not hit:
+                return
+            order.triggered = True
+        through = order.limit_price * self.fill_model.through_bps / 10_000.0
+        if order.side == "buy":
+            px, ok = q.ask, q.ask <= order.limit_price - through
+        else:
+            px, ok = q.bid, q.bid >= order.limit_price + through
+        if not ok:
+            return
+        qty = order.remaining
+        if self.fill_model.max_fill_per_quote is not None:
+            qty = min(qty, self.fill_model.max_fill_per_quote)
+        if order.side == "buy":
+            qty = min(qty, float(int(self.cash / px)) if px > 0 else 0.0)  # never below zero cash
+        if qty <= 0:
+            return
+        self._execute(order, qty, px)
+
+    def _execute(self, order: MockOrder, qty: float, px: float) -> None:
+        prev = order.filled_qty
+        order.filled_qty = prev + qty
+        order.filled_avg_price = ((order.filled_avg_price or 0.0) * prev + px * qty) / order.filled_qty
+        pos = self.positions.get(order.symbol)
+        if order.side == "buy":
+            self.cash -= qty * px
+            if pos is None:
+                pos = self.positions[order.symbol] = MockPosition(order.symbol, 0.0, 0.0, px)
+            pos.avg_entry_price = (pos.avg_entry_price * pos.qty + px * qty) / (pos.qty + qty)
+            pos.qty += qty
+        else:
+            self.cash += qty * px
+            assert pos is not None
+            pos.qty -= qty
+            if pos.qty <= 1e-9:
+                del self.positions[order.symbol]
+        if pos is not None:
+            pos.current_price = px
+        self.fills.append({
+            "ts": self._clock(), "order_id": order.id, "symbol": order.symbol,
+            "side": order.side, "qty": qty, "price": px,
+        })
+        done = order.remaining <= 1e-9
+        if done:
+            self._finish(order, "filled")
+        else:
+            order.status = "partially_filled"
+        self._emit("fill" if done else "partial_fill", order)
+
+    def _finish(self, order: MockOrder, status: str) -> None:
+        order.status = status
+        self._working.pop(order.id, None)
+
+    def _emit(self, event: str, order: MockOrder) -> None:
+        order.events.append(event)
+        update = SimpleNamespace(event=event, order=order, timestamp=self._clock())
+        for callback in list(self._listeners):
+            try:
+                callback(event, update)
+            except Exception as e:
+                print(f"[MockBroker] listener error: {e}")
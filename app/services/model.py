@@ -1,20 +1,80 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import contextlib
+import math
+import os
+import tempfile
+import threading
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timezone
-from typing import Dict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 from joblib import dump, load
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score, precision_score, roc_auc_score
 from sklearn.preprocessing import StandardScaler
 
+from app.config import settings as cfg
 from app.config.paths import MODELS_DIR
+from app.core.latency import span
+from app.services.cv import (
+    FoldMetrics,
+    classification_metrics,
+    fit_scaled_logreg,
+    purged_kfold_folds,
+    run_folds,
+    summarize,
+    walk_forward_folds,
+)
+from app.services.feature_engine import FeatureEngine
 from app.services.features import FEATURE_COLS, add_all_features, make_dataset
 from app.services.history import fetch_tsla_bars
 
 MODEL_PATH = MODELS_DIR / "tsla_direction_model.joblib"
+_engines: Dict[Tuple[str, int], FeatureEngine] = {}
+_engines_lock = threading.Lock()
+@dataclass(frozen=True)
+class FusedLinear:
+    """
+    ``StandardScaler`` folded into the logistic regression: p_up = sigmoid(x . weights + bias).
+    Scoring is one dot product, with none of sklearn's per-call validation.
+    """
+    weights: np.ndarray
+    bias: float
+    @classmethod
+    def from_sklearn(cls, scaler: StandardScaler, clf: LogisticRegression) -> "FusedLinear":
+        coef = np.asarray(clf.coef_, dtype=float).ravel()
+        mean = scaler.mean_ if getattr(scaler, "mean_", None) is not None else np.zeros_like(coef)
+        scale = scaler.scale_ if getattr(scaler, "scale_", None) is not None else np.ones_like(coef)
+        weights = coef / scale
+        bias = float(np.asarray(clf.intercept_, dtype=float).ravel()[0] - np.dot(weights, mean))
+        return cls(weights=np.ascontiguousarray(weights), bias=bias)
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> Optional["FusedLinear"]:
+        fused = payload.get("fused")
+        if fused is not None:
+            return cls(weights=np.asarray(fused["weights"], dtype=float), bias=float(fused["bias"]))
+        if "scaler" in payload and "model" in payload:  # model files from before fusing was exported
+            try:
+                return cls.from_sklearn(payload["scaler"], payload["model"])
+            except Exception:
+                return None
+        return None
+    def to_payload(self) -> Dict[str, Any]:
+        return {"weights": self.weights.tolist(), "bias": self.bias}
+    def score(self, x: np.ndarray) -> float:
+        z = float(self.weights @ x) + self.bias
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+    def score_batch(self, X: np.ndarray) -> np.ndarray:
+        z = np.asarray(X, dtype=float) @ self.weights + self.bias
+        e = np.exp(-np.abs(z))
+        return np.where(z >= 0, 1.0 / (1.0 + e), e / (1.0 + e))
 @dataclass
 class TrainResult:
     metrics: Dict[str, float]
@@ -24,66 +84,190 @@ class TrainResult:
     interval: str
     lookback_days: int
     features: list
+    cv_mode: str = "holdout"
+    folds: List[FoldMetrics] = field(default_factory=list)
+CV_MODES = ("holdout", "walk_forward", "purged_kfold")
 def _time_split(X: pd.DataFrame, y: pd.Series, test_frac: float = 0.2):
     n = len(X)
     n_test = max(50, int(n * test_frac))
     idx_split = n - n_test
     return X.iloc[:idx_split], X.iloc[idx_split:], y.iloc[:idx_split], y.iloc[idx_split:]
-def train_direction_model(interval: str, lookback_days: int) -> TrainResult:
+def train_direction_model(
+    interval: str,
+    lookback_days: int,
+    cv_mode: str = "holdout",
+    n_folds: int = cfg.CV_FOLDS,
+    on_fold: Optional[Callable[[FoldMetrics], None]] = None,
+) -> TrainResult:
+    """
+    Fit and save the direction model. ``cv_mode`` picks how it is validated: a single 80/20
+    time split ("holdout"), or "walk_forward" / "purged_kfold" folds fitted in parallel, in
+    which case the saved model is refit on every row and ``on_fold`` gets each fold's metrics.
+    """
+    if cv_mode not in CV_MODES:
+        raise ValueError(f"cv_mode must be one of {CV_MODES}")
     df = fetch_tsla_bars(interval=interval, lookback_days=lookback_days)
     df_feat = add_all_features(df)
     X, y = make_dataset(df_feat)
     if len(X) < 200:
         raise RuntimeError("Not enough data after feature engineering to train (need >=200 rows).")
-    Xtr, Xte, ytr, yte = _time_split(X, y, test_frac=0.2)
-    scaler = StandardScaler()
-    Xtr_s = scaler.fit_transform(Xtr.values)
-    Xte_s = scaler.transform(Xte.values)
-    clf = LogisticRegression(max_iter=1000, n_jobs=None)
-    clf.fit(Xtr_s, ytr.values)
-    proba = clf.predict_proba(Xte_s)[:,1]
-    pred = (proba >= 0.5).astype(int)
-    acc = accuracy_score(yte, pred)
-    try:
-        auc = roc_auc_score(yte, proba)
-    except Exception:
-        auc = float("nan")
-    try:
-        prec = precision_score(yte, pred, zero_division=0)
-    except Exception:
-        prec = float("nan")
+    folds: List[FoldMetrics] = []
+    if cv_mode == "holdout":
+        Xtr, Xte, ytr, yte = _time_split(X, y, test_frac=0.2)
+        scaler, clf = fit_scaled_logreg(Xtr.values, ytr.values)
+        proba = clf.predict_proba(scaler.transform(Xte.values))[:,1]
+        metrics = classification_metrics(yte.values, proba)
+        n_train, n_test = len(Xtr), len(Xte)
+    else:
+        if cv_mode == "walk_forward":
+            specs = walk_forward_folds(len(X), n_folds, purge=cfg.CV_PURGE_BARS)
+        else:
+            specs = purged_kfold_folds(len(X), n_folds, purge=cfg.CV_PURGE_BARS, embargo=cfg.CV_EMBARGO_BARS)
+        if not specs:
+            raise RuntimeError("Not enough data for the requested number of folds.")
+        folds = run_folds(X.values, y.values, specs, max_workers=cfg.CV_MAX_WORKERS, on_fold=on_fold)
+        metrics = summarize(folds)
+        scaler, clf = fit_scaled_logreg(X.values, y.values)
+        n_train, n_test = len(X), sum(f.n_test for f in folds)
     payload = {
         "model": clf,
         "scaler": scaler,
         "features": FEATURE_COLS,
         "interval": interval,
         "lookback_days": lookback_days,
+        "fused": FusedLinear.from_sklearn(scaler, clf).to_payload(),
         "trained_at": datetime.now(timezone.utc).isoformat(),
-        "metrics": {"accuracy": float(acc), "roc_auc": float(auc), "precision_up": float(prec)},
+        "metrics": metrics,
+        "cv": {"mode": cv_mode, "folds": [asdict(f) for f in folds]},
     }
-    MODELS_DIR.mkdir(parents=True, exist_ok=True)
-    dump(payload, MODEL_PATH)
+    _dump_atomic(payload, MODEL_PATH)
     return TrainResult(metrics=payload["metrics"], model_path=str(MODEL_PATH),
-                       n_train=len(Xtr), n_test=len(Xte),
-                       interval=interval, lookback_days=lookback_days, features=FEATURE_COLS)
+                       n_train=n_train, n_test=n_test,
+                       interval=interval, lookback_days=lookback_days, features=FEATURE_COLS,
+                       cv_mode=cv_mode, folds=folds)
+def _dump_atomic(payload: Dict[str, Any], path: Path) -> None:
+    """Write to a temp file and rename over ``path`` so readers never see a partial model."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name, dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            dump(payload, f)
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        try:
+            if os.path.exists(tmp): os.remove(tmp)
+        except Exception: pass
+@dataclass(frozen=True)
+class LoadedModel:
+    """One unpickled model file; ``version`` is the file's (mtime_ns, size, inode) when it was read."""
+    payload: Dict[str, Any]
+    version: Tuple[int, int, int]
+    fused: Optional[FusedLinear] = None
+    @property
+    def interval(self) -> Optional[str]:
+        return self.payload.get("interval")
+    @property
+    def trained_at(self) -> Optional[str]:
+        return self.payload.get("trained_at")
+class ModelCache:
+    """
+    Process-wide model cache. ``get`` costs one ``stat``; the file is unpickled again only when it
+    changes on disk, and the new ``LoadedModel`` replaces the old one in a single assignment.
+    A file that fails to load is not retried until it changes again.
+    ``pin`` makes every ``get`` in the current context return one fixed model.
+    """
+    def __init__(self, path: Path = MODEL_PATH, loader: Callable[[Path], Any] = load) -> None:
+        self.path = Path(path)
+        self._loader = loader
+        self._current: Optional[LoadedModel] = None
+        self._failed: Optional[Tuple[int, int, int]] = None  # stat of the last file that failed to load
+        self._lock = threading.Lock()
+        self._pinned: ContextVar[Optional[LoadedModel]] = ContextVar(f"pinned_model_{id(self)}", default=None)
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+    def get(self) -> Optional[LoadedModel]:
+        pinned = self._pinned.get()
+        if pinned is not None:
+            return pinned
+        version = self._stat()
+        if version is None:
+            return None
+        current = self._current
+        if current is not None and current.version == version or version == self._failed:
+            return current
+        with self._lock:
+            current = self._current
+            if current is not None and current.version == version or version == self._failed:
+                return current
+            try:
+                payload = self._loader(self.path)
+            except Exception as e:
+                # unreadable file: keep serving the last good model, and don't unpickle it again per call
+                self._failed = version
+                print(f"[Model] {self.path} failed to load, keeping the previous model: {e}")
+                return current
+            fresh = LoadedModel(payload=payload, version=version, fused=FusedLinear.from_payload(payload))
+            self._current = fresh
+            return fresh
+    @contextlib.contextmanager
+    def pin(self, model: Optional[LoadedModel] = None) -> Iterator[Optional[LoadedModel]]:
+        """Hold one model version (default: the current one) for the duration of the block."""
+        token = self._pinned.set(model if model is not None else self.get())
+        try:
+            yield self._pinned.get()
+        finally:
+            self._pinned.reset(token)
+    def warm(self) -> bool:
+        """Load the model and prime its feature engine so the first decision doesn't pay for either."""
+        handle = self.get()
+        if handle is None:
+            return False
+        try:
+            latest_features(handle.interval or "5m", handle.payload.get("lookback_days", 5))
+        except Exception:
+            pass
+        return True
+    def warm_in_background(self) -> threading.Thread:
+        t = threading.Thread(target=self.warm, name="ModelWarmup", daemon=True)
+        t.start()
+        return t
+model_cache = ModelCache()
 def load_model():
-    if not MODEL_PATH.exists():
-        return None
-    return load(MODEL_PATH)
-def predict_p_up_latest(interval: str) -> float:
-    payload = load_model()
-    if payload is None:
+    handle = model_cache.get()
+    return handle.payload if handle is not None else None
+def latest_features(interval: str, lookback_days: int) -> Optional[np.ndarray]:
+    """Newest complete ``FEATURE_COLS`` row, advanced incrementally from the shared bar cache."""
+    with span("bar_fetch"):
+        df = fetch_tsla_bars(interval=interval, lookback_days=lookback_days)
+    with _engines_lock, span("feature_build"):
+        engine = _engines.setdefault((interval, lookback_days), FeatureEngine())
+        return engine.sync(df)
+def predict_p_up_latest(interval: str, model: Optional[LoadedModel] = None) -> float:
+    with span("model_load"):
+        handle = model if model is not None else model_cache.get()
+    if handle is None:
         return float("nan")
+    payload = handle.payload
     if payload.get("interval") != interval:
         return float("nan")
-    from app.services.features import FEATURE_COLS, add_all_features
-    from app.services.history import fetch_tsla_bars
-    df = fetch_tsla_bars(interval=interval, lookback_days=payload.get("lookback_days", 5))
-    df_feat = add_all_features(df)
-    X = df_feat[FEATURE_COLS].dropna()
-    if X.empty:
+    x = latest_features(interval, payload.get("lookback_days", 5))
+    if x is None:
         return float("nan")
-    scaler = payload["scaler"]; clf = payload["model"]
-    x_last = scaler.transform(X.iloc[[-1]].values)
-    p = float(clf.predict_proba(x_last)[:,1][0])
-    return p
+    with span("predict"):
+        if handle.fused is not None:
+            return handle.fused.score(x)
+        scaler = payload["scaler"]; clf = payload["model"]
+        x_last = scaler.transform(x.reshape(1, -1))
+        p = float(clf.predict_proba(x_last)[:,1][0])
+        return p
+def predict_p_up_batch(X: Any, model: Optional[LoadedModel] = None) -> np.ndarray:
+    """p_up for every row of a ``FEATURE_COLS`` matrix (array or DataFrame) with the fused weights."""
+    handle = model if model is not None else model_cache.get()
+    if handle is None or handle.fused is None:
+        return np.full(len(X), np.nan)
+    return handle.fused.score_batch(np.asarray(X, dtype=float))
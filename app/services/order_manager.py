@@ -0,0 +1,401 @@
+from __future__ import annotations
+
+"""
+Non-blocking order management.
+
+Every limit order the trader places becomes a ``WorkingOrder`` state machine:
+
+    SUBMITTED -> WORKING <-> REPLACING
+                 WORKING  -> PARTIALLY_FILLED <-> REPLACING
+                 PARTIALLY_FILLED -> DONE
+                 WORKING  -> DONE (filled / canceled / expired / rejected)
+
+Transitions are driven by events, never by a polling loop on the trader thread:
+trade updates from the account stream (``on_trade_update``), quote updates that
+may reprice a working order (``on_quote``), window timers for extended-hours
+FOK-style orders, and ``reconcile`` as a heartbeat fallback when the stream is
+down. Orders placed elsewhere (the trader's protective stop) can be cancelled
+through ``cancel_watched``, whose callback fires on the same events. Broker calls triggered by events (replace, cancel, resubmit) run on a small
+worker pool so neither the quote feed nor the trader loop waits on the network.
+The clock, the timers, the pool and the quote source can be swapped for a
+``SimClock`` and a replayed book, which is how the backtester runs this code.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from alpaca.trading.enums import OrderSide, TimeInForce
+
+from app.config import settings as cfg
+from app.core.clock import CallLater, call_later
+from app.services import pricing
+from app.services.alpaca_client import AlpacaService
+from app.services.market_data import Quote, get_quote
+
+SUBMITTED = "submitted"
+WORKING = "working"
+REPLACING = "replacing"
+PARTIALLY_FILLED = "partially_filled"
+DONE = "done"
+
+_TERMINAL_EVENTS = {"fill", "canceled", "expired", "rejected", "done_for_day", "stopped", "suspended"}
+_FINAL_STATUSES = ("filled", "canceled", "expired", "rejected")
+
+
+@dataclass
+class ReplaceState:
+    last_ts: float = 0.0
+    count: int = 0
+    cooling_until: float = 0.0
+
+
+@dataclass
+class WorkingOrder:
+    order_id: str
+    symbol: str
+    side: str  # "BUY" | "SELL"
+    qty: float
+    limit_price: float
+    extended_hours: bool = False
+    phase: str = SUBMITTED
+    filled_qty: float = 0.0  # across every window/replacement of this order
+    filled_avg_price: Optional[float] = None
+    final_status: Optional[str] = None
+    windows_left: int = 0  # extra FOK windows after the current one
+    window_sec: float = 0.0
+    replace: ReplaceState = field(default_factory=ReplaceState)
+    created_ts: float = field(default_factory=time.time)
+    on_update: Optional[Callable[["WorkingOrder"], None]] = None
+    _window_filled: float = 0.0  # fills of the current broker order id
+    _prior_qty: float = 0.0  # fills of earlier windows
+    _prior_notional: float = 0.0
+    _rolled_id: Optional[str] = None  # broker id whose window already scheduled the next one
+
+    @property
+    def remaining(self) -> float:
+        return max(0.0, self.qty - self.filled_qty)
+
+    @property
+    def done(self) -> bool:
+        return self.phase == DONE
+
+
+def _order_side(side: str) -> OrderSide:
+    return OrderSide.BUY if side == "BUY" else OrderSide.SELL
+
+
+class OrderManager:
+    def __init__(
+        self,
+        alpaca: AlpacaService,
+        risk: Optional[cfg.RiskSettings] = None,
+        max_workers: int = 2,
+        *,
+        clock: Callable[[], float] = time.time,
+        call_later: CallLater = call_later,
+        pool: Any = None,  # anything with submit(fn, *args); a worker pool by default
+        quote: Optional[Callable[[str], Dict[str, Any]]] = None,  # get_quote by default
+    ) -> None:
+        self.alpaca = alpaca
+        self.risk = risk or cfg.RiskSettings()
+        self._clock = clock
+        self._call_later = call_later
+        self._quote = quote
+        self._lock = threading.RLock()
+        self._orders: Dict[str, WorkingOrder] = {}  # keyed by the current broker order id
+        self._pool = pool if pool is not None else ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="OrderManager")
+        self._listeners: List[Callable[[WorkingOrder], None]] = []
+        self._watched: Dict[str, Callable[[str], None]] = {}  # order id -> on_final(status), see cancel_watched
+
+    # --------------- Queries ---------------
+    def working(self, symbol: Optional[str] = None) -> List[WorkingOrder]:
+        with self._lock:
+            return [o for o in self._orders.values() if not o.done and (symbol is None or o.symbol == symbol)]
+
+    def has_working(self, symbol: Optional[str] = None) -> bool:
+        return bool(self.working(symbol))
+
+    def subscribe(self, callback: Callable[[WorkingOrder], None]) -> None:
+        """``callback(order)`` after every state change of any order."""
+        self._listeners.append(callback)
+
+    # --------------- Submission ---------------
+    def submit_limit(
+        self,
+        symbol: str,
+        qty: float,
+        side: str,
+        limit_price: float,
+        *,
+        extended_hours: bool = False,
+        fok_windows: int = 0,
+        window_sec: float = 0.0,
+        on_update: Optional[Callable[[WorkingOrder], None]] = None,
+    ) -> WorkingOrder:
+        """
+        Submit and return immediately. With ``fok_windows`` > 0 the order is cancelled after
+        ``window_sec`` and whatever is unfilled is resubmitted at a fresh price, up to that many
+        windows in total (extended-hours FOK emulation); partial fills are kept.
+        """
+        placed = self.alpaca.submit_limit(
+            symbol=symbol, qty=qty, side=_order_side(side), limit_price=limit_price,
+            tif=TimeInForce.DAY, extended_hours=extended_hours,
+        )
+        order = WorkingOrder(
+            order_id=str(placed.id),
+            symbol=symbol,
+            side=side,
+            qty=float(qty),
+            limit_price=float(limit_price),
+            extended_hours=extended_hours,
+            windows_left=max(0, fok_windows - 1),
+            window_sec=window_sec,
+            created_ts=self._clock(),
+            on_update=on_update,
+        )
+        with self._lock:
+            self._orders[order.order_id] = order
+        self._apply_order(order, placed)
+        if fok_windows > 0:
+            self._arm_window(order)
+        return order
+
+    def cancel(self, order: WorkingOrder) -> None:
+        self._pool.submit(self._cancel_quietly, order.order_id)
+
+    def cancel_watched(self, order_id: str, on_final: Callable[[str], None]) -> None:
+        """
+        Cancel an order placed outside the manager and return at once. ``on_final(status)`` runs
+        once, when a trade update, the read-back after the cancel or ``reconcile`` shows it
+        "canceled", "expired", "rejected" or "filled".
+        """
+        with self._lock:
+            self._watched[order_id] = on_final
+        self._pool.submit(self._cancel_and_refresh, order_id)
+
+    def _cancel_and_refresh(self, order_id: str) -> None:
+        self._cancel_quietly(order_id)
+        self.refresh_watched(order_id)  # the order may have been gone already, with no event to come
+
+    def refresh_watched(self, order_id: str) -> None:
+        """One read of a watched order from the broker (no-op once it has settled)."""
+        if order_id not in self._watched:
+            return
+        try:
+            self._settle_watched(order_id, self.alpaca.get_order(order_id))
+        except Exception:
+            pass
+
+    def _cancel_quietly(self, order_id: str) -> None:
+        try:
+            self.alpaca.cancel_order(order_id)
+        except Exception:
+            pass
+
+    # --------------- Events ---------------
+    def on_trade_update(self, event: str, update: Any) -> None:
+        """Account-stream listener (same signature as ``TradeUpdateFeed`` callbacks)."""
+        broker_order = getattr(update, "order", None)
+        order_id = str(getattr(broker_order, "id", "") or "")
+        with self._lock:
+            order = self._orders.get(order_id)
+        if order is None:
+            self._settle_watched(order_id, broker_order, event)
+            return
+        if event == "replaced":
+            new_id = str(getattr(broker_order, "replaced_by", "") or "")
+            self._rekey(order, new_id)
+            return
+        if event == "pending_replace":
+            self._transition(order, REPLACING)
+            return
+        self._apply_order(order, broker_order, event=event)
+
+    def on_quote(self, q: Quote) -> None:
+        """Quote-book listener: reprice working RTH orders for this symbol (throttled, off-thread).
+        A partially filled order keeps following the quote for its unfilled remainder."""
+        if q.bid is None or q.ask is None:
+            return
+        for order in self.working(q.symbol):
+            last = q.last if q.last is not None else (q.bid + q.ask) / 2.0
+            new_px = pricing.compute_entry_limit(order.side, q.bid, q.ask, last, self.risk.slippage_bps)
+            with self._lock:  # check-and-claim, so a burst of quotes sends one replace
+                if order.phase not in (WORKING, PARTIALLY_FILLED) or order.extended_hours \
+                        or not self._should_replace(order, new_px):
+                    continue
+                self._set_phase(order, REPLACING)
+            self._notify(order)
+            self._pool.submit(self._replace, order, new_px)
+
+    def reconcile(self) -> None:
+        """Heartbeat fallback: refresh every live order from the broker (one call per order)."""
+        for order in self.working():
+            try:
+                self._apply_order(order, self.alpaca.get_order(order.order_id))
+            except Exception:
+                continue
+        for order_id in list(self._watched):
+            self.refresh_watched(order_id)
+
+    # --------------- Internals ---------------
+    def _should_replace(self, order: WorkingOrder, new_px: float) -> bool:
+        now = self._clock()
+        st = order.replace
+        if now < st.cooling_until or (now - st.last_ts) < self.risk.replace_min_interval_sec:
+            return False
+        if order.limit_price <= 0:
+            return False
+        move_bps = abs((new_px - order.limit_price) / order.limit_price) * 10_000.0
+        return move_bps > self.risk.replace_bps_threshold
+
+    def _replace(self, order: WorkingOrder, new_px: float) -> None:
+        now = self._clock()
+        try:
+            placed = self.alpaca.replace_limit(
+                order.order_id, new_limit_price=round(new_px, 4), qty=order.remaining if order.filled_qty > 0 else None,
+            )
+        except Exception:
+            # Most often the order filled or was cancelled underneath us; the next update settles it
+            if order.phase == REPLACING:
+                self._transition(order, PARTIALLY_FILLED if order.filled_qty > 0 else WORKING)
+            return
+        st = order.replace
+        st.last_ts = now
+        st.count += 1
+        if st.count >= self.risk.replace_max_count:
+            st.cooling_until = now + self.risk.replace_cooldown_sec[0]
+            st.count = 0
+        self._rekey(order, str(getattr(placed, "id", "") or order.order_id))
+        order.limit_price = float(getattr(placed, "limit_price", None) or new_px)
+        self._apply_order(order, placed)
+
+    def _rekey(self, order: WorkingOrder, new_id: str) -> None:
+        with self._lock:
+            if new_id and new_id != order.order_id:
+                self._orders.pop(order.order_id, None)
+                self._roll_window(order, new_id)
+        if order.phase == REPLACING:
+            self._transition(order, PARTIALLY_FILLED if order.filled_qty > 0 else WORKING)
+
+    def _apply_order(self, order: WorkingOrder, broker_order: Any, event: Optional[str] = None) -> None:
+        with self._lock:
+            changed = self._apply_order_locked(order, broker_order, event)
+        # Listeners run outside the lock: they may place orders (stops, flip legs) over the network
+        if changed:
+            self._notify(order)
+
+    def _apply_order_locked(self, order: WorkingOrder, broker_order: Any, event: Optional[str]) -> bool:
+        """Fold a broker snapshot into ``order``; True if listeners should hear about it."""
+        broker_id = str(getattr(broker_order, "id", "") or "")
+        if broker_id and broker_id != order.order_id:
+            return False  # a late snapshot of an id this order has already moved past
+        status = getattr(broker_order, "status", None)
+        status = str(getattr(status, "value", status) or "")
+        event = event or status
+        filled = float(getattr(broker_order, "filled_qty", 0) or 0)
+        if filled > order._window_filled:
+            # Broker figures are cumulative for the current order id
+            avg = float(getattr(broker_order, "filled_avg_price", 0) or 0)
+            order._window_filled = filled
+            order.filled_qty = order._prior_qty + filled
+            if avg > 0:
+                order.filled_avg_price = (order._prior_notional + filled * avg) / order.filled_qty
+
+        if event in _TERMINAL_EVENTS or status in _FINAL_STATUSES:
+            if order._rolled_id == order.order_id:
+                # The window timer, the stream and reconcile all report the same end; roll once
+                return False
+            if order.remaining > 0 and order.windows_left > 0 and event != "rejected":
+                order._rolled_id = order.order_id
+                self._pool.submit(self._next_window, order)
+                return False
+            order.final_status = status or event
+            return self._set_phase(order, DONE)
+        if order.filled_qty > 0:
+            return self._set_phase(order, PARTIALLY_FILLED)
+        if order.phase in (SUBMITTED, PARTIALLY_FILLED) or event in ("new", "accepted", "pending_new"):
+            return self._set_phase(order, WORKING)
+        return True
+
+    def _settle_watched(self, order_id: str, broker_order: Any, event: Optional[str] = None) -> None:
+        status = getattr(broker_order, "status", None)
+        status = str(getattr(status, "value", status) or "")
+        if event == "fill":
+            status = "filled"
+        elif event in _FINAL_STATUSES:
+            status = event
+        if status not in _FINAL_STATUSES:
+            return
+        with self._lock:
+            on_final = self._watched.pop(order_id, None)
+        if on_final is None:
+            return
+        try:
+            on_final(status)
+        except Exception as e:
+            print(f"[OrderManager] listener error: {e}")
+
+    def _roll_window(self, order: WorkingOrder, new_id: str) -> None:
+        order._prior_qty = order.filled_qty
+        order._prior_notional = (order.filled_avg_price or 0.0) * order.filled_qty
+        order._window_filled = 0.0
+        order.order_id = new_id
+        self._orders[new_id] = order
+
+    def _set_phase(self, order: WorkingOrder, phase: str) -> bool:
+        with self._lock:
+            if order.phase == DONE:
+                return False
+            order.phase = phase
+            if phase == DONE:
+                self._orders.pop(order.order_id, None)  # late events for it have nothing left to change
+            return True
+
+    def _transition(self, order: WorkingOrder, phase: str) -> None:
+        """Set the phase and notify; callers must not hold ``_lock``."""
+        if self._set_phase(order, phase):
+            self._notify(order)
+
+    def _notify(self, order: WorkingOrder) -> None:
+        for callback in ([order.on_update] if order.on_update else []) + list(self._listeners):
+            try:
+                callback(order)
+            except Exception as e:
+                print(f"[OrderManager] listener error: {e}")
+
+    def _arm_window(self, order: WorkingOrder) -> None:
+        self._call_later(order.window_sec, self._window_expired, order, order.order_id)
+
+    def _window_expired(self, order: WorkingOrder, order_id: str) -> None:
+        if order.done or order.order_id != order_id:
+            return
+        self._cancel_quietly(order_id)
+        try:
+            self._apply_order(order, self.alpaca.get_order(order_id))
+        except Exception:
+            pass
+
+    def _next_window(self, order: WorkingOrder) -> None:
+        order.windows_left -= 1
+        price = order.limit_price
+        q = (self._quote or get_quote)(order.symbol)
+        if q["bid"] is not None and q["ask"] is not None:
+            price = pricing.compute_entry_limit(order.side, q["bid"], q["ask"], q["last"], self.risk.slippage_bps)
+        try:
+            placed = self.alpaca.submit_limit(
+                symbol=order.symbol, qty=order.remaining, side=_order_side(order.side), limit_price=price,
+                tif=TimeInForce.DAY, extended_hours=order.extended_hours,
+            )
+        except Exception:
+            order.final_status = "resubmit_failed"
+            self._transition(order, DONE)
+            return
+        with self._lock:
+            self._orders.pop(order.order_id, None)
+            self._roll_window(order, str(placed.id))
+            order.limit_price = price
+        self._transition(order, WORKING)
+        self._arm_window(order)
@@ -31,3 +31,10 @@ def compute_stop_limit(entry_avg: float, stop_loss_pct: float, limit_offset_bps:
     stop_price = entry_avg * (1 - stop_loss_pct)
     lim = stop_price * (1 - bps(limit_offset_bps))
     return round(stop_price, 4), round(lim, 4)
+
+def take_profit_level(entry_avg: float, peak: float, keep_fraction: float = 0.8) -> float:
+    """
+    P80 take-profit: exit once price gives back more than (1 - keep_fraction) of the run-up.
+    level = entry_avg + keep_fraction * (peak - entry_avg)
+    """
+    return entry_avg + keep_fraction * (peak - entry_avg)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import json
+import math
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 try:  # pragma: no cover - optional dependency in tests
@@ -123,3 +125,48 @@ def to_json_blob(scored: List[ScoredItem]) -> Dict[str, Any]:
         **aggregate,
         "items": [item.__dict__ for item in scored],
     }
+
+
+def load_latest_daily_score(sentiment_dir: Path) -> Optional[float]:
+    """``daily_score`` from the newest JSON blob in ``sentiment_dir``, clamped to [-1, 1]; None if unavailable."""
+    if not sentiment_dir.exists():
+        return None
+    try:
+        files = sorted(sentiment_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    except Exception:
+        return None
+    if not files:
+        return None
+    try:
+        with files[0].open("r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+        score = float(payload.get("daily_score"))
+    except Exception:
+        return None
+    if math.isnan(score):
+        return None
+    return max(-1.0, min(1.0, score))
+
+
+def load_daily_score_history(sentiment_dir: Path) -> List[Tuple[float, float]]:
+    """
+    ``(available_at, daily_score)`` for every JSON blob in ``sentiment_dir``, oldest first.
+    ``available_at`` is the blob's ``updated_at`` (epoch seconds), or the file's mtime if that
+    is missing; scores are clamped to [-1, 1] and unreadable files are skipped.
+    """
+    rows: List[Tuple[float, float]] = []
+    if not sentiment_dir.exists():
+        return rows
+    for path in sentiment_dir.glob("*.json"):
+        try:
+            with path.open("r", encoding="utf-8") as handle:
+                payload = json.load(handle)
+            score = float(payload.get("daily_score"))
+            stamp = payload.get("updated_at")
+            at = datetime.fromisoformat(stamp).timestamp() if stamp else path.stat().st_mtime
+        except Exception:
+            continue
+        if not math.isnan(score):
+            rows.append((at, max(-1.0, min(1.0, score))))
+    rows.sort()
+    return rows
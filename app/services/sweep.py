@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+"""
+Parameter sweeps over the backtester.
+
+A sweep runs the backtest once per parameter combination and ranks the
+combinations by a risk-adjusted score. The combinations come from a grid or
+a random search. The swept names are the decision knobs (gate threshold,
+near-coinflip buffer, wide-spread hint, VWAP disagreement, conviction
+down-weights, blend weight) plus the stop-loss, flip cooldown and take-profit
+keep fraction.
+
+The backtest quotes carry one synthetic spread, so the spread-dependent knobs
+(``spread_hint``, ``conviction_dw_wide_spread``) only matter when that spread
+straddles the swept values; ``inactive_params`` finds knobs that cannot change
+a single decision on the data, and ``run_sweep`` warns about them rather than
+silently multiplying identical runs.
+
+``run_sweep`` spreads combinations over a process pool. The bar and feature
+arrays are copied once into a single shared-memory block, and each worker maps
+it read-only in its initializer. Only parameter dicts and stats dicts cross
+process boundaries, and workers run without the per-order frames
+(``detail=False``).
+"""
+
+import itertools
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import replace
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings as cfg
+from app.services.backtest import BacktestConfig, BacktestData, run_backtest
+from app.services.decision_engine import DecisionKnobs
+
+Params = Dict[str, Any]
+
+# sweep name -> DecisionKnobs field ("w_model" also sets w_sent = 1 - w_model)
+KNOB_PARAMS = {
+    "gate_threshold": "base_gate",
+    "gate_buffer": "gate_buffer",
+    "spread_hint": "spread_hint",
+    "vwap_disagree_bps": "vwap_disagree_bps",
+    "conviction_dw_vwap": "conviction_dw_vwap",
+    "conviction_dw_wide_spread": "conviction_dw_wide_spread",
+    "w_model": "w_model",
+}
+RISK_PARAMS = ("stop_loss_pct",)
+CONFIG_PARAMS = ("flip_cooldown_sec", "take_profit_keep")
+
+# Around the shipped defaults; 3^7 = 2,187 combinations as a full grid. The spread knobs are
+# left out: the synthetic backtest spread (2 * BACKTEST_HALF_SPREAD_BPS) sits below every hint
+DEFAULT_SPACE: Dict[str, Sequence[Any]] = {
+    "gate_threshold": (0.52, cfg.GATE_THRESHOLD_DEFAULT, 0.58),
+    "gate_buffer": (0.01, cfg.GATE_BUFFER_NEAR_COINFLIP, 0.05),
+    "vwap_disagree_bps": (20, cfg.VWAP_DISAGREE_BPS, 60),
+    "conviction_dw_vwap": (0.75, cfg.CONVICTION_DW_VWAP, 1.0),
+    "w_model": (0.5, cfg.BLEND_W_MODEL, 0.9),
+    "stop_loss_pct": (0.015, cfg.STOP_LOSS_PCT, 0.04),
+    "flip_cooldown_sec": (30, cfg.FLIP_COOLDOWN_SEC, 120),
+}
+
+
+def _calmar(stats: Dict[str, float]) -> float:
+    dd = abs(stats["max_drawdown"])
+    return stats["total_return"] / dd if dd > 0 else stats["total_return"] * 1e6
+
+
+RANK_METRICS: Dict[str, Callable[[Dict[str, float]], float]] = {
+    "sharpe": lambda s: s["sharpe"],
+    "calmar": _calmar,
+    "return": lambda s: s["total_return"],
+}
+
+
+# --------------- Parameter spaces ---------------
+def grid(space: Dict[str, Sequence[Any]]) -> Iterator[Params]:
+    """Every combination of the listed values, last name varying fastest."""
+    names = list(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_search(space: Dict[str, Any], n: int, seed: Optional[int] = None) -> Iterator[Params]:
+    """``n`` random draws: a ``(lo, hi)`` tuple is sampled uniformly (integers when both ends are),
+    anything else is treated as a list of choices."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        params: Params = {}
+        for name, spec in space.items():
+            if isinstance(spec, tuple) and len(spec) == 2:
+                lo, hi = spec
+                params[name] = rng.randint(lo, hi) if isinstance(lo, int) and isinstance(hi, int) else rng.uniform(lo, hi)
+            else:
+                params[name] = rng.choice(list(spec))
+        yield params
+
+
+def config_for(params: Params, base: BacktestConfig) -> BacktestConfig:
+    """``base`` with the swept values applied; unknown names raise ``ValueError``."""
+    knob_kw: Dict[str, Any] = {}
+    risk_kw: Dict[str, Any] = {}
+    config_kw: Dict[str, Any] = {}
+    for name, value in params.items():
+        if name == "w_model":
+            knob_kw.update(w_model=float(value), w_sent=1.0 - float(value))
+        elif name in KNOB_PARAMS:
+            knob_kw[KNOB_PARAMS[name]] = float(value)
+        elif name in RISK_PARAMS:
+            risk_kw[name] = float(value)
+        elif name in CONFIG_PARAMS:
+            config_kw[name] = float(value)
+        else:
+            raise ValueError(f"unknown sweep parameter {name!r}")
+    knobs = base.knobs or DecisionKnobs.from_state()
+    return replace(base, knobs=replace(knobs, **knob_kw), risk=replace(base.risk, **risk_kw), **config_kw)
+
+
+def inactive_params(data: BacktestData, combos: Iterable[Params], base: BacktestConfig) -> List[str]:
+    """Swept spread/VWAP knobs whose values give identical decisions on every bar of ``data``."""
+    swept: Dict[str, set] = {}
+    for params in combos:
+        for name, value in params.items():
+            swept.setdefault(name, set()).add(float(value))
+    knobs = base.knobs or DecisionKnobs.from_state()
+    out: List[str] = []
+
+    # Bars missing a side are spread-blocked whatever the knobs; the rest all carry the same spread
+    priced = (data.tsll[:, 3] > 0) & (data.tsdd[:, 3] > 0)
+    spread = 2.0 * data.half_spread_bps
+    hints = swept.get("spread_hint", {knobs.spread_hint})
+    wide = {bool(priced.any() and spread > hint) for hint in hints}
+    if "spread_hint" in swept and len(wide) == 1:
+        out.append("spread_hint")
+    if "conviction_dw_wide_spread" in swept and wide == {False}:
+        out.append("conviction_dw_wide_spread")
+
+    vwap = np.asarray(data.vwap_bps, dtype=float)[np.asarray(data.session_rth, dtype=bool) & base.session.rth]
+    vwap = vwap[np.isfinite(vwap)]
+    limits = swept.get("vwap_disagree_bps", {knobs.vwap_disagree_bps})
+    outside = [np.abs(vwap) > limit for limit in limits]  # bars where the VWAP check can disagree
+    if "vwap_disagree_bps" in swept and len({mask.tobytes() for mask in outside}) == 1:
+        out.append("vwap_disagree_bps")
+    if "conviction_dw_vwap" in swept and not any(mask.any() for mask in outside):
+        out.append("conviction_dw_vwap")
+    return out
+
+
+# --------------- Shared arrays ---------------
+_ALIGN = 64
+Layout = Dict[str, Tuple[int, Tuple[int, ...], str]]
+
+
+def _share(arrays: Dict[str, np.ndarray]) -> Tuple[shared_memory.SharedMemory, Layout]:
+    layout: Layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        layout[name] = (offset, arr.shape, arr.dtype.str)
+        offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for name, arr in arrays.items():
+        off, shape, dtype = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=off)[...] = arr
+    return shm, layout
+
+
+def _views(shm: shared_memory.SharedMemory, layout: Layout) -> Dict[str, np.ndarray]:
+    out = {}
+    for name, (off, shape, dtype) in layout.items():
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=off)
+        view.flags.writeable = False
+        out[name] = view
+    return out
+
+
+# Per-worker state, set once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(shm_name: str, layout: Layout, interval: str, half_spread_bps: float, base: BacktestConfig) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm  # keep the mapping alive for the worker's lifetime
+    _worker["data"] = BacktestData.from_arrays(interval, _views(shm, layout), half_spread_bps)
+    _worker["base"] = base
+
+
+def _evaluate(data: BacktestData, base: BacktestConfig, chunk: Sequence[Tuple[int, Params]]) -> List[Tuple[int, Params, Dict[str, float]]]:
+    return [(i, params, run_backtest(data, config_for(params, base), detail=False).stats) for i, params in chunk]
+
+
+def _run_chunk(chunk: Sequence[Tuple[int, Params]]) -> List[Tuple[int, Params, Dict[str, float]]]:
+    return _evaluate(_worker["data"], _worker["base"], chunk)
+
+
+def _chunks(combos: Iterable[Params], size: int) -> Iterator[List[Tuple[int, Params]]]:
+    it = enumerate(combos)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --------------- Sweep ---------------
+def run_sweep(
+    data: BacktestData,
+    combos: Iterable[Params],
+    base: Optional[BacktestConfig] = None,
+    metric: str = "sharpe",
+    max_workers: Optional[int] = cfg.SWEEP_MAX_WORKERS,
+    chunk_size: int = cfg.SWEEP_CHUNK_SIZE,
+    on_result: Optional[Callable[[Params, Dict[str, float]], None]] = None,
+) -> pd.DataFrame:
+    """Backtest every combination and return one row per combination (parameters, stats and
+    ``score``) ranked best first by ``metric`` (see ``RANK_METRICS``)."""
+    if metric not in RANK_METRICS:
+        raise ValueError(f"unknown metric {metric!r}; expected one of {sorted(RANK_METRICS)}")
+    score = RANK_METRICS[metric]
+    base = base or BacktestConfig()
+    if base.knobs is None:
+        # resolve the runtime knobs here; spawned workers don't share this process's state
+        base = replace(base, knobs=DecisionKnobs.from_state())
+    combos = list(combos)
+    for params in combos[:1]:
+        config_for(params, base)  # fail on a bad name before starting any workers
+    for name in inactive_params(data, combos, base):
+        print(f"[Sweep] {name} has no effect on this data; its values only repeat identical runs")
+
+    rows: List[Tuple[int, Params, Dict[str, float]]] = []
+
+    def collect(results: List[Tuple[int, Params, Dict[str, float]]]) -> None:
+        rows.extend(results)
+        if on_result is not None:
+            for _, params, stats in results:
+                on_result(params, stats)
+
+    workers = max_workers or min(os.cpu_count() or 1, -(-len(combos) // max(1, chunk_size)))
+    if workers <= 1:
+        for chunk in _chunks(combos, chunk_size):
+            collect(_evaluate(data, base, chunk))
+    else:
+        shm, layout = _share(data.arrays())
+        try:
+            # spawn, not fork: the caller may be a GUI process with live threads
+            ctx = multiprocessing.get_context("spawn")
+            init = (shm.name, layout, data.interval, data.half_spread_bps, base)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=init) as pool:
+                futures = [pool.submit(_run_chunk, chunk) for chunk in _chunks(combos, chunk_size)]
+                for fut in as_completed(futures):
+                    collect(fut.result())
+        finally:
+            shm.close()
+            shm.unlink()
+
+    rows.sort(key=lambda r: r[0])
+    frame = pd.DataFrame([{**params, **stats, "score": score(stats)} for _, params, stats in rows])
+    if frame.empty:
+        return frame
+    return frame.sort_values("score", ascending=False, kind="stable").reset_index(drop=True)
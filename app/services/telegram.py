@@ -6,7 +6,8 @@ app.services.telegram — minimal Telegram Bot API helper (no extra deps)
 - Reads token/chat_id from USB keys.env via usb_guard.get_keys_dict
 """
 
-from typing import Optional
+import threading
+from typing import Any, Optional
 
 import requests
 
@@ -67,21 +68,44 @@ class TelegramNotifier:
             return None
         return None
 
+class DecisionAlerts:
+    """
+    Decision-service subscriber that messages Telegram when the target side changes.
+    Sends run on a short-lived thread so a slow API call never holds up the publisher.
+    """
+
+    def __init__(self, notifier: TelegramNotifier):
+        self.notifier = notifier
+        self._last_side: Optional[str] = None
+
+    def __call__(self, tick: Any) -> None:
+        result = tick.result
+        if result.side == self._last_side:
+            return
+        first = self._last_side is None
+        self._last_side = result.side
+        if first or not self.notifier.configured():
+            return
+        text = (
+            f"Decision: {result.side} (conviction {result.conviction:.2f})\n"
+            f"p_blend {result.p_blend:.3f} / gate {result.gate:.3f}"
+        )
+        threading.Thread(target=self.notifier.send, args=(text,), name="TelegramAlert", daemon=True).start()
+
 def format_account_snapshot() -> str:
     """Fetch a simple Alpaca account + positions snapshot and format for Telegram.
        Loads keys from USB automatically. Returns a human-readable string.
     """
-    from alpaca.trading.client import TradingClient
-
     from app.config.settings import APP_NAME
     from app.core.app_config import AppConfig
     from app.core.usb_guard import load_keys_from_usb
+    from app.services.alpaca_http import trading_client
 
     cfg = AppConfig.load()
     if not load_keys_from_usb(cfg.usb_keys_path):
         return f"{APP_NAME}: Unable to load Alpaca keys from USB."
 
-    client = TradingClient(api_key=None, secret_key=None, paper=False)  # keys from env
+    client = trading_client(None, None)  # keys from env
     acct = client.get_account()
 
     lines = []
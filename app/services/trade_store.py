@@ -0,0 +1,277 @@
+from __future__ import annotations
+
+"""
+SQLite store for trades, published decisions and order state changes.
+
+The database runs in WAL mode, so GUI readers never block the writer and the
+writer never blocks them. ``log_*`` calls only append the row to a ``Journal``
+(``app.core.journal``), which does no I/O on the caller's thread. The
+journal's flusher encodes, groups and fsyncs the rows to ``trades.journal``.
+It then commits each durable group in one transaction, along with the
+journal position it ends at, so the startup scan re-applies exactly what a
+crash left uncommitted. ``flush()`` is a barrier for shutdown.
+
+Every table keys on ``ts`` (UTC epoch seconds) and is indexed by ``ts`` and
+by ``(symbol, ts)`` (``(side, ts)`` for decisions), so the readers' time-range
+and symbol queries are index range scans. ``migrate_csv`` imports the legacy
+``trades.csv`` once and renames it out of the way.
+"""
+
+import csv
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from app.config.paths import TRADES_DB
+from app.core.journal import Journal, Position
+
+TimeArg = Union[float, datetime, None]
+LEGACY_CSV = "trades.csv"
+
+TRADE_COLUMNS = (
+    "ts", "ts_iso", "action", "symbol", "qty", "px", "entry_limit", "exit_limit", "stop_limit", "cash_before",
+    "cash_after", "prob_up", "sentiment", "p80_threshold", "session", "slippage_bps_used", "spread_bps",
+    "decision_components_json", "note",
+)
+DECISION_COLUMNS = (
+    "ts", "seq", "side", "conviction", "gate", "p_up", "p_sent", "p_blend", "spread_bps_tsll", "spread_bps_tsdd",
+    "vwap_bps_tsla", "session_pre", "session_rth", "session_after", "reasons_json",
+)
+ORDER_COLUMNS = (
+    "ts", "order_id", "symbol", "side", "qty", "limit_price", "extended_hours", "phase", "filled_qty",
+    "filled_avg_price", "final_status",
+)
+_TABLES = {"trades": TRADE_COLUMNS, "decisions": DECISION_COLUMNS, "orders": ORDER_COLUMNS}
+_TEXT = {"ts_iso", "action", "symbol", "session", "decision_components_json", "note", "side", "reasons_json",
+         "order_id", "phase", "final_status"}
+
+_SCHEMA = [
+    *(
+        f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, "
+        + ", ".join(f"{c} {'TEXT' if c in _TEXT else 'REAL'}{' NOT NULL' if c == 'ts' else ''}" for c in cols)
+        + ")"
+        for table, cols in _TABLES.items()
+    ),
+    "CREATE INDEX IF NOT EXISTS trades_ts ON trades (ts)",
+    "CREATE INDEX IF NOT EXISTS trades_symbol_ts ON trades (symbol, ts)",
+    "CREATE INDEX IF NOT EXISTS decisions_ts ON decisions (ts)",
+    "CREATE INDEX IF NOT EXISTS decisions_side_ts ON decisions (side, ts)",
+    "CREATE INDEX IF NOT EXISTS orders_ts ON orders (ts)",
+    "CREATE INDEX IF NOT EXISTS orders_symbol_ts ON orders (symbol, ts)",
+    "CREATE INDEX IF NOT EXISTS orders_order_id ON orders (order_id)",
+    "CREATE TABLE IF NOT EXISTS journal_checkpoint (id INTEGER PRIMARY KEY, generation INTEGER, offset INTEGER)",
+]
+
+def _epoch(value: TimeArg) -> Optional[float]:
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return value.timestamp()
+
+
+def _clean(value: Any) -> Any:
+    """NaN has no SQL spelling (stored as NULL); dicts/lists go into the *_json TEXT columns."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+class TradeStore:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            conn.commit()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._journal = Journal(
+            self.path.with_suffix(".journal"), apply=self._apply, checkpoint=self._checkpoint, name="TradeStore"
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # --------------- Writes ---------------
+    def log_trade(self, **row: Any) -> None:
+        """Enqueue a trade row (columns from ``TRADE_COLUMNS``; ``ts`` defaults to now)."""
+        row.setdefault("ts", time.time())
+        self._put("trades", row)
+
+    def log_decision(self, tick: Any) -> None:
+        """Enqueue a published ``DecisionTick``."""
+        r = tick.result
+        self._put("decisions", {
+            "ts": tick.ts,
+            "seq": tick.seq,
+            "side": r.side,
+            "conviction": r.conviction,
+            "gate": r.gate,
+            "p_up": r.p_up,
+            "p_sent": r.p_sent,
+            "p_blend": r.p_blend,
+            "spread_bps_tsll": r.spread_bps_tsll,
+            "spread_bps_tsdd": r.spread_bps_tsdd,
+            "vwap_bps_tsla": r.vwap_bps_tsla,
+            "session_pre": int(tick.session_pre),
+            "session_rth": int(tick.session_rth),
+            "session_after": int(tick.session_after),
+            "reasons_json": r.reasons,
+        })
+
+    def log_order(self, order: Any) -> None:
+        """Enqueue the current state of an ``OrderManager`` ``WorkingOrder``."""
+        self._put("orders", {
+            "ts": time.time(),
+            "order_id": order.order_id,
+            "symbol": order.symbol,
+            "side": order.side,
+            "qty": order.qty,
+            "limit_price": order.limit_price,
+            "extended_hours": int(order.extended_hours),
+            "phase": order.phase,
+            "filled_qty": order.filled_qty,
+            "filled_avg_price": order.filled_avg_price,
+            "final_status": order.final_status,
+        })
+
+    def _put(self, table: str, row: Dict[str, Any]) -> None:
+        self._journal.start()
+        self._journal.append((table, row))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Barrier: block until every row logged so far is journaled, fsynced and committed."""
+        return self._journal.flush(timeout)
+
+    def close(self) -> None:
+        """Flush and stop the journal flusher (a later write starts it again)."""
+        self._journal.close()
+
+    # --------------- Journal sink (flusher thread) ---------------
+    def _writer(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # only ever used from the flusher thread, but a restarted flusher is a new thread
+            self._conn = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+            self._conn.execute("PRAGMA synchronous=NORMAL")  # the journal fsync is the durability point
+        return self._conn
+
+    def _checkpoint(self) -> Position:
+        row = self._writer().execute("SELECT generation, offset FROM journal_checkpoint WHERE id = 0").fetchone()
+        return (int(row[0]), int(row[1])) if row else (0, 0)
+
+    def _apply(self, records: List[Any], position: Position) -> None:
+        rows: Dict[str, List[Dict[str, Any]]] = {}
+        for table, row in records:
+            rows.setdefault(table, []).append(row)
+        conn = self._writer()
+        with conn:
+            for table, batch in rows.items():
+                _insert(conn, table, batch)
+            conn.execute("INSERT OR REPLACE INTO journal_checkpoint (id, generation, offset) VALUES (0, ?, ?)", position)
+
+    # --------------- Reads ---------------
+    def trades(self, since: TimeArg = None, until: TimeArg = None, symbol: Optional[str] = None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Trades with ``since <= ts < until``, oldest first; ``limit`` keeps the newest."""
+        return self._select("trades", "symbol", symbol, since, until, limit)
+
+    def decisions(self, since: TimeArg = None, until: TimeArg = None, side: Optional[str] = None,
+                  limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._select("decisions", "side", side, since, until, limit)
+
+    def orders(self, since: TimeArg = None, until: TimeArg = None, symbol: Optional[str] = None,
+               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._select("orders", "symbol", symbol, since, until, limit)
+
+    def last_trade(self, symbol: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        rows = self.trades(symbol=symbol, limit=1)
+        return rows[0] if rows else None
+
+    def _select(self, table: str, key_col: str, key: Optional[str], since: TimeArg, until: TimeArg,
+                limit: Optional[int]) -> List[Dict[str, Any]]:
+        where: List[str] = []
+        args: List[Any] = []
+        if key is not None:
+            where.append(f"{key_col} = ?")
+            args.append(key)
+        if since is not None:
+            where.append("ts >= ?")
+            args.append(_epoch(since))
+        if until is not None:
+            where.append("ts < ?")
+            args.append(_epoch(until))
+        sql = f"SELECT * FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        try:
+            with closing(self._connect()) as conn:
+                rows = conn.execute(sql, args).fetchall()
+        except sqlite3.Error as e:
+            print(f"[TradeStore] read failed: {e}")
+            return []
+        return [dict(row) for row in reversed(rows)]
+
+    # --------------- Migration ---------------
+    def migrate_csv(self, csv_path: Path) -> int:
+        """Import a legacy trades.csv once, then rename it to ``*.migrated``; returns rows imported."""
+        csv_path = Path(csv_path)
+        if not csv_path.exists():
+            return 0
+        batch: List[Dict[str, Any]] = []
+        skipped = 0
+        try:
+            with csv_path.open("r", encoding="utf-8", newline="") as handle:
+                for row in csv.DictReader(handle):
+                    try:
+                        ts = datetime.fromisoformat(row.get("ts") or "").timestamp()
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    out: Dict[str, Any] = {c: (row.get(c) or None) for c in TRADE_COLUMNS if c not in ("ts", "ts_iso")}
+                    out.update(ts=ts, ts_iso=row.get("ts"))
+                    batch.append(out)
+        except (OSError, csv.Error) as e:
+            print(f"[TradeStore] migration of {csv_path} failed: {e}")
+            return 0
+        with closing(self._connect()) as conn, conn:
+            _insert(conn, "trades", batch)
+        csv_path.replace(csv_path.with_name(csv_path.name + ".migrated"))
+        if skipped:
+            print(f"[TradeStore] migration skipped {skipped} rows with an unreadable ts")
+        return len(batch)
+
+
+def _insert(conn: sqlite3.Connection, table: str, batch: Sequence[Dict[str, Any]]) -> None:
+    cols = _TABLES[table]
+    sql = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+    conn.executemany(sql, [tuple(_clean(row.get(c)) for c in cols) for row in batch])
+
+
+_stores: Dict[Path, TradeStore] = {}
+_stores_lock = threading.Lock()
+
+
+def shared_trade_store(path: Path = TRADES_DB) -> TradeStore:
+    """One store (and one writer thread) per database file in this process. The first open
+    imports a legacy ``trades.csv`` sitting next to the database."""
+    key = Path(path).resolve()
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = TradeStore(key)
+            store.migrate_csv(key.with_name(LEGACY_CSV))
+        return store
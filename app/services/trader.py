@@ -1,73 +1,36 @@
 from __future__ import annotations
 
-import csv
-import json
 import math
 import threading
 import time
-from dataclasses import dataclass
 from datetime import datetime
+from datetime import time as dtime
 from pathlib import Path
-from typing import Any, Callable, Dict, Optional, cast
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import pytz
-from alpaca.trading.enums import OrderSide, OrderStatus, TimeInForce
+from alpaca.trading.enums import OrderSide, TimeInForce
 
 from app.config import settings
+from app.config.paths import DATA_DIR
+from app.core.clock import SimClock, call_later
+from app.core.latency import span
 from app.core.runtime_state import state
+from app.services import model as model_service
 from app.services import pricing
 from app.services.alpaca_client import AlpacaService
-from app.services.decision_engine import DecisionInputs, DecisionResult, decide
-
-# NOTE: We assume a MarketData service exists with get_quote(symbol) -> dict(bid, ask, last, ts).
-Quote = Dict[str, Any]
-_market_get_quote: Optional[Callable[[str], Quote]]
-
-try:
-    from app.services.market_data import get_quote as _imported_get_quote
-except Exception:
-    _market_get_quote = None
-else:
-    _market_get_quote = cast(Callable[[str], Quote], _imported_get_quote)
-
-
-def get_quote(symbol: str) -> Quote:
-    if _market_get_quote is not None:
-        result = _market_get_quote(symbol)
-        return cast(Quote, result)
-
-    # Placeholder fake quote to keep imports sane if service isn't running.
-    now = datetime.now(tz=pytz.timezone(settings.TZ))
-    return {"symbol": symbol, "bid": 100.0, "ask": 100.5, "last": 100.2, "ts": now}
+from app.services.bar_cache import next_bar_close
+from app.services.broker_state import ORDERS, BrokerState, shared_broker_state
+from app.services.decision_engine import DecisionResult
+from app.services.decision_service import DecisionService, DecisionTick, decision_service, session_flags
+from app.services.flip_executor import DEADLINE, Flip, FlipExecutor
+from app.services.market_data import QuoteSnapshot, get_quote, quote_service
+from app.services.order_manager import DONE, PARTIALLY_FILLED, OrderManager, WorkingOrder
+from app.services.trade_store import shared_trade_store
+from app.services.trader_events import DirectoryWatcher, QuoteMoveFilter, TradeUpdateFeed, WakeSignal
 
 NY = pytz.timezone(settings.TZ)
-
-
-def _load_latest_sentiment_score(sentiment_dir: Path) -> Optional[float]:
-    if not sentiment_dir.exists():
-        return None
-
-    try:
-        files = sorted(sentiment_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-    except Exception:
-        files = []
-
-    if not files:
-        return None
-
-    latest_file = files[0]
-    try:
-        with latest_file.open("r", encoding="utf-8") as f:
-            payload = json.load(f)
-        score_raw = payload.get("daily_score")
-        score = float(score_raw)
-    except Exception:
-        return None
-
-    if math.isnan(score):
-        return None
-
-    return float(max(-1.0, min(1.0, score)))
+_PRE_OPEN, _RTH_OPEN, _RTH_CLOSE, _AFTER_CLOSE = dtime(4, 0), dtime(9, 30), dtime(16, 0), dtime(20, 0)
 
 
 def _conviction_to_cash(settled_cash: float, conviction: float) -> float:
@@ -92,50 +55,148 @@ def _decision_components_payload(result: DecisionResult, cash_to_use: float) ->
     }
 
 
-@dataclass
-class ReplaceState:
-    last_ts: float = 0.0
-    count: int = 0
-    cooling_until: float = 0.0
-
 class TraderEngine:
     """
     Limit-only trading engine with FOK-like behavior pre/post per v3 spec.
     One-position policy: TSLL (long) or TSDD (long).
+
+    The backtester drives ``process_once`` directly with a ``SimClock`` (session times, order
+    timers and flip deadlines in virtual time), a replayed ``quote`` source and an in-memory
+    ``store``, so live trading and replays share every execution policy below.
     """
-    def __init__(self, alpaca: AlpacaService, data_dir: Path = Path("data")):
+    def __init__(
+        self,
+        alpaca: AlpacaService,
+        data_dir: Path = DATA_DIR,
+        decisions: Optional[DecisionService] = None,
+        broker: Optional[BrokerState] = None,
+        *,
+        store: Any = None,
+        clock: Optional[SimClock] = None,
+        quote: Optional[Callable[[str], Dict[str, Any]]] = None,
+    ):
         self.alpaca = alpaca
+        self.decisions = decisions or decision_service
+        # Account/positions/open orders are read through this cache; order calls below invalidate it
+        self.broker = broker or shared_broker_state(alpaca.api_key, alpaca.api_secret, alpaca)
         self.running = False
         self._thread: Optional[threading.Thread] = None
         self.data_dir = data_dir
-        self.trades_csv = data_dir / "trades.csv"
+        self.store = store if store is not None else shared_trade_store(data_dir / "trades.sqlite")
         self.risk = settings.RiskSettings()
-        self.session = settings.SessionToggles()
-        self._replace_state: Dict[str, ReplaceState] = {}  # order_id -> state
+        self.session = self.decisions.session  # one set of toggles gates both the decisions and the orders
+        self.flip_cooldown_sec: Optional[float] = None  # None: the runtime setting
+        self.take_profit_keep = 0.8
+        self._now: Callable[[], float] = clock or time.time
+        self._call_later = clock.call_later if clock is not None else call_later
+        self._quote = quote or get_quote
+        sim: Dict[str, Any] = {} if clock is None else {"clock": clock, "call_later": clock.call_later}
+        self.orders = OrderManager(alpaca, self.risk, pool=clock, quote=quote, **sim)
+        self.orders.subscribe(self._on_order_update)
+        self.flips = FlipExecutor(submit=self._submit_limit, cancel=self.orders.cancel, price=self._limit_price, **sim)
+        self._flip: Optional[Flip] = None
         self._peaks: Dict[str, float] = {}
+        self._stops: Dict[str, str] = {}  # symbol -> id of the resting protective stop-limit
+        # symbol -> (stop id being cancelled, what to run once the cancel is confirmed)
+        self._releasing: Dict[str, Tuple[str, List[Callable[[bool], None]]]] = {}
+        self._stop_lock = threading.Lock()
         self._last_flip_ts: float = 0.0
-        self._ensure_csv()
+        self.wake = WakeSignal()
+        self.last_wake_reasons: Set[str] = set()
+        self._last_pass_ts: float = 0.0
+        self._last_side: Optional[str] = None
+        self._sentiment_watch = DirectoryWatcher(self.decisions.sentiment_dir)
+        self._trade_updates: Optional[TradeUpdateFeed] = None
+        self._unsubscribers: List[Callable[[], None]] = []
 
     # --------------- Public control ---------------
     def start(self):
         self.running = True
+        self._attach_event_sources()
         self._thread = threading.Thread(target=self._run_loop, name="TraderEngine", daemon=True)
         self._thread.start()
 
     def stop(self):
         self.running = False
+        self.wake.notify("stop")
+        for unsubscribe in self._unsubscribers:
+            unsubscribe()
+        self._unsubscribers = []
+        if self._trade_updates is not None:
+            self._trade_updates.stop()
+            self._trade_updates = None
         if self._thread:
             self._thread.join(timeout=2.0)
+        self.store.flush(timeout=2.0)
+
+    # --------------- Event sources ---------------
+    def _attach_event_sources(self):
+        quotes = QuoteMoveFilter(self.wake, (settings.TSLL_SYMBOL, settings.TSDD_SYMBOL, settings.TSLA_SYMBOL))
+        self._unsubscribers.append(quote_service.book.subscribe(quotes))
+        self._unsubscribers.append(quote_service.book.subscribe(self.orders.on_quote))
+        self._unsubscribers.append(self.decisions.subscribe(self._on_decision))
+        self._unsubscribers.append(self.decisions.subscribe(self.store.log_decision))
+        if self.alpaca.api_key and self.alpaca.api_secret:
+            try:
+                feed = TradeUpdateFeed(self.alpaca.api_key, self.alpaca.api_secret)
+                feed.subscribe(self.broker.on_trade_update)
+                feed.subscribe(self.orders.on_trade_update)
+                feed.subscribe(self._on_trade_update)
+                feed.start()
+                self._trade_updates = feed
+            except Exception as e:
+                print(f"[TraderEngine] trade updates unavailable, relying on heartbeat: {e}")
+
+    def _on_decision(self, tick: DecisionTick):
+        if tick.result.side != self._last_side:
+            self._last_side = tick.result.side
+            self.wake.notify("decision")
+
+    def _on_trade_update(self, event: str, update: Any):
+        self.wake.notify(f"order:{event}")
+
+    def _on_order_update(self, order: WorkingOrder):
+        self.store.log_order(order)
+        if order.phase in (DONE, PARTIALLY_FILLED):
+            self.broker.invalidate()
+            self.wake.notify(f"order:{order.phase}")
+
+    def _wait_for_work(self) -> Set[str]:
+        """
+        Block until a quote moves, the decision flips, an order event arrives, new sentiment
+        lands, a bar closes, or the heartbeat is due; returns why.
+        """
+        bar_close = next_bar_close(time.time(), state.interval) + settings.BAR_CACHE_GRACE_SEC
+        heartbeat = self._last_pass_ts + settings.TRADER_HEARTBEAT_SEC
+        deadline = min(bar_close, heartbeat)
+        while self.running:
+            now = time.time()
+            if now >= deadline:
+                return {"bar_close" if deadline == bar_close else "heartbeat"}
+            if self._sentiment_watch.changed():
+                return {"sentiment"}
+            reasons = self.wake.wait(min(deadline - now, settings.TRADER_FILE_POLL_SEC))
+            if reasons:
+                return reasons
+        return set()
 
     # --------------- Core loop ---------------
     def _run_loop(self):
         while self.running:
+            reasons = self._wait_for_work()
+            if not self.running:
+                break
+            self.last_wake_reasons = reasons
+            self._last_pass_ts = time.time()
+            if self._trade_updates is None:
+                self.orders.reconcile()  # no account stream: poll live orders once per pass instead
             try:
-                self.process_once()
+                # One model version per pass, even if training swaps the file mid-decision
+                with model_service.model_cache.pin(), span("process_once"):
+                    self.process_once()
             except Exception as e:
                 # Fail closed — log and continue (GUI logs will pick up the exception traceback).
                 print(f"[TraderEngine] Error: {e}")
-            time.sleep(0.5)
 
     def process_once(self):
         # Check sessions and account status
@@ -143,7 +204,8 @@ class TraderEngine:
         if not (pre_session or rth_session or after_session):
             return
 
-        acct = self.alpaca.get_account()
+        with span("account_fetch"):
+            acct = self.broker.account()
         # Fail closed if account blocked
         if getattr(acct, "trading_blocked", False) or getattr(acct, "account_blocked", False):
             return
@@ -165,64 +227,67 @@ class TraderEngine:
                 return
 
         # What are we holding?
-        pos_tsll = self.alpaca.get_position(settings.TSLL_SYMBOL)
-        pos_tsdd = self.alpaca.get_position(settings.TSDD_SYMBOL)
+        with span("position_fetch"):
+            positions = self.broker.positions()
+        pos_tsll = positions.get(settings.TSLL_SYMBOL)
+        pos_tsdd = positions.get(settings.TSDD_SYMBOL)
         holding = settings.TSLL_SYMBOL if pos_tsll else (settings.TSDD_SYMBOL if pos_tsdd else None)
+        if holding is None:
+            self._peaks.clear()  # the next position's take-profit starts from its own peak
+
+        # Orders still working settle first (their fills wake us); never stack a second order on top.
+        # The same goes for an exit still waiting on its stop's cancel.
+        if self.orders.has_working() or self._releasing or (self._flip is not None and not self._flip.done):
+            return
 
-        # Get quotes for both tickers to compute spreads and pricing previews
-        q_tsll = get_quote(settings.TSLL_SYMBOL)
-        q_tsdd = get_quote(settings.TSDD_SYMBOL)
+        # The shared decision tick (the same one the GUI shows); its quote snapshot is
+        # reused for the spread guard and order pricing
+        with span("decision"):
+            tick = self.decisions.current()
+        quotes = tick.quotes
+        q_tsll = quotes[settings.TSLL_SYMBOL]
+        q_tsdd = quotes[settings.TSDD_SYMBOL]
 
         # Spread guards — if either side we might trade has a too-wide spread, wait
         spread_tsll = pricing.spread_bps(q_tsll["bid"], q_tsll["ask"])
         spread_tsdd = pricing.spread_bps(q_tsdd["bid"], q_tsdd["ask"])
         if max(spread_tsll, spread_tsdd) > self.risk.spread_max_bps:
             if holding:
-                self._manage_position(holding)
+                self._manage_position(holding, quotes=quotes)
             return
 
-        sentiment_dir = Path("data") / "sentiment"
-        sentiment_score = _load_latest_sentiment_score(sentiment_dir)
-        decision_inputs = DecisionInputs(
-            interval=state.interval,
-            last_sentiment_daily=sentiment_score,
-            session_pre=pre_session,
-            session_rth=rth_session,
-            session_after=after_session,
-        )
-        decision_result = decide(decision_inputs)
+        decision_result = tick.result
         cash_to_use = _conviction_to_cash(settled_cash, decision_result.conviction)
         decision_components = _decision_components_payload(decision_result, cash_to_use)
 
         if decision_result.side == "HOLD":
             if holding:
-                self._manage_position(holding, decision_components)
+                self._manage_position(holding, decision_components, quotes=quotes)
             return
 
         target_side = decision_result.side
 
         # Enforce one-position policy and flip if needed
         if holding and holding != target_side:
-            now_ts = time.time()
+            now_ts = self._now()
 
-            cooldown = getattr(state, "flip_cooldown_sec", settings.FLIP_COOLDOWN_SEC)
+            cooldown = self.flip_cooldown_sec
+            if cooldown is None:
+                cooldown = getattr(state, "flip_cooldown_sec", settings.FLIP_COOLDOWN_SEC)
             if now_ts - self._last_flip_ts < cooldown:
-=======
-            if now_ts - self._last_flip_ts < settings.FLIP_COOLDOWN_SEC:
-main
-                self._manage_position(holding, decision_components)
+                self._manage_position(holding, decision_components, quotes=quotes)
                 return
-            # Close current position then open opposite (flip)
-            self._close_position_limit(holding, decision_components)
-            self._open_side(target_side, cash_to_use, decision_components)
+            # Flip: both legs run concurrently; the opening side grows as the close's fills free cash
+            self._start_flip(holding, target_side, settled_cash, decision_result.conviction,
+                             decision_components, quotes=quotes)
             self._last_flip_ts = now_ts
         elif not holding:
             # Open new position
-            self._open_side(target_side, cash_to_use, decision_components)
-            self._last_flip_ts = time.time()
+            self._open_side(target_side, cash_to_use, decision_components, quotes=quotes)
+            self._last_flip_ts = self._now()
         else:
             # Manage exits (P80 TP & trailing stop-limit maintenance)
-            self._manage_position(holding, decision_components)
+            self._manage_position(holding, decision_components, quotes=quotes)
 
     # --------------- Helpers ---------------
     def _session_allowed(self) -> bool:
@@ -230,24 +295,7 @@ main
         return pre or rth or after
 
     def _session_flags(self) -> tuple[bool, bool, bool]:
-        now = datetime.now(NY)
-        tod = now.time()
-        pre = self.session.pre and (
-            tod >= datetime.strptime("04:00", "%H:%M").time()
-        ) and (
-            tod < datetime.strptime("09:30", "%H:%M").time()
-        )
-        rth = self.session.rth and (
-            tod >= datetime.strptime("09:30", "%H:%M").time()
-        ) and (
-            tod < datetime.strptime("16:00", "%H:%M").time()
-        )
-        after = self.session.after and (
-            tod >= datetime.strptime("16:00", "%H:%M").time()
-        ) and (
-            tod < datetime.strptime("20:00", "%H:%M").time()
-        )
-        return pre, rth, after
+        return session_flags(self._ny_now(), self.session)
 
     def _is_margin_account(self, acct) -> bool:
         # Heuristic: daytrading_buying_power exists/ > 0 or pattern_day_trader field present.
@@ -266,185 +314,255 @@ main
         desired_symbol: str,
         cash_to_use: float,
         decision_components: Optional[Dict[str, Any]] = None,
-    ):
+        quotes: Optional[QuoteSnapshot] = None,
+    ) -> Optional[WorkingOrder]:
         sym, side, other = self._choose_symbols(desired_symbol)
-        q = get_quote(sym)
+        q = quotes.get(sym) if quotes is not None else self._quote(sym)
+        if q["bid"] is None or q["ask"] is None:
+            return None
         entry_limit = pricing.compute_entry_limit(
             "BUY", q["bid"], q["ask"], q["last"], self.risk.slippage_bps
         )
         qty = math.floor(cash_to_use / entry_limit)
         if qty < 1:
-            return
+            return None
 
-        # Guard: extended hours require LIMIT + DAY + extended_hours=True
-        extended = self._is_extended_now()
-        tif = TimeInForce.DAY
+        # Protective stop-limit goes in once the entry is done and we hold the position
+        order = self._submit_limit(sym, qty, "BUY", entry_limit, on_update=self._on_entry_update)
+        self._log_trade("ENTRY", sym, qty, entry_limit, note="open_side", decision_components=decision_components)
+        return order
 
-        if extended:
-            # Emulate FOK-like behavior per spec
-            self._emulated_fok(sym, qty, side, entry_limit)
-        else:
-            # Submit standard limit and manage replaces while open
-            order = self.alpaca.submit_limit(
-                symbol=sym, qty=qty, side=side, limit_price=entry_limit, tif=tif, extended_hours=False
-            )
-            self._manage_open_limit(order.id, sym, "BUY")
-
-        # Place protective stop-limit once we have/confirm a position
-        pos = self.alpaca.get_position(sym)
-        if pos:
-            avg = float(getattr(pos, "avg_entry_price", "0"))
-            stop_px, stop_lmt = pricing.compute_stop_limit(
-                avg, settings.STOP_LOSS_PCT_DEFAULT, settings.STOP_LIMIT_OFFSET_BPS_DEFAULT
-            )
-            try:
-                self.alpaca.submit_stop_limit(
-                    symbol=sym, qty=float(getattr(pos, "qty", 0)), side=OrderSide.SELL,  # exit protection
-                    stop_price=stop_px, limit_price=stop_lmt, tif=TimeInForce.DAY, extended_hours=False
-                )
-            except Exception as e:
-                print(f"[TraderEngine] stop-limit submit failed (will continue RTH-only): {e}")
+    def _on_entry_update(self, order: WorkingOrder):
+        if order.done and order.filled_qty > 0:
+            self._place_protective_stop(order.symbol)
 
-        self._log_trade("ENTRY", sym, qty, entry_limit, note="open_side", decision_components=decision_components)
+    def _on_exit_update(self, order: WorkingOrder):
+        if order.done and order.filled_qty < order.qty:
+            self._place_protective_stop(order.symbol)  # the exit left shares behind; protect them again
+
+    def _place_protective_stop(self, sym: str):
+        # A stop already resting holds the shares; it is replaced by one sized to the whole position
+        def _place(released: bool) -> None:
+            if released:
+                self._submit_stop(sym)
+
+        self._release_stop(sym, _place)
 
-    def _close_position_limit(
+    def _submit_stop(self, sym: str):
+        self.broker.invalidate()
+        pos = self.broker.position(sym)
+        if not pos:
+            return
+        avg = float(getattr(pos, "avg_entry_price", "0"))
+        stop_px, stop_lmt = pricing.compute_stop_limit(avg, self.risk.stop_loss_pct, self.risk.stop_limit_offset_bps)
+        try:
+            placed = self.alpaca.submit_stop_limit(
+                symbol=sym, qty=float(getattr(pos, "qty", 0)), side=OrderSide.SELL,  # exit protection
+                stop_price=stop_px, limit_price=stop_lmt, tif=TimeInForce.DAY, extended_hours=False
+            )
+            with self._stop_lock:
+                self._stops[sym] = str(placed.id)
+            self.broker.invalidate(ORDERS)
+        except Exception as e:
+            print(f"[TraderEngine] stop-limit submit failed (will continue RTH-only): {e}")
+
+    def _release_stop(self, sym: str, then: Callable[[bool], None]) -> None:
+        """
+        Cancel the protective stop on ``sym`` so an exit can sell the shares it holds, and run
+        ``then(released)`` once the broker has confirmed it: at once if there is no stop, otherwise
+        from the order event (nothing waits). ``released`` is False if the stop filled instead,
+        or if no confirmation came within ``STOP_CANCEL_TIMEOUT_SEC``; the stop is then kept.
+        """
+        with self._stop_lock:
+            pending = self._releasing.get(sym)
+            if pending is not None:
+                pending[1].append(then)  # already being cancelled: run after the same confirmation
+                return
+            stop_id = self._stops.pop(sym, None)
+            if stop_id is not None:
+                self._releasing[sym] = (stop_id, [then])
+        if stop_id is None:
+            then(True)
+            return
+        self.orders.cancel_watched(stop_id, lambda status: self._on_stop_final(sym, stop_id, status))
+        self._call_later(settings.STOP_CANCEL_TIMEOUT_SEC, self._stop_cancel_timeout, sym, stop_id)
+
+    def _on_stop_final(self, sym: str, stop_id: str, status: str):
+        self.broker.invalidate()
+        with self._stop_lock:
+            pending = self._releasing.get(sym)
+            if pending is not None and pending[0] == stop_id:
+                del self._releasing[sym]
+            else:
+                pending = None  # confirmed only after the timeout gave up on it
+                if self._stops.get(sym) == stop_id:
+                    del self._stops[sym]
+        if pending is None:
+            if status != "filled":
+                self._place_protective_stop(sym)  # its exit was abandoned; the shares need protecting again
+        else:
+            for then in pending[1]:
+                try:
+                    then(status != "filled")
+                except Exception as e:
+                    print(f"[TraderEngine] exit after stop cancel failed: {e}")
+                    self._place_protective_stop(sym)
+        self.wake.notify(f"stop:{status}")
+
+    def _stop_cancel_timeout(self, sym: str, stop_id: str):
+        with self._stop_lock:
+            pending = self._releasing.get(sym)
+        if pending is None or pending[0] != stop_id:
+            return
+        self.orders.refresh_watched(stop_id)  # last look before giving up (settles it if it's final)
+        with self._stop_lock:
+            pending = self._releasing.get(sym)
+            if pending is None or pending[0] != stop_id:
+                return
+            del self._releasing[sym]
+            self._stops.setdefault(sym, stop_id)  # as far as we know it is still resting
+        print(f"[TraderEngine] stop-limit {stop_id} cancel not confirmed; exit skipped")
+        for then in pending[1]:
+            then(False)
+        self.wake.notify("stop:timeout")
+
+    def _start_flip(
         self,
-        symbol: str,
+        holding: str,
+        desired_symbol: str,
+        settled_cash: float,
+        conviction: float,
         decision_components: Optional[Dict[str, Any]] = None,
-    ):
-        pos = self.alpaca.get_position(symbol)
-        if not pos:
+        quotes: Optional[QuoteSnapshot] = None,
+    ) -> None:
+        """Release the stop on ``holding``, then run both flip legs (see ``FlipExecutor``)."""
+        q = quotes.get(holding) if quotes is not None else self._quote(holding)
+        if q["bid"] is None or q["ask"] is None or not self.broker.position(holding):
             return
-        qty = float(getattr(pos, "qty", 0))
-        q = get_quote(symbol)
         limit_px = pricing.compute_entry_limit("SELL", q["bid"], q["ask"], q["last"], self.risk.slippage_bps)
+        sym, _, _ = self._choose_symbols(desired_symbol)
 
-        extended = self._is_extended_now()
-        tif = TimeInForce.DAY
-        side = OrderSide.SELL
+        def _on_done(flip: Flip) -> None:
+            self._on_flip_done(flip, decision_components)
 
-        if extended:
-            self._emulated_fok(symbol, qty, side, limit_px)
-        else:
-            order = self.alpaca.submit_limit(
-                symbol=symbol, qty=qty, side=side, limit_price=limit_px, tif=tif, extended_hours=False
+        def _flip(released: bool) -> None:
+            if not released:
+                return
+            pos = self.broker.position(holding)  # a stop that filled partly before the cancel shrank it
+            qty = float(getattr(pos, "qty", 0)) if pos else 0.0
+            if qty <= 0:
+                return
+            self._flip = self.flips.start(
+                close_symbol=holding,
+                close_qty=qty,
+                close_limit=limit_px,
+                open_symbol=sym,
+                free_cash=settled_cash,
+                budget=lambda cash: _conviction_to_cash(cash, conviction),
+                on_done=_on_done,
             )
-            self._manage_open_limit(order.id, symbol, "SELL")
-
-        self._log_trade("EXIT", symbol, qty, limit_px, note="flip_close", decision_components=decision_components)
+            self._log_trade("EXIT", holding, qty, limit_px, note="flip_close", decision_components=decision_components)
+
+        self._release_stop(holding, _flip)
+
+    def _on_flip_done(self, flip: Flip, decision_components: Optional[Dict[str, Any]] = None):
+        close = flip.close_order
+        if close is not None and close.filled_qty < close.qty:
+            self._place_protective_stop(flip.close_symbol)
+        if flip.opened_qty > 0:
+            note = "flip_open" if flip.status != DEADLINE else "flip_open_deadline"
+            self._log_trade("ENTRY", flip.open_symbol, flip.opened_qty, flip.opened_avg_price or 0.0,
+                            note=note, decision_components=decision_components)
+            self._place_protective_stop(flip.open_symbol)
+        self.broker.invalidate()
+        self.wake.notify(f"flip:{flip.status}")
+
+    def _limit_price(self, symbol: str, side_txt: str) -> Optional[float]:
+        q = self._quote(symbol)
+        if q["bid"] is None or q["ask"] is None:
+            return None
+        return pricing.compute_entry_limit(side_txt, q["bid"], q["ask"], q["last"], self.risk.slippage_bps)
+
+    def _submit_limit(
+        self,
+        symbol: str,
+        qty: float,
+        side_txt: str,
+        limit_price: float,
+        on_update: Optional[Callable[[WorkingOrder], None]] = None,
+    ) -> WorkingOrder:
+        """
+        Hand the order to the order manager and return at once. RTH orders are repriced on quote
+        events; extended hours use FOK-like windows (LIMIT + DAY + extended_hours, partials kept).
+        """
+        extended = self._is_extended_now()
+        order = self.orders.submit_limit(
+            symbol,
+            qty,
+            side_txt,
+            limit_price,
+            extended_hours=extended,
+            fok_windows=self.risk.fok_max_windows if extended else 0,
+            window_sec=self.risk.fok_window_ms / 1000.0,
+            on_update=on_update,
+        )
+        self.broker.invalidate(ORDERS)
+        return order
 
     def _manage_position(
         self,
         symbol: str,
         decision_components: Optional[Dict[str, Any]] = None,
+        quotes: Optional[QuoteSnapshot] = None,
     ):
         # Track P80 take-profit using current vs peak
-        pos = self.alpaca.get_position(symbol)
+        pos = self.broker.position(symbol)
         if not pos:
             return
         avg = float(getattr(pos, "avg_entry_price", "0"))
         qty = float(getattr(pos, "qty", "0"))
         if qty <= 0:
             return
-        q = get_quote(symbol)
+        q = quotes.get(symbol) if quotes is not None else self._quote(symbol)
         last = q["last"]
+        if last is None or q["bid"] is None or q["ask"] is None:
+            return  # no fresh quote; nothing to measure against
         # Keep a simple peak tracker in-memory (could be moved to persistent if needed)
         key = f"peak:{symbol}"
         peak = self._peaks.get(key, last)
         peak = max(peak, last)
         self._peaks[key] = peak
-        p80 = avg + 0.8 * (peak - avg)
+        p80 = pricing.take_profit_level(avg, peak, self.take_profit_keep)
         if last <= p80 and peak > avg:
             # Take profit via limit
             limit_px = pricing.compute_entry_limit("SELL", q["bid"], q["ask"], q["last"], self.risk.slippage_bps)
-            self.alpaca.submit_limit(
-                symbol=symbol, qty=qty, side=OrderSide.SELL, limit_price=limit_px, tif=TimeInForce.DAY, extended_hours=False
-            )
-            # No flip here; flip policy is handled by outer signal change
-            self._log_trade(
-                "TP80_EXIT",
-                symbol,
-                qty,
-                limit_px,
-                note=f"avg={avg},peak={peak},p80={p80}",
-                decision_components=decision_components,
-            )
 
-    def _manage_open_limit(self, order_id: str, symbol: str, side_txt: str):
-        # Replace throttle while order is open during RTH
-        state = self._replace_state.setdefault(order_id, ReplaceState())
-        while True:
-            o = self.alpaca.get_order(order_id)
-            if o.status in (OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.EXPIRED, OrderStatus.REJECTED,
-                            OrderStatus.PARTIALLY_FILLED):
-                break
-            now = time.time()
-            if now < state.cooling_until:
-                time.sleep(0.25)
-                continue
-            q = get_quote(symbol)
-            if side_txt == "BUY":
-                new_px = pricing.compute_entry_limit("BUY", q["bid"], q["ask"], q["last"], self.risk.slippage_bps)
-            else:
-                new_px = pricing.compute_entry_limit("SELL", q["bid"], q["ask"], q["last"], self.risk.slippage_bps)
-            try:
-                # only replace if limit moved > 15 bps
-                old_px = float(getattr(o, "limit_price", "0") or 0)
-                if old_px > 0:
-                    move_bps = abs((new_px - old_px) / old_px) * 10_000.0
-                else:
-                    move_bps = 0.0
-                if (now - state.last_ts) >= self.risk.replace_min_interval_sec and move_bps > self.risk.replace_bps_threshold:
-                    o = self.alpaca.replace_limit(order_id, new_limit_price=round(new_px, 4))
-                    state.last_ts = now
-                    state.count += 1
-                    if state.count >= self.risk.replace_max_count:
-                        # Cool-off 10–20s (use lower bound)
-                        state.cooling_until = now + self.risk.replace_cooldown_sec[0]
-                        state.count = 0
-                time.sleep(0.25)
-            except Exception:
-                break
+            def _exit(released: bool) -> None:
+                if not released:
+                    return
+                pos = self.broker.position(symbol)
+                qty = float(getattr(pos, "qty", "0")) if pos else 0.0
+                if qty <= 0:
+                    return
+                self._submit_limit(symbol, qty, "SELL", limit_px, on_update=self._on_exit_update)
+                # No flip here; flip policy is handled by outer signal change
+                self._log_trade(
+                    "TP80_EXIT",
+                    symbol,
+                    qty,
+                    limit_px,
+                    note=f"avg={avg},peak={peak},p80={p80}",
+                    decision_components=decision_components,
+                )
 
-    def _emulated_fok(self, symbol: str, qty: float, side: OrderSide, limit_price: float):
-        # Submit extended-hours LIMIT+DAY with quick windows; keep partials.
-        remaining = qty
-        windows = 0
-        while remaining > 0 and windows < self.risk.fok_max_windows:
-            windows += 1
-            order = self.alpaca.submit_limit(
-                symbol=symbol, qty=remaining, side=side, limit_price=limit_price, tif=TimeInForce.DAY, extended_hours=True
-            )
-            time.sleep(self.risk.fok_window_ms / 1000.0)
-            o = self.alpaca.get_order(order.id)
-            filled = float(getattr(o, "filled_qty", 0) or 0)
-            if filled >= remaining:
-                break
-            # cancel remainder if any
-            try:
-                self.alpaca.cancel_order(order.id)
-            except Exception:
-                pass
-            remaining = max(0, remaining - filled)
-            if remaining <= 0:
-                break
-            # quick re-check against quotes for next window
-            q = get_quote(symbol)
-            limit_price = pricing.compute_entry_limit("BUY" if side == OrderSide.BUY else "SELL",
-                                                     q["bid"], q["ask"], q["last"], self.risk.slippage_bps)
+            self._release_stop(symbol, _exit)
+
+    def _ny_now(self) -> datetime:
+        return datetime.fromtimestamp(self._now(), NY)
 
     def _is_extended_now(self) -> bool:
-        now = datetime.now(NY).time()
-        return (self.session.pre and datetime.strptime("04:00", "%H:%M").time() <= now < datetime.strptime("09:30", "%H:%M").time()) or \
-               (self.session.after and datetime.strptime("16:00", "%H:%M").time() <= now < datetime.strptime("20:00", "%H:%M").time())
-
-    def _ensure_csv(self):
-        self.data_dir.mkdir(parents=True, exist_ok=True)
-        if not self.trades_csv.exists():
-            with open(self.trades_csv, "w", newline="") as f:
-                w = csv.writer(f)
-                w.writerow(["ts","action","symbol","qty","px","entry_limit","exit_limit","stop_limit","cash_before","cash_after",
-                            "prob_up","sentiment","p80_threshold","session","slippage_bps_used","spread_bps","decision_components_json","note"])
+        pre, _rth, after = self._session_flags()
+        return pre or after
 
     def _log_trade(
         self,
@@ -455,19 +573,26 @@ main
         note: str = "",
         decision_components: Optional[Dict[str, Any]] = None,
     ):
-        ts = datetime.now(NY).isoformat()
-        decision_json = json.dumps(decision_components or {})
-        with open(self.trades_csv, "a", newline="") as f:
-            w = csv.writer(f)
-            w.writerow([ts, action, symbol, qty, px, "", "", "", "", "", "", "", "", self._session_str(),
-                        self.risk.slippage_bps, "", decision_json, note])
+        now = self._ny_now()
+        self.store.log_trade(
+            ts=now.timestamp(),
+            ts_iso=now.isoformat(),
+            action=action,
+            symbol=symbol,
+            qty=qty,
+            px=px,
+            session=self._session_str(),
+            slippage_bps_used=self.risk.slippage_bps,
+            decision_components_json=decision_components or {},  # serialised by the journal flusher
+            note=note,
+        )
 
     def _session_str(self) -> str:
-        now = datetime.now(NY).time()
-        if datetime.strptime("04:00", "%H:%M").time() <= now < datetime.strptime("09:30", "%H:%M").time():
+        now = self._ny_now().time()
+        if _PRE_OPEN <= now < _RTH_OPEN:
             return "PRE"
-        if datetime.strptime("09:30", "%H:%M").time() <= now < datetime.strptime("16:00", "%H:%M").time():
+        if _RTH_OPEN <= now < _RTH_CLOSE:
             return "RTH"
-        if datetime.strptime("16:00", "%H:%M").time() <= now < datetime.strptime("20:00", "%H:%M").time():
+        if _RTH_CLOSE <= now < _AFTER_CLOSE:
             return "AFTER"
         return "OFF"
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+"""
+Wake-up sources for the event-driven trader loop.
+
+``WakeSignal`` collects reasons to run a pass (quote moved, bar closed, order
+event, new sentiment, decision flipped) from any thread. The loop blocks on
+``wait`` and gets every reason that arrived since the previous pass; wake-ups
+closer together than ``min_gap_sec`` are merged so a burst of events costs a
+single pass.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.config import settings as cfg
+from app.services.market_data import Quote
+
+
+class WakeSignal:
+    def __init__(self, min_gap_sec: float = cfg.TRADER_MIN_PASS_GAP_SEC) -> None:
+        self.min_gap_sec = min_gap_sec
+        self._cond = threading.Condition()
+        self._reasons: Set[str] = set()
+        self._last_drain = 0.0
+
+    def notify(self, reason: str) -> None:
+        with self._cond:
+            self._reasons.add(reason)
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """
+        Block until something is notified or ``timeout`` passes (empty set). The first event is
+        handled right away unless the previous pass was under ``min_gap_sec`` ago, in which case
+        the rest of the gap is spent collecting more reasons.
+        """
+        with self._cond:
+            if not self._reasons:
+                self._cond.wait(timeout)
+            if not self._reasons:
+                return set()
+            hold = self._last_drain + self.min_gap_sec - time.monotonic()
+            if hold > 0:
+                self._cond.wait_for(lambda: False, timeout=hold)
+            reasons, self._reasons = self._reasons, set()
+            self._last_drain = time.monotonic()
+            return reasons
+
+
+class QuoteMoveFilter:
+    """Quote listener that only notifies when a symbol's mid moved ``min_bps`` since its last wake."""
+
+    def __init__(self, wake: WakeSignal, symbols: Iterable[str], min_bps: float = cfg.TRADER_QUOTE_WAKE_BPS) -> None:
+        self.wake = wake
+        self.symbols = frozenset(symbols)
+        self.min_bps = min_bps
+        self._mids: Dict[str, float] = {}
+
+    def __call__(self, q: Quote) -> None:
+        if q.symbol not in self.symbols or not q.bid or not q.ask:
+            return
+        mid = (q.bid + q.ask) / 2.0
+        ref = self._mids.get(q.symbol)
+        if ref is not None and abs(mid - ref) / ref * 10_000.0 < self.min_bps:
+            return
+        self._mids[q.symbol] = mid
+        self.wake.notify(f"quote:{q.symbol}")
+
+
+class DirectoryWatcher:
+    """Cheap change check for a directory of files: newest mtime and file count."""
+
+    def __init__(self, path: Path, pattern_suffix: str = ".json") -> None:
+        self.path = path
+        self.suffix = pattern_suffix
+        self._sig = self._signature()
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            with os.scandir(self.path) as it:
+                stamps = [e.stat().st_mtime_ns for e in it if e.name.endswith(self.suffix)]
+        except OSError:
+            return None
+        return (len(stamps), max(stamps, default=0))
+
+    def changed(self) -> bool:
+        sig = self._signature()
+        if sig == self._sig:
+            return False
+        self._sig = sig
+        return True
+
+
+class TradeUpdateFeed:
+    """Alpaca account trade-update websocket (fills, cancels, ...) fanned out to listeners."""
+
+    def __init__(self, api_key: str, api_secret: str) -> None:
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self._listeners: List[Callable[[str, Any], None]] = []
+        self._stream: Any = None
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[str, Any], None]) -> None:
+        """``callback(event, update)``; ``event`` is Alpaca's name, e.g. "fill" or "partial_fill"."""
+        self._listeners.append(callback)
+
+    def start(self) -> None:
+        from alpaca.trading.stream import TradingStream
+
+        stream = TradingStream(self.api_key, self.api_secret, paper=False)
+
+        async def _on_update(update: Any) -> None:
+            event = getattr(update, "event", "")
+            event = str(getattr(event, "value", event))
+            for callback in list(self._listeners):
+                try:
+                    callback(event, update)
+                except Exception:
+                    pass
+
+        stream.subscribe_trade_updates(_on_update)
+        self._stream = stream
+        self._thread = threading.Thread(target=stream.run, name="TradeUpdateFeed", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+            except Exception:
+                pass
+        self._stream = None
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import requests
+from requests.adapters import BaseAdapter
+
+from app.services.alpaca_http import EndpointStats, PooledSession, TokenBucket, endpoint_key
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, sec: float) -> None:
+        self.now += sec
+
+
+class _ScriptedAdapter(BaseAdapter):
+    """Answers each request with the next status code in the script."""
+
+    def __init__(self, statuses) -> None:
+        super().__init__()
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        resp = requests.Response()
+        resp.status_code = self.statuses.pop(0)
+        resp.request = request
+        resp._content = b"{}"
+        return resp
+
+    def close(self):
+        pass
+
+
+def _session(statuses, clock):
+    s = PooledSession(TokenBucket(100.0, 100.0, clock=clock, sleep=clock.sleep), EndpointStats(), sleep=clock.sleep)
+    adapter = _ScriptedAdapter(statuses)
+    s.mount("https://", adapter)
+    return s, adapter
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    """The burst goes through at once; after that requests are spaced at the sustained rate."""
+
+    clock = _Clock()
+    bucket = TokenBucket(rate_per_sec=2.0, burst=3.0, clock=clock, sleep=clock.sleep)
+    waits = [bucket.acquire() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == 0.5 and waits[4] == 0.5 and clock.now == 1.0
+
+
+def test_retries_throttled_and_server_errors_and_counts_per_endpoint():
+    """GETs back off through 429/503; an order POST only retries the 429."""
+
+    clock = _Clock()
+    s, adapter = _session([429, 503, 200], clock)
+    assert s.get("https://api.example/v2/orders/0b6e6c43-6e3b-4ac6-9a47-5f43b7a0d0e1").status_code == 200
+    assert adapter.calls == 3 and clock.now > 0
+    row = s.stats.snapshot()["GET /v2/orders/{id}"]
+    assert (row["requests"], row["retries"], row["throttled"], row["errors"]) == (3, 2, 1, 1)
+
+    adapter.statuses, adapter.calls = [429, 500], 0
+    assert s.post("https://api.example/v2/orders", json={}).status_code == 500
+    assert adapter.calls == 2  # the 500 may have placed the order, so it is not resent
+
+
+def test_endpoint_key_collapses_ids():
+    """Order ids fold into one counter per endpoint."""
+
+    assert endpoint_key("patch", "https://x/v2/orders/123?a=1") == "PATCH /v2/orders/{id}"
+    assert endpoint_key("GET", "https://x/v2/account") == "GET /v2/account"
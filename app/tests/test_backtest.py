@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("alpaca")
+
+from app.config import settings as cfg
+from app.core.clock import SimClock
+from app.services.backtest import BacktestConfig, bars_from_closes, load_data, run_backtest
+from app.services.bar_store import BarStore
+from app.services.broker_state import BrokerState
+from app.services.decision_engine import DecisionKnobs, DecisionResult
+from app.services.decision_service import DecisionTick
+from app.services.market_data import Quote, QuoteSnapshot
+from app.services.mock_broker import FillModel, MockBroker
+from app.services.trader import TraderEngine
+
+KNOBS = DecisionKnobs(w_model=1.0, w_sent=0.0, base_gate=0.55, spread_block=75, spread_hint=50, gate_buffer=0.03)
+
+
+def test_signal_flip_runs_trader_policies_deterministically():
+    """Open, protect, wait out the flip cooldown, flip, and report every decision's action."""
+
+    n = 10
+    data = bars_from_closes([10.0] * n, [20.0] * n, [0.9] * 4 + [0.1] * (n - 4))
+    config = BacktestConfig(knobs=KNOBS, flip_cooldown_sec=270, starting_cash=1_000.0)
+    result = run_backtest(data, config)
+
+    t = result.trades
+    assert list(zip(t.action, t.symbol)) == [
+        ("ENTRY", "TSLL"), ("STOP", "TSLL"), ("EXIT", "TSLL"), ("ENTRY", "TSDD"), ("STOP", "TSDD"),
+    ]
+    assert list(t.status) == ["filled", "canceled", "filled", "filled", "new"]
+    assert list(result.decisions["action"][:7]) == ["ENTRY", "-", "-", "-", "-", "ENTRY+EXIT", "-"]
+    assert result.decisions["side"].iloc[0] == "TSLL" and result.decisions["side"].iloc[-1] == "TSDD"
+    assert len(result.equity) == n
+
+    again = run_backtest(data, config)
+    pd.testing.assert_frame_equal(result.trades, again.trades)
+    pd.testing.assert_series_equal(result.equity, again.equity)
+
+
+def test_protective_stop_fills_inside_its_limit_but_not_through_a_gap():
+    """The 2.5% stop-limit sells on an intrabar slide; a gap below its limit leaves it working."""
+
+    config = BacktestConfig(knobs=KNOBS, starting_cash=1_000.0)
+    slide = run_backtest(bars_from_closes([10.0, 10.0, 10.0, 9.9, 9.745], [20.0] * 5, [0.9] * 5), config)
+    stop = slide.trades[slide.trades.action == "STOP"].iloc[0]
+    assert stop.status == "filled" and stop.avg_price == pytest.approx(9.745 * (1 - 0.0002))
+
+    gap = run_backtest(bars_from_closes([10.0, 10.0, 10.0, 9.6, 9.6], [20.0] * 5, [0.9] * 5), config)
+    assert gap.trades[gap.trades.action == "STOP"].iloc[0].status == "new"
+    assert gap.stats["total_return"] < slide.stats["total_return"] < 0
+
+
+def test_backtest_places_the_same_orders_as_the_live_engine(tmp_path):
+    """Pre-market entries go through the live FOK windows (0.8 s apart), exactly as a hand-driven engine does."""
+
+    data = bars_from_closes([10.0] * 3, [20.0] * 3, [0.9] * 3, start="2025-09-22 08:00")
+    config = BacktestConfig(knobs=KNOBS, starting_cash=1_000.0, fill_model=FillModel(through_bps=100))
+    result = run_backtest(data, config)
+    t = result.trades
+    assert list(t.action) == ["ENTRY"] * 7 and list(t.status) == ["canceled"] * 6 + ["new"]
+    assert [round(d.total_seconds(), 3) for d in t.ts.diff()[1:3]] == [0.8, 0.8]
+
+    clock = SimClock(float(data.ts[0]) / 1e9)
+    broker = MockBroker(cash=1_000.0, fill_model=config.fill_model, clock=clock, sleep=lambda _s: None)
+
+    def snapshot():
+        return QuoteSnapshot({s: {**q.as_dict(), "stale": False} for s, q in broker.quotes.items()}, clock.now)
+
+    class _Store:
+        def log_trade(self, **row):
+            pass
+
+        def log_order(self, order):
+            pass
+
+    class _Decisions:
+        sentiment_dir = tmp_path
+        session = cfg.SessionToggles()
+
+        def current(self):
+            result = DecisionResult("TSLL", 1.0, 0.55, 0.9, 0.5, 0.9, 4.0, 4.0, None, {})
+            return DecisionTick(0, clock.now, result, snapshot(), True, False, False)
+
+    engine = TraderEngine(broker, decisions=_Decisions(), broker=BrokerState(broker, ttl_sec=0.0), store=_Store(),
+                          clock=clock, quote=lambda s: snapshot().get(s))
+    broker.subscribe(engine.orders.on_trade_update)
+    for i in range(3):
+        t0 = float(data.ts[i]) / 1e9
+        for k in range(4):
+            clock.advance(t0 + 20.0 * k)
+            for symbol, px in (("TSLL", 10.0), ("TSDD", 20.0)):
+                q = Quote(symbol, px * (1 - 2e-4), px * (1 + 2e-4), px, None, clock.now)
+                broker.on_quote(q)
+                engine.orders.on_quote(q)
+        clock.advance(t0 + 60.0)
+        engine.process_once()
+        clock.advance(clock.now)
+    live = [(o.symbol, o.side, o.qty, o.limit_price, o.status, o.submitted_ts) for o in broker.orders.values()]
+    replayed = [(r.symbol, r.side.lower(), r.qty, r.limit_price, r.status, r.ts.timestamp()) for r in t.itertuples()]
+    assert [r[:5] for r in replayed] == [o[:5] for o in live]
+    assert [r[5] for r in replayed] == pytest.approx([o[5] for o in live])
+
+
+def test_load_data_aligns_bars_and_sentiment_availability(tmp_path):
+    """Bars are joined on common timestamps; a sentiment blob only counts from its publish time."""
+
+    idx = pd.date_range("2025-09-22 09:30", periods=6, freq="5min", tz="America/New_York")
+    store = BarStore(tmp_path / "bars")
+    for sym, px in (("TSLA", 250.0), ("TSLL", 10.0), ("TSDD", 20.0)):
+        frame = pd.DataFrame({"Open": px, "High": px, "Low": px, "Close": px, "Volume": 100}, index=idx)
+        store.write(sym, "5m", frame if sym != "TSDD" else frame.iloc[1:])
+    sent = tmp_path / "sentiment"
+    sent.mkdir()
+    published = idx[2] + pd.Timedelta(minutes=5)  # the close of the third bar
+    (sent / "2025-09-22.json").write_text(json.dumps({"daily_score": 0.4, "updated_at": published.isoformat()}))
+
+    data = load_data("5m", days=5, store=store, sentiment_dir=sent)
+    assert len(data) == 5 and data.session_rth.all()
+    assert np.isnan(data.sentiment[0]) and data.sentiment[1] == pytest.approx(0.4)
+    assert np.isnan(data.p_up).all()  # too few bars for a complete feature row
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("yfinance")
+
+import threading
+import time
+
+from app.services import history
+from app.services.bar_cache import BarCache, next_bar_close
+from app.services.bar_store import BarStore
+
+
+def _bars(start: str, periods: int, freq: str = "5min", base: float = 100.0) -> "pd.DataFrame":
+    idx = pd.date_range(start, periods=periods, freq=freq, tz="America/New_York")
+    close = base + np.arange(periods, dtype=float)
+    return pd.DataFrame(
+        {
+            "Open": close - 0.5,
+            "High": close + 1.0,
+            "Low": close - 1.0,
+            "Close": close,
+            "Volume": np.arange(1, periods + 1) * 100,
+        },
+        index=idx,
+    )
+
+
+def test_store_roundtrip_partitions_by_day(tmp_path):
+    """Bars spanning two sessions land in two partitions and read back unchanged."""
+
+    store = BarStore(tmp_path)
+    df = pd.concat([_bars("2025-09-24 09:30", 10), _bars("2025-09-25 09:30", 10, base=200.0)])
+    store.write("TSLA", "5m", df)
+
+    assert store.days("TSLA", "5m") == ["2025-09-24", "2025-09-25"]
+    out = store.read("TSLA", "5m", last_days=2)
+    pd.testing.assert_frame_equal(out, df, check_names=False, check_freq=False)
+    assert store.read("TSLA", "5m", last_days=1).index[0].day == 25
+
+
+def test_store_overwrites_forming_bar(tmp_path):
+    """Re-writing the last bar replaces it instead of duplicating it."""
+
+    store = BarStore(tmp_path)
+    df = _bars("2025-09-25 09:30", 5)
+    store.write("TSLA", "5m", df)
+    tail = df.iloc[[-1]].copy()
+    tail["Close"] = 999.0
+    store.write("TSLA", "5m", pd.concat([tail, _bars("2025-09-25 09:55", 2, base=300.0)]))
+
+    out = store.read("TSLA", "5m", last_days=1)
+    assert len(out) == 7
+    assert out["Close"].iloc[4] == 999.0
+    assert store.last_timestamp("TSLA", "5m") == out.index[-1]
+
+
+def test_fetch_bars_downloads_window_once_then_tail(tmp_path, monkeypatch):
+    """Only the first fetch pulls the full period; later fetches ask from the last stored bar."""
+
+    calls = []
+    today = pd.Timestamp.now(tz="America/New_York").strftime("%Y-%m-%d")
+    full = _bars(f"{today} 09:30", 6)
+
+    def _fake_download(symbol, interval, **window):
+        calls.append(window)
+        if "period" in window:
+            return full.iloc[:-1]
+        return full.iloc[-2:]
+
+    monkeypatch.setattr(history, "_store", BarStore(tmp_path))
+    monkeypatch.setattr(history, "_download", _fake_download)
+    monkeypatch.setattr(history, "bar_cache", BarCache())
+
+    first = history.fetch_tsla_bars(interval="5m", lookback_days=5)
+    assert history.fetch_tsla_bars(interval="5m", lookback_days=5) is first
+    history.bar_cache.invalidate()
+    second = history.fetch_tsla_bars(interval="5m", lookback_days=5)
+
+    assert list(calls[0]) == ["period"]
+    assert calls[1]["start"] == first.index[-1]
+    assert len(first) == 5 and len(second) == 6
+    assert list(second.columns) == ["Open", "High", "Low", "Close", "Volume", "Date", "IsRTH"]
+    assert bool(second["IsRTH"].all())
+
+
+def test_corrupt_partition_is_quarantined_and_the_window_downloaded_once(tmp_path, monkeypatch, capsys):
+    """An unreadable day is logged and moved aside, the rest still reads, and coverage is re-earned once."""
+
+    store = BarStore(tmp_path)
+    today = pd.Timestamp.now(tz="America/New_York").strftime("%Y-%m-%d")
+    store.write("TSLA", "5m", pd.concat([_bars("2025-09-24 09:30", 4), _bars(f"{today} 09:30", 4)]))
+    store.mark_covered("TSLA", "5m", 5)
+    day_dir = tmp_path / "TSLA" / "5m"
+    (day_dir / "2025-09-24.npz").write_bytes(b"not a zip")
+
+    assert len(store.read("TSLA", "5m", last_days=5)) == 4
+    assert "[BarStore] corrupt partition" in capsys.readouterr().out
+    assert store.days("TSLA", "5m") == [today] and (day_dir / "2025-09-24.npz.bad").exists()
+    assert store.covered_days("TSLA", "5m") == 0
+
+    calls = []
+
+    def _fake_download(symbol, interval, **window):
+        calls.append(window)
+        return _bars(f"{today} 09:30", 5)
+
+    monkeypatch.setattr(history, "_store", store)
+    monkeypatch.setattr(history, "_download", _fake_download)
+    monkeypatch.setattr(history, "bar_cache", BarCache())
+    history.fetch_tsla_bars(interval="5m", lookback_days=5)
+    history.bar_cache.invalidate()
+    history.fetch_tsla_bars(interval="5m", lookback_days=5)
+    assert [list(w) for w in calls] == [["period"], ["start"]]
+    assert capsys.readouterr().out == ""
+
+
+def test_top_up_prunes_days_past_the_download_window(tmp_path, monkeypatch):
+    """The store keeps as many sessions as the interval's download window, quarantined files included."""
+
+    store = BarStore(tmp_path)
+    for day in pd.bdate_range("2025-06-02", periods=9):
+        store.write("TSLA", "1m", _bars(f"{day:%Y-%m-%d} 09:30", 2, freq="1min"))
+    (tmp_path / "TSLA" / "1m" / "2025-06-02.npz.bad").write_bytes(b"")
+    today = pd.Timestamp.now(tz="America/New_York").strftime("%Y-%m-%d")
+
+    monkeypatch.setattr(history, "_store", store)
+    monkeypatch.setattr(history, "_download", lambda symbol, interval, **window: _bars(f"{today} 09:30", 3, freq="1min"))
+    monkeypatch.setattr(history, "bar_cache", BarCache())
+    history.fetch_tsla_bars(interval="1m", lookback_days=2)
+
+    days = store.days("TSLA", "1m")
+    assert len(days) == 7 and days[-1] == today and days[0] == "2025-06-05"
+    assert not list((tmp_path / "TSLA" / "1m").glob("*.bad"))
+
+
+def test_cache_expires_on_next_bar_close():
+    """Entries are reused within a bar and reloaded once the bar has closed."""
+
+    now = [1_000_000.0]
+    cache = BarCache(grace_sec=1.0, clock=lambda: now[0])
+    loads = []
+
+    def _load():
+        loads.append(now[0])
+        return len(loads)
+
+    key = ("TSLA", "1m", "2d")
+    assert cache.get(key, _load) == 1
+    now[0] = next_bar_close(1_000_000.0, "1m") + 0.5
+    assert cache.get(key, _load) == 1
+    now[0] += 1.0
+    assert cache.get(key, _load) == 2
+
+
+def test_cache_coalesces_concurrent_misses():
+    """Concurrent callers for the same key share a single in-flight load."""
+
+    cache = BarCache()
+    loads = []
+    gate = threading.Event()
+
+    def _load():
+        loads.append(1)
+        gate.wait(1.0)
+        return "bars"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get(("TSLA", "5m", "5d"), _load)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    gate.set()
+    for t in threads:
+        t.join()
+
+    assert results == ["bars"] * 8
+    assert len(loads) == 1
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("alpaca")
+
+from app.services.broker_state import ORDERS, BrokerState
+
+
+class _FakeAlpaca:
+    def __init__(self) -> None:
+        self.calls = {"account": 0, "positions": 0, "orders": 0}
+        self.cash = 1000.0
+        self.held = {"TSLL": 10}
+
+    def get_account(self):
+        self.calls["account"] += 1
+        time.sleep(0.02)
+        return SimpleNamespace(cash=str(self.cash))
+
+    def get_all_positions(self):
+        self.calls["positions"] += 1
+        return [SimpleNamespace(symbol=s, qty=str(q)) for s, q in self.held.items()]
+
+    def get_open_orders(self):
+        self.calls["orders"] += 1
+        return [SimpleNamespace(symbol="TSLL", id="o1"), SimpleNamespace(symbol="TSDD", id="o2")]
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_reads_are_served_from_cache_until_ttl():
+    """Repeated and concurrent reads share one API call per TTL."""
+
+    alp, clock = _FakeAlpaca(), _Clock()
+    broker = BrokerState(alp, ttl_sec=5.0, clock=clock)
+
+    threads = [threading.Thread(target=broker.account) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert broker.position("TSLL").qty == "10" and broker.position("TSDD") is None
+    assert [o.id for o in broker.open_orders("TSDD")] == ["o2"]
+    broker.positions()
+    assert alp.calls == {"account": 1, "positions": 1, "orders": 1}
+
+    clock.now = 5.1
+    broker.account()
+    assert alp.calls["account"] == 2
+
+
+def test_fill_events_invalidate_immediately():
+    """A fill refreshes cash and positions; other order events only refresh open orders."""
+
+    alp = _FakeAlpaca()
+    broker = BrokerState(alp, ttl_sec=60.0, clock=_Clock())
+    broker.account(), broker.positions(), broker.open_orders()
+
+    broker.on_trade_update("new")
+    broker.account(), broker.positions(), broker.open_orders()
+    assert alp.calls == {"account": 1, "positions": 1, "orders": 2}
+
+    alp.cash, alp.held = 0.0, {"TSLL": 10, "TSDD": 3}
+    broker.on_trade_update("fill")
+    assert broker.account().cash == "0.0"
+    assert broker.position("TSDD").qty == "3"
+    broker.invalidate(ORDERS)
+    broker.open_orders()
+    assert alp.calls == {"account": 2, "positions": 2, "orders": 3}
+
+
+def test_invalidation_during_fetch_is_not_cached():
+    """A fetch that started before a fill is returned but not kept."""
+
+    alp = _FakeAlpaca()
+    broker = BrokerState(alp, ttl_sec=60.0, clock=_Clock())
+    t = threading.Thread(target=broker.account)
+    t.start()
+    time.sleep(0.005)
+    broker.on_trade_update("fill")
+    t.join()
+    broker.account()
+    assert alp.calls["account"] == 2
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("sklearn")
+
+from app.services.cv import purged_kfold_folds, run_folds, walk_forward_folds
+
+
+def test_fold_layouts_never_train_on_or_next_to_the_test_block():
+    """Walk-forward trains strictly before the test block; purged k-fold leaves purge/embargo gaps."""
+
+    for spec in walk_forward_folds(1200, 5, purge=2, min_train=100):
+        (start, stop), = spec.train
+        assert start == 0 and stop == spec.test[0] - 2
+
+    specs = purged_kfold_folds(1000, 4, purge=3, embargo=10, min_train=100)
+    assert [s.test for s in specs] == [(0, 250), (250, 500), (500, 750), (750, 1000)]
+    for spec in specs:
+        rows = set().union(*(range(a, b) for a, b in spec.train))
+        lo, hi = spec.test
+        assert not rows & set(range(lo - 3, hi + 10))
+        assert len(rows) == 1000 - len(set(range(max(0, lo - 3), min(1000, hi + 10))))
+
+
+def test_parallel_folds_match_serial():
+    """Folds fitted in worker processes off the memmapped matrix match an in-process run."""
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(1500, 17))
+    y = (X[:, 0] + 0.5 * rng.normal(size=1500) > 0).astype(int)
+    specs = walk_forward_folds(len(X), 3)
+
+    seen = []
+    parallel = run_folds(X, y, specs, max_workers=2, on_fold=seen.append)
+    serial = run_folds(X, y, specs, max_workers=1)
+
+    assert sorted(f.fold for f in seen) == [0, 1, 2]
+    for a, b in zip(parallel, serial):
+        assert (a.fold, a.n_train, a.n_test, a.accuracy, a.roc_auc) == (b.fold, b.n_train, b.n_test, b.accuracy, b.roc_auc)
+    assert parallel[-1].accuracy > 0.7
@@ -1,12 +1,10 @@
 from __future__ import annotations
 
+import importlib.util
 import math
 import sys
 from pathlib import Path
 from types import ModuleType
-from typing import Any, cast
-=======
-main
 
 import pytest
 
@@ -15,7 +13,7 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 for _mod in ("numpy", "pandas", "yfinance", "pytz"):
-    if _mod not in sys.modules:
+    if _mod not in sys.modules and importlib.util.find_spec(_mod) is None:
         stub = ModuleType(_mod)
         if _mod == "numpy":
             setattr(stub, "nan", float("nan"))
@@ -23,13 +21,6 @@ for _mod in ("numpy", "pandas", "yfinance", "pytz"):
             setattr(stub, "timezone", lambda _name: None)
         sys.modules[_mod] = stub
 
-model_stub = ModuleType("app.services.model")
-cast(Any, model_stub).predict_p_up_latest = lambda _interval: 0.5
-=======
-model_stub.predict_p_up_latest = lambda _interval: 0.5
-main
-sys.modules.setdefault("app.services.model", model_stub)
-
 from app.config import settings
 from app.core.runtime_state import state
 from app.services import decision_engine
@@ -59,8 +50,6 @@ def _reset_runtime_state(monkeypatch):
         getattr(settings, "FLIP_COOLDOWN_SEC", 60),
         raising=False,
     )
-=======
-main
 
 
 def _patch_quotes(monkeypatch, bid: float, ask: float, last: float = math.nan):
@@ -80,8 +69,6 @@ def test_decision_balanced_long_tilt(monkeypatch):
     monkeypatch.setattr(state, "w_model", 1.0, raising=False)
     monkeypatch.setattr(state, "w_sent", 0.0, raising=False)
     monkeypatch.setattr(state, "gate_buffer_near_coinflip", 0.01, raising=False)
-=======
-main
     monkeypatch.setattr(decision_engine, "predict_p_up_latest", lambda interval: 0.52)
     monkeypatch.setattr(decision_engine, "vwap_distance_bps", lambda symbol: 0.0)
     _patch_quotes(monkeypatch, bid=10.0, ask=10.01)
@@ -167,3 +154,208 @@ def test_decision_vwap_disagreement_downweights(monkeypatch):
     assert result.side == settings.TSLL_SYMBOL
     assert result.conviction < 1.0
     assert math.isclose(result.reasons.get("conviction_dw_vwap", 0.0), settings.CONVICTION_DW_VWAP)
+
+
+def test_decision_uses_caller_quote_snapshot(monkeypatch):
+    """A snapshot passed in DecisionInputs is used instead of fetching quotes again."""
+
+    from app.services.market_data import QuoteSnapshot
+
+    def _no_quote(symbol: str):
+        raise AssertionError("decide() should not re-quote when given a snapshot")
+
+    monkeypatch.setattr(decision_engine, "get_quote", _no_quote)
+    monkeypatch.setattr(decision_engine, "predict_p_up_latest", lambda interval: 0.8)
+    monkeypatch.setattr(decision_engine, "vwap_distance_bps", lambda symbol: 0.0)
+    quotes = QuoteSnapshot(
+        quotes={
+            settings.TSLL_SYMBOL: {"bid": 10.0, "ask": 10.01, "last": 10.0, "stale": False},
+            settings.TSDD_SYMBOL: {"bid": 5.0, "ask": 5.005, "last": 5.0, "stale": False},
+        },
+        taken_at=0.0,
+    )
+
+    result = decide(
+        DecisionInputs(
+            interval="5m",
+            last_sentiment_daily=None,
+            session_pre=False,
+            session_rth=True,
+            session_after=False,
+            quotes=quotes,
+        )
+    )
+
+    assert result.side == settings.TSLL_SYMBOL
+    assert math.isclose(result.spread_bps_tsll, 9.995, rel_tol=1e-3)
+
+
+def test_decide_batch_matches_decide(monkeypatch):
+    """decide_batch reproduces decide() row for row across spreads, sessions, VWAP and sentiment."""
+
+    np = pytest.importorskip("numpy")
+    if not hasattr(np, "random"):
+        pytest.skip("numpy stubbed")
+    from app.services import pricing
+    from app.services.decision_engine import SIDE_HOLD, SIDE_TSDD, SIDE_TSLL, decide_batch
+    from app.services.market_data import QuoteSnapshot
+
+    rng = np.random.default_rng(42)
+    n = 400
+    p_up = rng.uniform(0.3, 0.7, n)
+    p_up[::17] = np.nan
+    sentiment = rng.uniform(-1.2, 1.2, n)
+    sentiment[::5] = np.nan
+    vwap = rng.normal(0, 60, n)
+    vwap[::7] = np.nan
+    ask_tsll = 10.0 * (1 + rng.choice([0.0002, 0.004, 0.02], n))
+    ask_tsdd = 5.0 * (1 + rng.choice([0.0002, 0.006, 0.03], n))
+    pre, rth, after = (rng.random(n) < 0.3), (rng.random(n) < 0.6), (rng.random(n) < 0.2)
+    monkeypatch.setattr(state, "spread_max_bps", 120, raising=False)
+
+    expected = []
+    for i in range(n):
+        monkeypatch.setattr(decision_engine, "predict_p_up_latest", lambda interval, p=p_up[i]: p)
+        monkeypatch.setattr(decision_engine, "vwap_distance_bps", lambda symbol, v=vwap[i]: None if np.isnan(v) else v)
+        quotes = QuoteSnapshot(
+            quotes={
+                settings.TSLL_SYMBOL: {"bid": 10.0, "ask": ask_tsll[i], "stale": False},
+                settings.TSDD_SYMBOL: {"bid": 5.0, "ask": ask_tsdd[i], "stale": False},
+            },
+            taken_at=0.0,
+        )
+        expected.append(
+            decide(
+                DecisionInputs(
+                    interval="5m",
+                    last_sentiment_daily=None if np.isnan(sentiment[i]) else sentiment[i],
+                    session_pre=bool(pre[i]),
+                    session_rth=bool(rth[i]),
+                    session_after=bool(after[i]),
+                    quotes=quotes,
+                )
+            )
+        )
+
+    spreads_tsll = [pricing.spread_bps(10.0, a) for a in ask_tsll]
+    spreads_tsdd = [pricing.spread_bps(5.0, a) for a in ask_tsdd]
+    batch = decide_batch(p_up, sentiment, spreads_tsll, spreads_tsdd, vwap, pre, rth, after)
+
+    codes = {"HOLD": SIDE_HOLD, settings.TSLL_SYMBOL: SIDE_TSLL, settings.TSDD_SYMBOL: SIDE_TSDD}
+    assert batch.side.tolist() == [codes[r.side] for r in expected]
+    assert batch.gate.tolist() == [r.gate for r in expected]
+    assert batch.conviction.tolist() == [r.conviction for r in expected]
+    assert batch.p_blend.tolist() == [r.p_blend for r in expected]
+    assert {r.side for r in expected} == set(codes)
+
+
+def test_gather_inputs_runs_concurrently_and_marks_stale(monkeypatch):
+    """Model and VWAP are fetched in parallel; an input past its deadline is held at its default and flagged."""
+
+    import time
+
+    from app.services.decision_engine import decide_from_snapshot, gather_inputs
+
+    _patch_quotes(monkeypatch, bid=10.0, ask=10.01)
+
+    def _slow_model(interval):
+        time.sleep(0.3)
+        return 0.8
+
+    def _slow_vwap(symbol):
+        time.sleep(0.3)
+        return -50.0
+
+    monkeypatch.setattr(decision_engine, "predict_p_up_latest", _slow_model)
+    monkeypatch.setattr(decision_engine, "vwap_distance_bps", _slow_vwap)
+    inputs = DecisionInputs(
+        interval="5m", last_sentiment_daily=None, session_pre=False, session_rth=True, session_after=False
+    )
+
+    t0 = time.perf_counter()
+    snap = gather_inputs(inputs, deadline_sec=2.0)
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 0.55
+    assert (snap.p_up_raw, snap.vwap_bps_tsla, snap.stale) == (0.8, -50.0, frozenset())
+
+    snap = gather_inputs(inputs, deadline_sec=2.0, deadlines={"vwap": 0.05})
+    assert snap.stale == frozenset({"vwap"}) and snap.vwap_bps_tsla is None
+    result = decide_from_snapshot(snap)
+    assert result.reasons["vwap_stale"] is True
+    assert result.reasons["stale_inputs"] == "vwap"
+    assert result.vwap_bps_tsla is None
+    assert decide_from_snapshot(snap) == result
+
+
+def test_decide_reports_stage_latency(monkeypatch):
+    """decide() adds per-stage timings to reasons and feeds the shared histograms."""
+
+    import time
+
+    from app.core import latency
+
+    _patch_quotes(monkeypatch, bid=10.0, ask=10.01)
+
+    def _slow_model(interval):
+        with latency.span("predict"):
+            time.sleep(0.02)
+        return 0.6
+
+    monkeypatch.setattr(decision_engine, "predict_p_up_latest", _slow_model)
+    monkeypatch.setattr(decision_engine, "vwap_distance_bps", lambda symbol: 0.0)
+    latency.recorder.reset()
+
+    result = decide(
+        DecisionInputs(interval="5m", last_sentiment_daily=None, session_pre=False, session_rth=True, session_after=False)
+    )
+
+    for stage in ("decide", "inputs", "model", "predict", "vwap", "quotes", "gating"):
+        assert f"lat_{stage}_ms" in result.reasons
+    assert result.reasons["lat_predict_ms"] >= 20.0
+    assert result.reasons["lat_decide_ms"] >= result.reasons["lat_predict_ms"]
+    snap = latency.recorder.snapshot()
+    assert snap["predict"]["n"] == 1.0 and snap["predict"]["p99"] >= 20.0
+
+
+def test_stale_model_holds_and_later_calls_join_the_running_fetch(monkeypatch):
+    """A model past its deadline forces HOLD however strong sentiment is, and is not resubmitted while running."""
+
+    import threading
+    import time
+
+    np = pytest.importorskip("numpy")
+    if not hasattr(np, "asarray"):
+        pytest.skip("numpy stubbed")
+    from app.services.decision_engine import decide_batch, decide_from_snapshot, gather_inputs
+
+    _patch_quotes(monkeypatch, bid=10.0, ask=10.01)
+    calls = []
+    release = threading.Event()
+
+    def _hung_model(interval):
+        calls.append(interval)
+        release.wait(5.0)
+        return 0.9
+
+    monkeypatch.setattr(decision_engine, "predict_p_up_latest", _hung_model)
+    inputs = DecisionInputs(
+        interval="5m", last_sentiment_daily=1.0, session_pre=False, session_rth=False, session_after=False
+    )
+    snaps = [gather_inputs(inputs, deadline_sec=0.05) for _ in range(3)]
+    assert len(calls) == 1
+    assert all(s.stale == frozenset({"model"}) for s in snaps)
+
+    result = decide_from_snapshot(snaps[0])
+    assert result.side == "HOLD" and result.conviction == 0.0
+    assert result.reasons["model_stale_hold"] is True and result.p_sent == 1.0
+    batch = decide_batch([np.nan], [1.0], [10.0], [10.0], [np.nan], [False], [False], [False],
+                         snaps[0].knobs, model_stale=[True])
+    assert batch.side.tolist() == [0] and batch.gate.tolist() == [result.gate]
+
+    monkeypatch.setattr(settings, "DECISION_HOLD_ON_STALE_MODEL", False)
+    assert decide_from_snapshot(snaps[0]).side == settings.TSLL_SYMBOL
+
+    release.set()
+    time.sleep(0.1)
+    assert gather_inputs(inputs, deadline_sec=2.0).p_up_raw == 0.9
+    assert len(calls) == 2  # a finished fetch is not reused
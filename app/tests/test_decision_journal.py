@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pandas")
+
+from app.services.decision_engine import DecisionKnobs, DecisionSnapshot, decide_from_snapshot
+from app.services.decision_journal import HEADER_SIZE, RECORD_SIZE, DecisionJournal
+
+KNOBS = DecisionKnobs(w_model=0.7, w_sent=0.3, base_gate=0.55, spread_block=75, spread_hint=50, gate_buffer=0.03)
+
+
+def _snapshots(n, seed=3):
+    rng = np.random.default_rng(seed)
+    out = []
+    for i in range(n):
+        bid = float(rng.uniform(9.9, 10.0))
+        session = int(rng.integers(0, 3))
+        out.append(DecisionSnapshot(
+            interval="1m" if i % 2 else "5m",
+            p_up_raw=float("nan") if i % 7 == 0 else float(rng.uniform(0, 1)),
+            last_sentiment_daily=None if i % 5 == 0 else float(rng.uniform(-1, 1)),
+            quote_tsll={"bid": None if i % 11 == 0 else bid, "ask": bid + float(rng.uniform(0.0, 0.12)), "last": bid},
+            quote_tsdd={"bid": 20.0, "ask": 20.0 + float(rng.uniform(0.0, 0.2)), "last": None},
+            vwap_bps_tsla=None if i % 3 == 0 else float(rng.normal(0, 60)),
+            session_pre=session == 0,
+            session_rth=session == 1,
+            session_after=session == 2,
+            knobs=KNOBS if i < n // 2 else DecisionKnobs(**{**KNOBS.__dict__, "base_gate": 0.6, "gate_buffer": 0.01}),
+            taken_at=1_000.0 + i,
+            stale=frozenset({"model"}) if i % 13 == 0 else frozenset(),
+            errors={"vwap": "timeout talking to feed"} if i == 17 else {},
+        ))
+    return out
+
+
+def test_records_replay_bit_for_bit(tmp_path):
+    """Every recorded decision comes back identical from the snapshot and the vectorized replay."""
+
+    journal = DecisionJournal(tmp_path / "decisions.djnl")
+    snaps = _snapshots(400)
+    results = [decide_from_snapshot(s) for s in snaps]
+    for snap, result in zip(snaps, results):
+        journal.record(snap, result)
+    journal.close()
+    assert (tmp_path / "decisions.djnl").stat().st_size == HEADER_SIZE + 400 * RECORD_SIZE
+
+    reader = DecisionJournal(tmp_path / "decisions.djnl")
+    assert list(reader.replay()) == results
+    assert reader.snapshot(17).errors == {"vwap": "timeout talking to feed"}
+    assert reader.snapshot(11).quote_tsll["bid"] is None and reader.snapshot(11).quote_tsdd["last"] is None
+
+    recs = reader.records()
+    batch = reader.replay_batch()
+    assert np.array_equal(batch.side, recs["out_side"])
+    assert np.array_equal(batch.conviction, recs["out_conviction"])
+    assert np.array_equal(batch.gate, recs["out_gate"])
+    assert np.array_equal(batch.p_blend, recs["out_p_blend"])
+    assert list(batch.side_labels()) == [r.side for r in results]
+
+    window, first = reader.between(1_100.0, 1_110.5)
+    assert first == 100 and list(window["ts"]) == [1_100.0 + i for i in range(11)]
+    assert list(reader.replay(window, first)) == results[100:111]
+
+
+def test_torn_tail_is_ignored_then_cut_before_appending(tmp_path):
+    """A partial record from a crash is invisible to readers and dropped by the next writer."""
+
+    path = tmp_path / "decisions.djnl"
+    snaps = _snapshots(3)
+    journal = DecisionJournal(path)
+    for snap in snaps[:2]:
+        journal.record(snap, decide_from_snapshot(snap))
+    journal.close()
+    with open(path, "ab") as f:
+        f.write(b"\x01" * (RECORD_SIZE // 2))
+
+    assert len(DecisionJournal(path).records()) == 2
+    again = DecisionJournal(path)
+    assert again.record(snaps[2], decide_from_snapshot(snaps[2]))
+    assert list(again.records()["ts"]) == [1_000.0, 1_001.0, 1_002.0]
+
+
+def test_writes_happen_off_the_caller_thread_and_old_files_roll_off(tmp_path, monkeypatch):
+    """record() only queues; the writer rolls full files to .1, .2, .3 with their sidecars and drops the oldest."""
+
+    import threading
+
+    from app.services import decision_journal
+
+    path = tmp_path / "decisions.djnl"
+    writers = set()
+    real_open = decision_journal.DecisionJournal._open
+
+    def _open(self):
+        writers.add(threading.current_thread().name)
+        return real_open(self)
+
+    monkeypatch.setattr(decision_journal.DecisionJournal, "_open", _open)
+    journal = DecisionJournal(path, rotate_bytes=HEADER_SIZE + 10 * RECORD_SIZE, keep=3)
+    snaps = _snapshots(40)
+    for i, snap in enumerate(snaps):
+        assert journal.record(snap, decide_from_snapshot(snap))
+        if i % 5 == 4:
+            assert journal.flush(timeout=5.0)
+    journal.close(timeout=5.0)
+
+    assert writers == {"DecisionJournal"}
+    rolled = [path.with_name(f"decisions.djnl.{n}") for n in (1, 2, 3, 4)]
+    assert [p.exists() for p in rolled] == [True, True, True, False]
+    kept = np.concatenate([DecisionJournal(p).records()["ts"] for p in (*rolled[2::-1], path) if p.exists()])
+    assert list(kept) == [1_010.0 + i for i in range(30)]
+    older = DecisionJournal(rolled[2])
+    assert older.snapshot(7).taken_at == 1_017.0
+    assert older.snapshot(7).errors == {"vwap": "timeout talking to feed"}  # the sidecar rolled with its file
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from app.services import decision_service as ds
+from app.services.decision_engine import DecisionResult
+from app.services.market_data import QuoteSnapshot
+
+
+def _result(side: str = "HOLD") -> DecisionResult:
+    return DecisionResult(
+        side=side,
+        conviction=0.0,
+        gate=0.55,
+        p_up=0.5,
+        p_sent=0.5,
+        p_blend=0.5,
+        spread_bps_tsll=10.0,
+        spread_bps_tsdd=10.0,
+        vwap_bps_tsla=None,
+        reasons={},
+    )
+
+
+@pytest.fixture()
+def counted(monkeypatch, tmp_path):
+    calls = []
+
+    def _decide(inputs):
+        calls.append(inputs)
+        time.sleep(0.05)
+        return _result()
+
+    monkeypatch.setattr(ds, "decide", _decide)
+    monkeypatch.setattr(ds, "get_quotes", lambda symbols: QuoteSnapshot(quotes={}, taken_at=time.time()))
+    return ds.DecisionService(tick_sec=10.0, sentiment_dir=tmp_path), calls
+
+
+def test_one_decision_fans_out_to_every_subscriber(counted):
+    """A tick is computed once and every subscriber receives the same object."""
+
+    service, calls = counted
+    seen_a, seen_b = [], []
+    service.subscribe(seen_a.append)
+    unsubscribe = service.subscribe(seen_b.append)
+    service.subscribe(lambda tick: 1 / 0)  # a broken consumer doesn't stop the others
+
+    tick = service.tick()
+    unsubscribe()
+    service.tick()
+
+    assert len(calls) == 2
+    assert seen_a[0] is tick and seen_b == [tick]
+    assert [t.seq for t in seen_a] == [1, 2]
+
+
+def test_current_reuses_fresh_tick_and_coalesces_callers(counted):
+    """Concurrent readers share one computation; a fresh tick is reused until it ages out."""
+
+    service, calls = counted
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(service.current())) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert len({t.seq for t in out}) == 1
+    assert service.current().seq == 1
+    assert service.current(max_age_sec=0.0).seq == 2
+
+
+def test_trader_and_service_gate_on_the_same_session_toggles(counted, monkeypatch, tmp_path):
+    """Switching RTH off in the runtime state closes it for the decision tick and the trader alike."""
+
+    pytest.importorskip("alpaca")
+    from datetime import datetime
+
+    from app.core.clock import SimClock
+    from app.core.runtime_state import state
+    from app.services.broker_state import BrokerState
+    from app.services.mock_broker import MockBroker
+    from app.services.trader import TraderEngine
+
+    _, calls = counted
+    clock = SimClock(ds.NY.localize(datetime(2025, 9, 22, 11, 0)).timestamp())
+    broker = MockBroker(cash=1_000.0, clock=clock)
+    service = ds.DecisionService(tick_sec=10.0, sentiment_dir=tmp_path, session=ds.RuntimeSessionToggles())
+    engine = TraderEngine(broker, data_dir=tmp_path, decisions=service,
+                          broker=BrokerState(broker, ttl_sec=0.0), clock=clock)
+    assert engine.session is service.session
+
+    monkeypatch.setattr(state, "session_rth", True)
+    assert engine._session_flags()[1]
+    monkeypatch.setattr(state, "session_rth", False)
+    assert engine._session_flags() == (False, False, False)
+    service.tick()
+    assert calls[-1].session_rth is False
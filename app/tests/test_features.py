@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from app.services import features
+from app.tools.bench_features import legacy_overnight_gap, legacy_session_vwap, synthetic_bars
+
+
+def test_vectorized_session_helpers_match_loops_exactly():
+    """Vectorized VWAP and gap match the per-day loops bit for bit, including edge cases."""
+
+    df = synthetic_bars(12)
+    days = sorted(set(df["Date"]))
+    df.loc[df["Date"] == days[3], "Volume"] = 0                      # no volume all session
+    df.loc[(df["Date"] == days[5]) & (df.index.hour < 11), "Volume"] = 0  # zero-volume open
+    df = df[~((df["Date"] == days[7]) & df["IsRTH"])]                # half day with no RTH bars
+    df.loc[(df["Date"] == days[9]) & df["IsRTH"], "Close"] = 0.0      # prev close of zero
+
+    pd.testing.assert_series_equal(features._session_vwap(df), legacy_session_vwap(df), check_exact=True)
+    pd.testing.assert_series_equal(features._overnight_gap(df), legacy_overnight_gap(df), check_exact=True)
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import itertools
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("alpaca")
+
+from app.services.flip_executor import DEADLINE, DONE, FlipExecutor
+from app.services.order_manager import OrderManager
+
+
+class _FakeAlpaca:
+    def __init__(self) -> None:
+        self._ids = itertools.count(1)
+        self.orders = {}
+        self.submits = []
+        self.cancels = []
+
+    def submit_limit(self, *, symbol, qty, side, limit_price, tif, extended_hours):
+        oid = f"o{next(self._ids)}"
+        o = SimpleNamespace(id=oid, symbol=symbol, status="new", qty=qty, filled_qty=0, filled_avg_price=None)
+        self.orders[oid] = o
+        self.submits.append((symbol, qty, limit_price))
+        return o
+
+    def cancel_order(self, order_id):
+        self.cancels.append(order_id)  # confirmed later, by a "canceled" trade update
+
+    def get_order(self, order_id):
+        return self.orders[order_id]
+
+
+def _fill(om, broker_order, qty, px, final=False):
+    broker_order.filled_qty, broker_order.filled_avg_price = qty, px
+    if final:
+        broker_order.status = "filled"
+    event = "fill" if final else "partial_fill"
+    om.on_trade_update(event, SimpleNamespace(event=event, order=broker_order))
+
+
+def _wait(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _executor(om, deadline_sec=30.0):
+    def submit(symbol, qty, side, limit_price, on_update):
+        return om.submit_limit(symbol, qty, side, limit_price, on_update=on_update)
+
+    return FlipExecutor(submit=submit, cancel=om.cancel, price=lambda sym, side: 10.0, deadline_sec=deadline_sec)
+
+
+def test_opening_leg_grows_with_close_fills_and_runs_concurrently():
+    """Free cash opens at once; each close fill buys what it released while the close still works."""
+
+    alp = _FakeAlpaca()
+    om = OrderManager(alp)
+    finished = []
+    flip = _executor(om).start(
+        close_symbol="TSDD", close_qty=10, close_limit=20.0, open_symbol="TSLL",
+        free_cash=50.0, budget=lambda cash: cash, on_done=finished.append,
+    )
+    assert [s[:2] for s in alp.submits] == [("TSDD", 10), ("TSLL", 5)]
+
+    close = alp.orders[flip.close_order.order_id]
+    _fill(om, close, 4, 20.0)  # +80 released -> 13 shares affordable
+    assert [s[:2] for s in alp.submits][-1] == ("TSLL", 8)
+    assert not flip.close_order.done and flip.open_qty_claimed == 13
+
+    _fill(om, close, 10, 20.0, final=True)  # +120 more -> 25 shares
+    assert [s[:2] for s in alp.submits][-1] == ("TSLL", 12)
+    assert not flip.done  # opening legs still working
+
+    for leg in flip.open_orders:
+        b = alp.orders[leg.order_id]
+        _fill(om, b, b.qty, 10.0, final=True)
+    assert flip.status == DONE and finished == [flip]
+    assert flip.opened_qty == 25 and flip.opened_avg_price == pytest.approx(10.0)
+
+
+def test_deadline_cancels_unfinished_legs_and_finishes_once_they_settle():
+    """Past the deadline every working leg is cancelled; on_done waits for the cancels, so late fills count."""
+
+    alp = _FakeAlpaca()
+    om = OrderManager(alp)
+    finished = []
+    flip = _executor(om, deadline_sec=0.05).start(
+        close_symbol="TSDD", close_qty=10, close_limit=20.0, open_symbol="TSLL",
+        free_cash=0.0, budget=lambda cash: cash, on_done=finished.append,
+    )
+    close = alp.orders[flip.close_order.order_id]
+    _fill(om, close, 5, 20.0)  # frees 100 -> one 10-share buy
+    buy = alp.orders[flip.open_orders[0].order_id]
+
+    assert _wait(lambda: len(alp.cancels) == 2)
+    assert set(alp.cancels) == {close.id, buy.id} and flip.cancelling
+    time.sleep(0.05)
+    assert not finished and not flip.done  # cancels sent, not yet confirmed
+
+    _fill(om, close, 7, 20.0)  # lands between the deadline and the cancel confirmation
+    _fill(om, buy, 4, 10.0)
+    assert len(alp.submits) == 2  # no new legs after the deadline
+    for b in (close, buy):
+        b.status = "canceled"
+        om.on_trade_update("canceled", SimpleNamespace(event="canceled", order=b))
+
+    assert finished == [flip] and flip.status == DEADLINE
+    assert flip.released_cash == pytest.approx(140.0) and flip.opened_qty == 4
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import sqlite3
+
+from app.core import journal as journal_mod
+from app.core.journal import HEADER_SIZE, Journal, _encode, scan
+from app.services.trade_store import TradeStore
+
+
+class _Sink:
+    def __init__(self) -> None:
+        self.records = []
+        self.calls = 0
+        self.position = (0, 0)
+        self.fail = False
+
+    def apply(self, records, position):
+        if self.fail:
+            raise RuntimeError("disk full")
+        self.calls += 1
+        self.records.extend(records)
+        self.position = position
+
+    def checkpoint(self):
+        return self.position
+
+
+def test_appends_are_grouped_fsynced_and_rotated(tmp_path):
+    """A burst is applied in a few groups, in order; a full file rolls to a new generation."""
+
+    sink = _Sink()
+    journal = Journal(tmp_path / "j.journal", sink.apply, sink.checkpoint, fsync_sec=0.05, rotate_bytes=4096)
+    journal.start()
+    assert journal.wait_ready(5.0)
+    for i in range(2_000):
+        assert journal.append({"i": i, "note": "x" * 20})
+    assert journal.flush(timeout=5.0)
+    assert [r["i"] for r in sink.records] == list(range(2_000))
+    assert sink.calls < 100
+    assert sink.position[0] > 1  # rotated at least once
+    journal.close(timeout=5.0)
+
+    full = Journal(tmp_path / "k.journal", sink.apply, sink.checkpoint, queue_max=3)
+    assert [full.append(i) for i in range(4)] == [True, True, True, False] and full.dropped == 1
+
+
+def test_recovery_replays_uncommitted_frames_and_cuts_a_torn_tail(tmp_path):
+    """Frames past the checkpoint are re-applied once; a half-written frame is truncated away."""
+
+    path = tmp_path / "j.journal"
+    sink = _Sink()
+    journal = Journal(path, sink.apply, sink.checkpoint, fsync_sec=0.0)
+    journal.start()
+    journal.append({"i": 0})
+    journal.flush(timeout=5.0)
+    sink.fail = True  # the sink stops committing: the next records are durable only in the journal
+    journal.append({"i": 1})
+    journal.append({"i": 2})
+    journal.close(timeout=5.0)
+    with open(path, "ab") as f:
+        f.write(_encode({"i": 3})[:-2])  # crash mid-write
+
+    sink.fail = False
+    again = Journal(path, sink.apply, sink.checkpoint)
+    again.start()
+    assert again.wait_ready(5.0) and again.recovered == 2
+    again.append({"i": 4})
+    again.flush(timeout=5.0)
+    again.close(timeout=5.0)
+    assert [r["i"] for r in sink.records] == [0, 1, 2, 4]
+    frames, end = scan(path, HEADER_SIZE)
+    assert [r["i"] for r, _ in frames] == [0, 1, 2, 4] and end == path.stat().st_size
+
+
+def test_a_failed_apply_is_retried_and_never_checkpointed_or_rotated_past(tmp_path):
+    """A "database is locked" group is applied on a later attempt, before anything newer."""
+
+    sink = _Sink()
+    attempts = []
+
+    def flaky(records, position):
+        attempts.append([r["i"] for r in records])
+        if len(attempts) == 2:  # the first group after the startup checkpoint
+            raise sqlite3.OperationalError("database is locked")
+        sink.apply(records, position)
+
+    path = tmp_path / "j.journal"
+    journal = Journal(path, flaky, sink.checkpoint, fsync_sec=0.0, rotate_bytes=HEADER_SIZE + 1)
+    journal.start()
+    assert journal.wait_ready(5.0)
+    generation = sink.position[0]
+    journal.append({"i": 0})
+    assert journal.flush(timeout=5.0)
+    journal.append({"i": 1})
+    assert journal.flush(timeout=5.0)
+    journal.close(timeout=5.0)
+
+    assert attempts[1] == attempts[2] == [0]
+    assert [r["i"] for r in sink.records] == [0, 1]
+    assert sink.position[0] > generation  # rotated only once the failed group was in
+
+
+def test_a_failed_fsync_releases_flush_and_the_next_start_writes_the_records(tmp_path, monkeypatch):
+    """An I/O error keeps the group queued and fails the barrier; a restart commits it exactly once."""
+
+    real_fsync = journal_mod.os.fsync
+    broken = []
+
+    def fsync(fd):
+        if broken:
+            raise OSError(5, "Input/output error")
+        real_fsync(fd)
+
+    monkeypatch.setattr(journal_mod.os, "fsync", fsync)
+    path = tmp_path / "j.journal"
+    sink = _Sink()
+    journal = Journal(path, sink.apply, sink.checkpoint, fsync_sec=0.0)
+    journal.start()
+    assert journal.wait_ready(5.0)
+    journal.append({"i": 0})
+    assert journal.flush(timeout=5.0)
+    broken.append(True)
+    journal.append({"i": 1})
+    journal.append({"i": 2})
+    assert journal.flush(timeout=5.0) is False
+    assert journal.flush(timeout=5.0) is False  # the flusher is gone and the records are still queued
+
+    broken.clear()
+    journal.start()
+    assert journal.wait_ready(5.0)
+    journal.append({"i": 3})
+    assert journal.flush(timeout=5.0)
+    journal.close(timeout=5.0)
+    assert [r["i"] for r in sink.records] == [0, 1, 2, 3]
+    frames, _ = scan(path, HEADER_SIZE)
+    assert [r["i"] for r, _ in frames] == [0, 1, 2, 3]
+
+
+def test_trade_store_recovers_journaled_rows_exactly_once(tmp_path):
+    """Rows fsynced to the journal but not committed to SQLite appear after restart, without duplicates."""
+
+    db = tmp_path / "trades.sqlite"
+    store = TradeStore(db)
+    store.log_trade(ts=1.0, action="ENTRY", symbol="TSLL", qty=5, decision_components_json={"side": "TSLL"})
+    store.flush(timeout=5.0)
+    store.close()
+    with open(db.with_suffix(".journal"), "ab") as f:
+        f.write(_encode(["trades", {"ts": 2.0, "action": "EXIT", "symbol": "TSLL", "qty": 5}]))
+
+    restarted = TradeStore(db)
+    restarted.log_trade(ts=3.0, action="ENTRY", symbol="TSDD", qty=2)
+    restarted.flush(timeout=5.0)
+    rows = restarted.trades()
+    assert [(r["ts"], r["action"]) for r in rows] == [(1.0, "ENTRY"), (2.0, "EXIT"), (3.0, "ENTRY")]
+    assert rows[0]["decision_components_json"] == '{"side": "TSLL"}'
+    restarted.close()
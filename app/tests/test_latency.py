@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import contextvars
+import threading
+
+from app.core import latency
+
+
+def test_histogram_percentiles_nearest_rank():
+    """p50/p95/p99 use nearest rank over the rolling window."""
+
+    hist = latency.LatencyHistogram(window=100)
+    for ms in range(1, 201):  # only the last 100 samples (101..200) are kept
+        hist.add(float(ms))
+
+    assert hist.percentiles() == {"p50": 150.0, "p95": 195.0, "p99": 199.0}
+    assert hist.count == 200 and hist.last_ms == 200.0
+
+
+def test_spans_in_copied_context_join_the_callers_trace():
+    """A span on another thread lands in the active trace when run in a copied context."""
+
+    with latency.trace() as tr:
+        with latency.span("outer"):
+            pass
+        t = threading.Thread(target=contextvars.copy_context().run, args=(_timed_noop,))
+        t.start()
+        t.join()
+    threading.Thread(target=_timed_noop).start()  # no trace outside the block
+
+    assert set(tr.stages) == {"outer", "noop"}
+    assert latency.current_trace() is None
+
+
+def _timed_noop() -> None:
+    with latency.span("noop"):
+        pass
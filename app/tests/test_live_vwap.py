@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("yfinance")
+
+from app.services.live_vwap import PREMARKET_ANCHOR, RTH_ANCHOR, VwapAccumulator, VwapBook, custom_anchor
+
+
+def _bars(start: str, periods: int, seed: int = 0) -> "pd.DataFrame":
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(start, periods=periods, freq="1min", tz="America/New_York")
+    close = 250.0 + rng.normal(0, 0.5, periods).cumsum()
+    return pd.DataFrame(
+        {
+            "Open": close,
+            "High": close + rng.uniform(0, 0.3, periods),
+            "Low": close - rng.uniform(0, 0.3, periods),
+            "Close": close,
+            "Volume": rng.integers(100, 5000, periods).astype(float),
+        },
+        index=idx,
+    )
+
+
+def _batch_vwap(df: "pd.DataFrame") -> float:
+    typical = (df["High"] + df["Low"] + df["Close"]) / 3.0
+    return float((typical * df["Volume"]).sum() / df["Volume"].sum())
+
+
+def test_incremental_sync_matches_batch_vwap():
+    """Syncing a growing frame (with the forming bar revised) matches a full recompute."""
+
+    df = pd.concat([_bars("2025-09-24 09:30", 390, seed=1), _bars("2025-09-25 08:00", 200, seed=2)])
+    book = VwapBook()
+    for end in (50, 120, 121, 400, len(df)):
+        window = df.iloc[:end].copy()
+        window.iloc[-1, window.columns.get_loc("Volume")] *= 0.5  # still forming
+        book.sync("TSLA", window)
+    acc = book.sync("TSLA", df)
+
+    rth = df.loc["2025-09-25"].between_time("09:30", "15:59")
+    assert acc.session == rth.index[0].date()
+    assert acc.vwap == pytest.approx(_batch_vwap(rth), rel=1e-12)
+    expected = (rth["Close"].iloc[-1] / _batch_vwap(rth) - 1.0) * 10_000.0
+    assert acc.distance_bps() == pytest.approx(expected, rel=1e-9)
+
+
+def test_anchors_pick_their_own_window():
+    """Pre-market and custom anchors include the bars the RTH anchor skips."""
+
+    df = _bars("2025-09-25 08:00", 180, seed=3)
+    book = VwapBook()
+    at = df.index[30].to_pydatetime()
+
+    assert book.sync("TSLA", df, PREMARKET_ANCHOR).vwap == pytest.approx(_batch_vwap(df), rel=1e-12)
+    assert book.sync("TSLA", df, custom_anchor(at)).vwap == pytest.approx(_batch_vwap(df.iloc[30:]), rel=1e-12)
+    assert book.sync("TSLA", df, RTH_ANCHOR).vwap == pytest.approx(_batch_vwap(df.iloc[90:]), rel=1e-12)
+
+
+def test_trades_accumulate_and_reset_on_new_session():
+    """Trade prints feed the sums directly and a new session starts from zero."""
+
+    acc = VwapAccumulator(RTH_ANCHOR)
+    day1 = pd.Timestamp("2025-09-24 10:00", tz="America/New_York")
+    acc.ingest_trade(day1, 100.0, 10)
+    acc.ingest_trade(day1, 110.0, 30)
+    assert acc.vwap == pytest.approx(107.5)
+    assert acc.distance_bps(107.5) == 0.0
+
+    acc.ingest_trade(day1 + pd.Timedelta(days=1), 200.0, 5)
+    assert acc.vwap == 200.0
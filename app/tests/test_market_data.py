@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app.services import market_data
+from app.services.market_data import LocalQuoteFeed, QuoteService
+
+
+@pytest.fixture()
+def feed(monkeypatch):
+    service = QuoteService()
+    monkeypatch.setattr(market_data, "quote_service", service)
+    local = LocalQuoteFeed()
+    service.start(local, ("TSLL", "TSDD"))
+    yield local
+    service.stop()
+
+
+def test_get_quote_reads_latest_published(feed):
+    """Quotes pushed by the feed are visible to get_quote with their receive time."""
+
+    feed.publish("TSLL", bid=10.0, ask=10.02, last=10.01)
+    feed.publish("TSLL", bid=10.1, ask=10.12)
+
+    q = market_data.get_quote("TSLL")
+    assert (q["bid"], q["ask"], q["last"]) == (10.1, 10.12, 10.01)
+    assert q["stale"] is False
+    assert abs(q["quote_recv_ts"] - time.time()) < 1.0
+
+
+def test_get_quote_fails_closed_when_missing_or_stale(feed):
+    """Unknown and stale symbols return no prices so spreads block trading."""
+
+    assert market_data.get_quote("TSDD")["bid"] is None
+
+    feed.publish("TSDD", bid=5.0, ask=5.01, recv_ts=time.time() - 60.0)
+    stale = market_data.get_quote("TSDD", max_age_sec=5.0)
+    assert stale["stale"] is True and stale["ask"] is None
+    assert market_data.get_quote("TSDD", max_age_sec=None)["ask"] == 5.01
+
+
+def test_trade_prints_do_not_refresh_a_stale_bid_ask(feed):
+    """A fresh print updates last and trade_recv_ts but leaves an old bid/ask stale."""
+
+    now = time.time()
+    feed.publish("TSLL", bid=10.0, ask=10.02, recv_ts=now - 60.0)
+    market_data.quote_service.book.update_trade("TSLL", 10.05, recv_ts=now)
+
+    q = market_data.get_quote("TSLL", max_age_sec=5.0)
+    assert q["stale"] is True and q["bid"] is None
+    assert (q["quote_recv_ts"], q["trade_recv_ts"]) == (now - 60.0, now)
+    assert market_data.get_quote("TSLL", max_age_sec=None)["last"] == 10.05
+
+    feed.publish("TSLL", bid=10.04, ask=10.06, recv_ts=now)
+    q = market_data.get_quote("TSLL", max_age_sec=5.0)
+    assert (q["stale"], q["bid"], q["last"], q["trade_recv_ts"]) == (False, 10.04, 10.05, now)
+    assert market_data.quote_service.book.update_trade("TSDD", 5.0).is_stale(5.0)  # a print alone is no quote
+
+
+def test_get_quotes_returns_one_snapshot(feed):
+    """A snapshot is frozen at the time it was taken, even if the feed keeps publishing."""
+
+    feed.publish("TSLL", bid=10.0, ask=10.02)
+    feed.publish("TSDD", bid=5.0, ask=5.01)
+    snap = market_data.get_quotes(("TSLL", "TSDD", "TSLA"))
+    feed.publish("TSLL", bid=11.0, ask=11.02)
+
+    assert snap["TSLL"]["bid"] == 10.0
+    assert snap["TSDD"]["ask"] == 5.01
+    assert snap["TSLA"]["stale"] is True
+    assert snap.get("NVDA")["bid"] is None
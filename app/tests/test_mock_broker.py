@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("alpaca")
+
+from app.services.market_data import Quote
+from app.services.mock_broker import FillModel, MockBroker, MockBrokerError
+from app.services.order_manager import OrderManager
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _quote(clock, symbol, bid, ask):
+    return Quote(symbol, bid, ask, None, None, clock.now)
+
+
+def test_limit_order_fills_from_quotes_with_latency_and_partials():
+    """Fills wait out the fill latency, respect the limit and arrive in per-quote slices."""
+
+    clock = _Clock()
+    events = []
+    broker = MockBroker(cash=1_000.0, fill_model=FillModel(max_fill_per_quote=30), fill_latency_sec=0.5, clock=clock)
+    broker.subscribe(lambda event, update: events.append((event, update.order.filled_qty)))
+    broker.on_quote(_quote(clock, "TSLL", 9.99, 10.00))
+    order = broker.submit_limit(symbol="TSLL", qty=50, side="buy", limit_price=10.0)
+    assert order.filled_qty == 0  # marketable, but inside the fill latency
+
+    clock.now += 0.6
+    broker.on_quote(_quote(clock, "TSLL", 10.00, 10.01))  # ask above the limit
+    assert order.filled_qty == 0
+    broker.on_quote(_quote(clock, "TSLL", 9.97, 9.98))
+    broker.on_quote(_quote(clock, "TSLL", 9.98, 9.99))
+    assert order.status == "filled" and order.filled_avg_price == pytest.approx((30 * 9.98 + 20 * 9.99) / 50)
+    assert events == [("new", 0), ("partial_fill", 30), ("fill", 50)]
+    assert float(broker.get_position("TSLL").qty) == 50
+    assert float(broker.get_account().cash) == pytest.approx(1_000.0 - 30 * 9.98 - 20 * 9.99)
+
+    with pytest.raises(MockBrokerError):
+        broker.submit_limit(symbol="TSLL", qty=60, side="sell", limit_price=10.0)  # more than held
+
+
+def test_order_manager_runs_against_mock_broker():
+    """Replace, stop-limit trigger and rejections flow through OrderManager unchanged."""
+
+    clock = _Clock()
+    broker = MockBroker(cash=10_000.0, fill_model=FillModel(reject_every=3), clock=clock)
+    om = OrderManager(broker)
+    broker.subscribe(om.on_trade_update)
+    broker.on_quote(_quote(clock, "TSDD", 20.00, 20.05))
+
+    entry = om.submit_limit("TSDD", 100, "BUY", 19.90)
+    assert not entry.done
+    replaced = broker.replace_limit(entry.order_id, new_limit_price=20.05)
+    assert entry.order_id == replaced.id and entry.done and entry.filled_qty == 100
+
+    stop = broker.submit_stop_limit(symbol="TSDD", qty=100, side="sell", stop_price=19.50, limit_price=19.40)
+    broker.on_quote(_quote(clock, "TSDD", 19.60, 19.65))
+    assert stop.is_open and not stop.triggered
+    broker.on_quote(_quote(clock, "TSDD", 19.45, 19.50))
+    assert stop.status == "filled" and "TSDD" not in {p.symbol for p in broker.get_all_positions()}
+
+    rejected = om.submit_limit("TSDD", 1, "BUY", 19.0)  # third submit
+    assert rejected.done and rejected.final_status == "rejected"
+
+
+def test_exits_cancel_the_protective_stop_first(tmp_path):
+    """The resting stop holds the shares, so a take-profit exit sells only once the stop's cancel is confirmed."""
+
+    from app.core.clock import SimClock
+    from app.services.broker_state import BrokerState
+    from app.services.decision_service import DecisionService
+    from app.services.trader import TraderEngine
+
+    clock = SimClock(1_000.0)
+    broker = MockBroker(cash=1_000.0, clock=clock)
+    engine = TraderEngine(broker, data_dir=tmp_path, decisions=DecisionService(sentiment_dir=tmp_path),
+                          broker=BrokerState(broker, ttl_sec=0.0), clock=clock)
+    engine.session.pre = engine.session.after = False  # plain RTH limit orders
+    broker.subscribe(engine.orders.on_trade_update)
+    broker.on_quote(_quote(clock, "TSLL", 9.99, 10.00))
+    broker.submit_limit(symbol="TSLL", qty=10, side="buy", limit_price=10.0)
+    engine._place_protective_stop("TSLL")
+    stop = broker.orders[engine._stops["TSLL"]]
+    assert stop.is_open and stop.qty == 10
+    with pytest.raises(MockBrokerError, match="insufficient qty"):
+        broker.submit_limit(symbol="TSLL", qty=10, side="sell", limit_price=10.0)
+
+    def exits():
+        return [o for o in broker.orders.values() if o.side == "sell" and o.type == "limit"]
+
+    engine._manage_position("TSLL", quotes={"TSLL": {"bid": 10.99, "ask": 11.00, "last": 11.0}})  # new peak
+    broker.on_quote(_quote(clock, "TSLL", 10.69, 10.70))
+    engine._manage_position("TSLL", quotes={"TSLL": {"bid": 10.69, "ask": 10.70, "last": 10.7}})  # below P80
+    assert stop.is_open and not exits() and "TSLL" in engine._releasing  # returned without waiting
+    clock.advance(clock.now)  # the order manager's worker sends the cancel; its event submits the exit
+    assert stop.status == "canceled" and "TSLL" not in engine._stops and not engine._releasing
+    assert [o.qty for o in exits()] == [10]
+    engine.stop()
+
+
+def test_an_unconfirmed_stop_cancel_times_out_without_exiting(tmp_path):
+    """If the broker never confirms the cancel, the exit is dropped on the (virtual) timeout and the stop kept."""
+
+    from app.config import settings
+    from app.core.clock import SimClock
+    from app.services.broker_state import BrokerState
+    from app.services.decision_service import DecisionService
+    from app.services.trader import TraderEngine
+
+    clock = SimClock(1_000.0)
+    broker = MockBroker(cash=1_000.0, clock=clock)
+    engine = TraderEngine(broker, data_dir=tmp_path, decisions=DecisionService(sentiment_dir=tmp_path),
+                          broker=BrokerState(broker, ttl_sec=0.0), clock=clock)
+    broker.subscribe(engine.orders.on_trade_update)
+    broker.on_quote(_quote(clock, "TSLL", 9.99, 10.00))
+    broker.submit_limit(symbol="TSLL", qty=10, side="buy", limit_price=10.0)
+    engine._place_protective_stop("TSLL")
+    stop_id = engine._stops["TSLL"]
+    broker.cancel_order = lambda order_id: None  # the cancel is lost
+    released = []
+
+    engine._release_stop("TSLL", released.append)
+    clock.advance(clock.now + settings.STOP_CANCEL_TIMEOUT_SEC / 2)
+    assert released == [] and engine._releasing
+    clock.advance(clock.now + settings.STOP_CANCEL_TIMEOUT_SEC)
+    assert released == [False] and engine._stops == {"TSLL": stop_id} and not engine._releasing
+    assert broker.orders[stop_id].is_open
+    engine.stop()
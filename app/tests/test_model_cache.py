@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+pytest.importorskip("sklearn")
+pytest.importorskip("joblib")
+
+from app.services.model import ModelCache, _dump_atomic
+
+
+def test_cache_loads_once_and_reloads_on_change(tmp_path):
+    """The file is unpickled only when it changes; pinned callers keep their version."""
+
+    path = tmp_path / "model.joblib"
+    loads = []
+
+    def _loader(p):
+        from joblib import load
+
+        loads.append(p)
+        return load(p)
+
+    cache = ModelCache(path, loader=_loader)
+    assert cache.get() is None
+
+    _dump_atomic({"interval": "5m", "gen": 1}, path)
+    first = cache.get()
+    assert cache.get() is first and len(loads) == 1
+
+    with cache.pin() as pinned:
+        _dump_atomic({"interval": "5m", "gen": 2}, path)
+        os.utime(path, ns=(first.version[0] + 10**9, first.version[0] + 10**9))
+        assert cache.get() is pinned is first
+
+    second = cache.get()
+    assert second.payload["gen"] == 2 and len(loads) == 2
+    assert cache.get() is second
+
+
+def test_unreadable_file_keeps_last_good_model(tmp_path):
+    """A corrupt write doesn't take the model away from live callers."""
+
+    path = tmp_path / "model.joblib"
+    _dump_atomic({"interval": "5m"}, path)
+    cache = ModelCache(path)
+    good = cache.get()
+
+    path.write_bytes(b"not a pickle")
+    assert cache.get() is good
+
+
+def test_corrupt_file_is_loaded_once_until_it_changes(tmp_path):
+    """A file that failed to load is skipped on later calls; a new write is tried again."""
+
+    path = tmp_path / "model.joblib"
+    path.write_bytes(b"not a pickle")
+    loads = []
+
+    def _loader(p):
+        from joblib import load
+
+        loads.append(p)
+        return load(p)
+
+    cache = ModelCache(path, loader=_loader)
+    assert [cache.get() for _ in range(5)] == [None] * 5
+    assert len(loads) == 1
+
+    _dump_atomic({"interval": "5m"}, path)
+    assert cache.get().payload == {"interval": "5m"} and len(loads) == 2
+
+
+def test_fused_scoring_matches_sklearn():
+    """Folding the scaler into the weights reproduces predict_proba, row by row and in batch."""
+
+    np = pytest.importorskip("numpy")
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    from app.services.model import FusedLinear
+
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(400, 17)) * rng.uniform(0.01, 50, 17) + rng.normal(size=17)
+    y = (X[:, 0] / X[:, 0].std() + rng.normal(size=400) > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+    clf = LogisticRegression(max_iter=1000).fit(scaler.transform(X), y)
+    expected = clf.predict_proba(scaler.transform(X))[:, 1]
+
+    fused = FusedLinear.from_payload({"fused": FusedLinear.from_sklearn(scaler, clf).to_payload()})
+    np.testing.assert_allclose(fused.score_batch(X), expected, rtol=1e-12, atol=1e-12)
+    assert fused.score(X[7]) == pytest.approx(expected[7], abs=1e-12)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import itertools
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("alpaca")
+
+from app.services.market_data import Quote
+from app.services.order_manager import DONE, PARTIALLY_FILLED, WORKING, OrderManager
+
+
+class _FakeAlpaca:
+    def __init__(self) -> None:
+        self._ids = itertools.count(1)
+        self.orders = {}
+        self.submits = []
+        self.replaces = []
+
+    def _new(self, qty, limit_price):
+        oid = f"o{next(self._ids)}"
+        o = SimpleNamespace(id=oid, status="new", qty=qty, filled_qty=0, filled_avg_price=None, limit_price=limit_price)
+        self.orders[oid] = o
+        return o
+
+    def submit_limit(self, *, symbol, qty, side, limit_price, tif, extended_hours):
+        self.submits.append((symbol, qty, limit_price, extended_hours))
+        return self._new(qty, limit_price)
+
+    def replace_limit(self, order_id, *, new_limit_price, qty=None):
+        self.replaces.append(new_limit_price)
+        old = self.orders[order_id]
+        old.status = "replaced"
+        return self._new(old.qty if qty is None else qty, new_limit_price)
+
+    def cancel_order(self, order_id):
+        self.orders[order_id].status = "canceled"
+
+    def get_order(self, order_id):
+        return self.orders[order_id]
+
+
+def _update(event, order):
+    return SimpleNamespace(event=event, order=order)
+
+
+def _wait(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if pred():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_order_moves_through_fill_states_without_blocking():
+    """Submit returns at once; stream events drive partial and final fills."""
+
+    alp = _FakeAlpaca()
+    om = OrderManager(alp)
+    phases = []
+    order = om.submit_limit("TSLL", 10, "BUY", 10.0, on_update=lambda o: phases.append(o.phase))
+    assert order.phase == WORKING and om.has_working("TSLL")
+
+    broker_order = alp.orders[order.order_id]
+    broker_order.filled_qty, broker_order.filled_avg_price = 4, 10.0
+    om.on_trade_update("partial_fill", _update("partial_fill", broker_order))
+    assert order.phase == PARTIALLY_FILLED and order.remaining == 6
+
+    broker_order.filled_qty, broker_order.filled_avg_price, broker_order.status = 10, 10.03, "filled"
+    om.on_trade_update("fill", _update("fill", broker_order))
+    assert order.done and order.filled_qty == 10 and not om.has_working()
+    assert order.filled_avg_price == pytest.approx(10.03)
+    assert phases == [WORKING, PARTIALLY_FILLED, DONE]
+
+
+def test_quote_moves_reprice_once_per_burst_and_respect_throttle():
+    """A quote that moves the limit enough triggers one replace; the order follows its new id."""
+
+    alp = _FakeAlpaca()
+    om = OrderManager(alp)
+    om.risk.replace_min_interval_sec = 60.0
+    order = om.submit_limit("TSLL", 10, "BUY", 10.0)
+    first_id = order.order_id
+
+    om.on_quote(Quote("TSLL", 10.001, 10.002, None, None, time.time()))  # < 15 bps move: ignored
+    for _ in range(5):
+        om.on_quote(Quote("TSLL", 10.30, 10.32, None, None, time.time()))
+    assert _wait(lambda: order.phase == WORKING and order.order_id != first_id)
+    assert len(alp.replaces) == 1 and order.limit_price == alp.replaces[0]
+
+    om.on_quote(Quote("TSLL", 10.60, 10.62, None, None, time.time()))  # inside the min interval
+    time.sleep(0.05)
+    assert len(alp.replaces) == 1
+
+
+def test_partially_filled_order_keeps_following_the_quote_for_its_remainder():
+    """After a partial fill, a quote move replaces the unfilled rest; the order still completes."""
+
+    alp = _FakeAlpaca()
+    om = OrderManager(alp)
+    order = om.submit_limit("TSLL", 10, "BUY", 10.0)
+    first = alp.orders[order.order_id]
+    first.filled_qty, first.filled_avg_price = 4, 10.0
+    om.on_trade_update("partial_fill", _update("partial_fill", first))
+    assert order.phase == PARTIALLY_FILLED
+
+    om.on_quote(Quote("TSLL", 10.30, 10.32, None, None, time.time()))
+    assert _wait(lambda: order.order_id != first.id and order.phase == PARTIALLY_FILLED)
+    second = alp.orders[order.order_id]
+    assert second.qty == 6 and order.limit_price == alp.replaces[0] and order.remaining == 6
+
+    second.filled_qty, second.filled_avg_price, second.status = 6, 10.35, "filled"
+    om.on_trade_update("fill", _update("fill", second))
+    assert order.done and order.filled_qty == 10 and not om.has_working()
+    assert order.filled_avg_price == pytest.approx((4 * 10.0 + 6 * 10.35) / 10)
+
+
+def test_extended_hours_windows_keep_partials_and_resubmit_remainder(monkeypatch):
+    """FOK-style windows cancel the unfilled rest and resubmit it until the window budget runs out."""
+
+    from app.services import order_manager as om_mod
+
+    monkeypatch.setattr(om_mod, "get_quote", lambda symbol: {"bid": 5.0, "ask": 5.02, "last": 5.01})
+    alp = _FakeAlpaca()
+    om = OrderManager(alp)
+    order = om.submit_limit("TSDD", 10, "BUY", 5.0, extended_hours=True, fok_windows=3, window_sec=0.05)
+    alp.orders[order.order_id].filled_qty = 3
+
+    assert _wait(lambda: order.done)
+    assert [s[1] for s in alp.submits] == [10, 7, 7]
+    assert all(s[3] for s in alp.submits)
+    assert order.filled_qty == 3 and order.final_status == "canceled"
+
+
+def test_window_end_reported_twice_rolls_once_and_notifies_outside_the_lock(monkeypatch):
+    """The expiry cancel, its stream event and a reconcile all land on one resubmit per window."""
+
+    from app.services import order_manager as om_mod
+
+    monkeypatch.setattr(om_mod, "get_quote", lambda symbol: {"bid": 5.0, "ask": 5.02, "last": 5.01})
+    alp = _FakeAlpaca()
+    om = OrderManager(alp)
+    cancel = alp.cancel_order
+
+    def cancel_and_stream(order_id):
+        cancel(order_id)
+        om.on_trade_update("canceled", _update("canceled", alp.orders[order_id]))
+        om.reconcile()
+
+    alp.cancel_order = cancel_and_stream
+    held = []
+    om.subscribe(lambda o: held.append(om._lock._is_owned()))
+    order = om.submit_limit("TSDD", 10, "BUY", 5.0, extended_hours=True, fok_windows=3, window_sec=0.05)
+
+    assert _wait(lambda: order.done)
+    time.sleep(0.1)
+    assert [s[1] for s in alp.submits] == [10, 10, 10]
+    assert [o.status for o in alp.orders.values()] == ["canceled"] * 3  # no orphaned resubmit left live
+    assert order.final_status == "canceled"
+    assert held and not any(held)
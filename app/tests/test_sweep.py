@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("alpaca")
+
+from app.services.backtest import BacktestConfig, bars_from_closes
+from app.services.decision_engine import DecisionKnobs
+from app.services.sweep import DEFAULT_SPACE, config_for, grid, inactive_params, random_search, run_sweep
+
+KNOBS = DecisionKnobs(w_model=1.0, w_sent=0.0, base_gate=0.55, spread_block=75, spread_hint=50, gate_buffer=0.03)
+
+
+def _data(n=600):
+    rng = np.random.default_rng(11)
+    walk = np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    p_up = np.clip(0.5 + np.r_[0.0, np.diff(np.log(walk))] * 100 + rng.normal(0, 0.1, n), 0, 1)
+    return bars_from_closes(10.0 * walk, 20.0 / walk, p_up, start="2025-09-22 09:30",
+                            sentiment=0.2, vwap_bps=rng.normal(0, 30, n))
+
+
+def test_spaces_and_config_mapping():
+    """Grids enumerate every combination, random draws respect bounds, and names map onto the config."""
+
+    combos = list(grid({"gate_threshold": (0.52, 0.56), "flip_cooldown_sec": (30, 60, 90)}))
+    assert len(combos) == 6 and combos[1] == {"gate_threshold": 0.52, "flip_cooldown_sec": 60}
+
+    draws = list(random_search({"stop_loss_pct": (0.01, 0.03), "flip_cooldown_sec": (30, 120), "w_model": [0.5, 0.7]}, 50, seed=1))
+    assert all(0.01 <= d["stop_loss_pct"] <= 0.03 and isinstance(d["flip_cooldown_sec"], int) for d in draws)
+    assert draws == list(random_search({"stop_loss_pct": (0.01, 0.03), "flip_cooldown_sec": (30, 120), "w_model": [0.5, 0.7]}, 50, seed=1))
+
+    config = config_for(
+        {"gate_threshold": 0.58, "w_model": 0.6, "vwap_disagree_bps": 25, "stop_loss_pct": 0.03, "flip_cooldown_sec": 90},
+        BacktestConfig(knobs=KNOBS),
+    )
+    assert config.knobs.base_gate == 0.58 and config.knobs.w_sent == pytest.approx(0.4)
+    assert config.knobs.vwap_disagree_bps == 25 and config.risk.stop_loss_pct == 0.03 and config.flip_cooldown_sec == 90
+    assert config.knobs.spread_block == KNOBS.spread_block
+    with pytest.raises(ValueError):
+        config_for({"gate": 0.5}, BacktestConfig(knobs=KNOBS))
+
+
+def test_parallel_sweep_over_shared_memory_matches_serial():
+    """Workers reading the shared arrays produce the serial stats, ranked by the chosen metric."""
+
+    data = _data()
+    combos = list(grid({"gate_threshold": (0.52, 0.6), "stop_loss_pct": (0.01, 0.04), "w_model": (0.5, 0.9)}))
+    base = BacktestConfig(knobs=KNOBS, starting_cash=5_000.0)
+    seen = []
+    serial = run_sweep(data, combos, base, metric="calmar", max_workers=1, chunk_size=3, on_result=lambda p, s: seen.append(p))
+    parallel = run_sweep(data, combos, base, metric="calmar", max_workers=2, chunk_size=3)
+
+    assert len(serial) == len(combos) == len(seen)
+    assert serial["score"].is_monotonic_decreasing
+    assert serial["orders"].sum() > 0
+    cols = ["gate_threshold", "stop_loss_pct", "w_model", "final_equity", "orders", "score"]
+    pd.testing.assert_frame_equal(serial[cols], parallel[cols])
+
+
+def test_knobs_the_data_cannot_move_are_reported():
+    """A 4 bps synthetic spread never reaches a 30-50 bps hint; a VWAP-free history ignores the VWAP knobs."""
+
+    data = _data(50)
+    base = BacktestConfig(knobs=KNOBS)
+    spread_axes = {"spread_hint": (30, 50), "conviction_dw_wide_spread": (0.8, 1.0), "gate_threshold": (0.52, 0.6)}
+    assert inactive_params(data, grid(spread_axes), base) == ["spread_hint", "conviction_dw_wide_spread"]
+    assert inactive_params(data, grid({"spread_hint": (1, 50)}), base) == []
+    assert inactive_params(data, grid({"vwap_disagree_bps": (20, 60), "conviction_dw_vwap": (0.75, 1.0)}), base) == []
+
+    data.vwap_bps[:] = np.nan
+    assert inactive_params(data, grid({"vwap_disagree_bps": (20, 60), "conviction_dw_vwap": (0.75, 1.0)}), base) == [
+        "vwap_disagree_bps", "conviction_dw_vwap",
+    ]
+    assert "spread_hint" not in DEFAULT_SPACE and "conviction_dw_wide_spread" not in DEFAULT_SPACE
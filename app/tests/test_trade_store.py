@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import csv
+import sqlite3
+from types import SimpleNamespace
+
+from app.services.trade_store import TRADE_COLUMNS, TradeStore, shared_trade_store
+
+
+def test_batched_writes_and_indexed_range_queries(tmp_path):
+    """Rows land after a flush and read back by time range and symbol through the indexes."""
+
+    store = TradeStore(tmp_path / "trades.sqlite")
+    for i in range(300):
+        store.log_trade(ts=1_000.0 + i, action="ENTRY", symbol="TSLL" if i % 3 else "TSDD", qty=i, px=10.0)
+    tick = SimpleNamespace(
+        ts=1_050.0, seq=7, session_pre=False, session_rth=True, session_after=False,
+        result=SimpleNamespace(side="TSLL", conviction=0.4, gate=0.55, p_up=0.7, p_sent=float("nan"), p_blend=0.7,
+                               spread_bps_tsll=3.0, spread_bps_tsdd=4.0, vwap_bps_tsla=None, reasons={"gate": 0.55}),
+    )
+    store.log_decision(tick)
+    assert store.flush(timeout=5.0)
+
+    rows = store.trades(since=1_100.0, until=1_110.0, symbol="TSDD")
+    assert [r["ts"] for r in rows] == [1_102.0, 1_105.0, 1_108.0]
+    assert [r["qty"] for r in store.trades(limit=2)] == [298, 299]
+    assert store.last_trade("TSDD")["ts"] == 1_297.0
+    (decision,) = store.decisions(side="TSLL")
+    assert decision["seq"] == 7 and decision["p_sent"] is None and decision["session_rth"] == 1
+
+    with sqlite3.connect(tmp_path / "trades.sqlite") as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM trades WHERE symbol = ? AND ts >= ?", ("TSLL", 0)).fetchall()
+        assert "trades_symbol_ts" in str(plan)
+    store.close()
+
+
+def test_legacy_csv_is_migrated_once(tmp_path):
+    """The first shared open imports trades.csv and moves it aside so a restart doesn't re-import."""
+
+    legacy = tmp_path / "trades.csv"
+    with legacy.open("w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow([c for c in TRADE_COLUMNS if c != "ts_iso"])
+        w.writerow(["2025-09-22T10:00:00-04:00", "ENTRY", "TSLL", "5", "10.5"] + [""] * 11 + ['{"side": "TSLL"}', "open_side"])
+        w.writerow(["not-a-time", "EXIT", "TSLL"] + [""] * 16)
+
+    store = shared_trade_store(tmp_path / "trades.sqlite")
+    assert shared_trade_store(tmp_path / "trades.sqlite") is store
+    (row,) = store.trades()
+    assert row["ts_iso"] == "2025-09-22T10:00:00-04:00" and row["ts"] == 1_758_549_600.0
+    assert row["note"] == "open_side" and row["decision_components_json"] == '{"side": "TSLL"}'
+    assert not legacy.exists() and (tmp_path / "trades.csv.migrated").exists()
+    assert store.migrate_csv(legacy) == 0
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from app.services.market_data import Quote, QuoteBook
+from app.services.trader_events import DirectoryWatcher, QuoteMoveFilter, WakeSignal
+
+
+def _quote(symbol: str, bid: float, ask: float) -> Quote:
+    return Quote(symbol, bid, ask, None, None, time.time())
+
+
+def test_wake_signal_merges_bursts_within_min_gap():
+    """Events arriving inside the min gap after a pass are collected into one wake-up."""
+
+    wake = WakeSignal(min_gap_sec=0.2)
+    assert wake.wait(0.01) == set()
+
+    wake.notify("quote:TSLL")
+    assert wake.wait(1.0) == {"quote:TSLL"}
+
+    def _burst():
+        for reason in ("quote:TSDD", "order:fill", "quote:TSDD"):
+            wake.notify(reason)
+            time.sleep(0.02)
+
+    t0 = time.monotonic()
+    threading.Thread(target=_burst).start()
+    assert wake.wait(1.0) == {"quote:TSDD", "order:fill"}
+    assert time.monotonic() - t0 >= 0.15
+
+
+def test_quote_filter_only_wakes_on_material_moves():
+    """Quotes for other symbols or sub-threshold mid moves don't wake the trader."""
+
+    wake = WakeSignal(min_gap_sec=0.0)
+    book = QuoteBook()
+    book.subscribe(QuoteMoveFilter(wake, ("TSLL",), min_bps=5.0))
+
+    book.update_quote("TSLL", 10.00, 10.02)
+    assert wake.wait(0.01) == {"quote:TSLL"}
+    book.update_quote("TSLL", 10.001, 10.021)  # ~1 bp
+    book.update_quote("NVDA", 100.0, 100.5)
+    assert wake.wait(0.01) == set()
+    book.update_quote("TSLL", 10.01, 10.03)  # ~10 bps from the last wake
+    assert wake.wait(0.01) == {"quote:TSLL"}
+
+
+def test_directory_watcher_sees_new_and_rewritten_files(tmp_path):
+    """A new sentiment file or a rewrite of the newest one counts as a change."""
+
+    watcher = DirectoryWatcher(tmp_path)
+    assert not watcher.changed()
+    path = tmp_path / "2025-09-26.json"
+    path.write_text("{}")
+    assert watcher.changed() and not watcher.changed()
+    time.sleep(0.01)
+    path.write_text('{"daily_score": 0.2}')
+    assert watcher.changed()
+
+
+def test_trader_runs_a_pass_per_event_not_per_tick(monkeypatch, tmp_path):
+    """The engine sleeps until something happens, then runs one pass for the whole burst."""
+
+    pytest.importorskip("alpaca")
+    from app.services import trader as trader_mod
+    from app.services.decision_service import DecisionService
+
+    class _Alpaca:
+        api_key = api_secret = None
+
+    monkeypatch.setattr(trader_mod, "next_bar_close", lambda now, interval: now + 3600.0)
+    book = QuoteBook()
+    monkeypatch.setattr(trader_mod.quote_service, "book", book)
+    engine = trader_mod.TraderEngine(_Alpaca(), data_dir=tmp_path, decisions=DecisionService(sentiment_dir=tmp_path))
+    passes = []
+    monkeypatch.setattr(engine, "process_once", lambda: passes.append(set(engine.last_wake_reasons)))
+
+    engine.start()
+    try:
+        time.sleep(0.3)
+        assert passes == [{"heartbeat"}]
+        for i in range(5):
+            book.update_quote("TSLL", 10.0 + i * 0.05, 10.02 + i * 0.05)
+        time.sleep(0.5)
+        assert len(passes) <= 3 and "quote:TSLL" in passes[1]
+        (tmp_path / "latest.json").write_text("{}")
+        time.sleep(2.5)
+        assert passes[-1] == {"sentiment"}
+    finally:
+        engine.stop()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+"""
+app.tools.bench_replay
+Times the two replay paths on synthetic data: the backtester driving the live
+TraderEngine over 1m bars (reported as a multiple of real time), and the
+decision journal's vectorized ``replay_batch`` (reported in records/second).
+Wall-clock numbers depend on the machine, so they live here instead of in the
+test suite.
+
+Usage:
+  python -m app.tools.bench_replay                       # 20k bars, 1M journal records
+  python -m app.tools.bench_replay --bars 5000 --records 200000 --repeat 3
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.services.backtest import BacktestConfig, BacktestData, bars_from_closes, run_backtest
+from app.services.decision_engine import DecisionKnobs
+from app.services.decision_journal import RECORD, SESSION_RTH, replay_batch
+
+KNOBS = DecisionKnobs(w_model=1.0, w_sent=0.0, base_gate=0.55, spread_block=75, spread_hint=50, gate_buffer=0.03)
+
+
+def synthetic_bars(n: int, seed: int = 5) -> BacktestData:
+    """``n`` consecutive 1m bars of a TSLL/TSDD random walk with a noisy model probability."""
+    rng = np.random.default_rng(seed)
+    walk = np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    return bars_from_closes(10.0 * walk, 20.0 / walk, rng.uniform(0.2, 0.8, n))
+
+
+def synthetic_records(n: int, seed: int = 0) -> np.ndarray:
+    """``n`` RTH journal records split across two knob sets."""
+    rng = np.random.default_rng(seed)
+    recs = np.zeros(n, dtype=RECORD)
+    recs["p_up_raw"] = rng.uniform(0, 1, n)
+    recs["sentiment"] = rng.uniform(-1, 1, n)
+    recs["vwap_bps"] = rng.normal(0, 50, n)
+    recs["tsll_bid"], recs["tsll_ask"] = 10.0, 10.0 + rng.uniform(0, 0.1, n)
+    recs["tsdd_bid"], recs["tsdd_ask"] = 20.0, 20.02
+    recs["flags"] = SESSION_RTH
+    for name, value in KNOBS.__dict__.items():
+        recs[name] = value
+    recs["base_gate"][n // 2:] = 0.6
+    return recs
+
+
+def run(bars: int, records: int, repeat: int) -> None:
+    data = synthetic_bars(bars)
+    best = None
+    for _ in range(repeat):
+        result = run_backtest(data, BacktestConfig(knobs=KNOBS), detail=False)
+        if best is None or result.stats["speedup"] > best.stats["speedup"]:
+            best = result
+    assert best is not None
+    print(f"backtest      {bars:,} bars, {best.stats['orders']:,.0f} orders   x{best.stats['speedup']:,.0f} real time")
+
+    recs = synthetic_records(records)
+    elapsed = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        replay_batch(recs)
+        elapsed = min(elapsed, time.perf_counter() - t0)
+    print(f"replay_batch  {records:,} records   {elapsed * 1e3:8.1f} ms   {records / elapsed:,.0f} records/s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmark the backtest and decision-journal replays")
+    ap.add_argument("--bars", type=int, default=20_000)
+    ap.add_argument("--records", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+    run(args.bars, args.records, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+"""
+app.tools.run_backtest
+Replays the stored bars (data/bars) and sentiment history (data/sentiment)
+through the decision engine and trader policies against the mock broker, then
+writes equity.csv, trades.csv and decisions.csv (one row per bar, with the
+decision inputs and the action taken) to the output directory.
+
+Usage:
+  python -m app.tools.run_backtest                          # 5m bars, last 60 days
+  python -m app.tools.run_backtest --interval 1m --days 7 --cash 25000 --out data/backtest
+"""
+import argparse
+from pathlib import Path
+
+from app.config.paths import DATA_DIR
+from app.services.backtest import BacktestConfig, load_data, run_backtest
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Backtest the live decision and execution policies")
+    ap.add_argument("--interval", default="5m", choices=["1m", "5m"])
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--cash", type=float, default=10_000.0)
+    ap.add_argument("--out", type=Path, default=DATA_DIR / "backtest")
+    args = ap.parse_args()
+
+    data = load_data(args.interval, args.days)
+    result = run_backtest(data, BacktestConfig(starting_cash=args.cash))
+    args.out.mkdir(parents=True, exist_ok=True)
+    result.equity.to_csv(args.out / "equity.csv")
+    result.trades.to_csv(args.out / "trades.csv", index=False)
+    result.decisions.to_csv(args.out / "decisions.csv")
+    for key, value in result.stats.items():
+        print(f"{key:>14}: {value:,.4f}")
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
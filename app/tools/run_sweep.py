@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+"""
+app.tools.run_sweep
+Backtests a grid (or a random sample) of decision and risk parameters over the
+stored bars and sentiment history, across all CPUs, and writes the combinations
+ranked by a risk-adjusted score to sweep.csv.
+
+Usage:
+  python -m app.tools.run_sweep                                  # default grid, 5m bars, last 60 days
+  python -m app.tools.run_sweep --random 2000 --seed 7 --metric calmar --workers 8
+"""
+import argparse
+import time
+from pathlib import Path
+
+from app.config.paths import DATA_DIR
+from app.services.backtest import BacktestConfig, load_data
+from app.services.sweep import DEFAULT_SPACE, RANK_METRICS, grid, random_search, run_sweep
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Rank decision/risk parameters by backtest")
+    ap.add_argument("--interval", default="5m", choices=["1m", "5m"])
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--cash", type=float, default=10_000.0)
+    ap.add_argument("--random", type=int, default=0, help="sample N combinations instead of the full grid")
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--metric", default="sharpe", choices=sorted(RANK_METRICS))
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--out", type=Path, default=DATA_DIR / "backtest")
+    args = ap.parse_args()
+
+    data = load_data(args.interval, args.days)
+    space = {name: tuple(values) for name, values in DEFAULT_SPACE.items()}
+    combos = list(random_search({k: (min(v), max(v)) for k, v in space.items()}, args.random, args.seed)) if args.random else list(grid(space))
+    print(f"{len(combos):,} combinations over {len(data):,} {args.interval} bars")
+
+    done = [0]
+    t0 = time.perf_counter()
+
+    def progress(_params, _stats) -> None:
+        done[0] += 1
+        if done[0] % 100 == 0:
+            print(f"  {done[0]:,}/{len(combos):,} ({time.perf_counter() - t0:,.0f}s)")
+
+    ranked = run_sweep(
+        data, combos, BacktestConfig(starting_cash=args.cash), metric=args.metric, max_workers=args.workers, on_result=progress
+    )
+    args.out.mkdir(parents=True, exist_ok=True)
+    ranked.to_csv(args.out / "sweep.csv", index=False)
+    print(ranked.head(args.top).to_string())
+    print(f"Wrote {args.out / 'sweep.csv'} in {time.perf_counter() - t0:,.1f}s")
+
+
+if __name__ == "__main__":
+    main()